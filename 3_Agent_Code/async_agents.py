@@ -0,0 +1,298 @@
+# Async Agents
+
+# AsyncOpenAI-based planner and summarizer for callers that run on an event loop.
+
+# async_agents.py
+
+import asyncio
+import functools
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from planner_agent import (PLAN_TOKEN_ESTIMATE, MAX_SUBTOPICS, PlannerAgent,
+                           StreamingSubtopicParser, parse_subtopics)
+from memory_store import MemoryStore
+from model_router import ModelRouter
+from prompt_builder import PromptPlan
+from scheduler import estimate_tokens
+from single_flight import AsyncSingleFlight, FlightAbandoned
+from summarizer_agent import DEFAULT_MAX_CONCURRENCY, SummarizerAgent, SummaryResult
+from telemetry import CallTracker
+
+# Process-wide so identical requests from tasks on the same loop are coalesced
+shared_async_flight = AsyncSingleFlight()
+
+
+async def _with_timeout(awaitable, timeout: Optional[float]):
+    if timeout is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+async def _in_thread(fn, *args):
+    """Run blocking work (SQLite reads and writes) off the event loop; asyncio.to_thread needs Python 3.9"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+
+class AsyncSummarizerAgent(SummarizerAgent):
+    """SummarizerAgent whose model calls are awaited on an AsyncOpenAI client.
+
+    Prompt loading, session memory, caches, paraphrase lookup and telemetry
+    are inherited unchanged, so a summary generated here is served to the
+    CLI and Streamlit app too. Use the ``a``-prefixed methods; the inherited
+    synchronous ones expect a synchronous client.
+
+    Cancelling a task stops its request; ``timeout`` bounds a whole call,
+    including rate-limit waits and retries.
+    """
+
+    def __init__(self, client, cache=None, precomputed=None,
+                 flight: Optional[AsyncSingleFlight] = None,
+                 scheduler=None, telemetry=None, history=None, similar=None,
+                 router: Optional[ModelRouter] = None, memory: Optional[MemoryStore] = None):
+        super().__init__(client, cache=cache, precomputed=precomputed, scheduler=scheduler,
+                         telemetry=telemetry, history=history, similar=similar, router=router,
+                         memory=memory)
+        self.flight = flight if flight is not None else shared_async_flight
+
+    async def _acreate_completion(self, prompt: PromptPlan, call: CallTracker,
+                                  timeout: Optional[float] = None, **kwargs):
+        call.record_prompt(prompt.saved_tokens)
+        return await self.router.acall(
+            lambda model, attempt_timeout: self.scheduler.call_async(
+                lambda remaining: self.client.chat.completions.create(
+                    timeout=remaining, **self._completion_params(prompt.messages, model, max_tokens=prompt.max_tokens,
+                                                                 **kwargs)
+                ),
+                estimated_tokens=prompt.prompt_tokens + prompt.max_tokens,
+                deadline=attempt_timeout,
+                on_retry=call.retried,
+                model=model
+            ),
+            stream=kwargs.get('stream', False),
+            on_model=call.use_model,
+            timeout=timeout
+        )
+
+    async def _arequest_summary(self, subtopic: str, key: str, timeout: Optional[float]) -> Tuple[str, str]:
+        """(summary, model that wrote it)"""
+        prompt = self._prompt(subtopic)
+        with self.telemetry.track('summarizer', self.model, subtopic) as call:
+            response = await self._acreate_completion(prompt, call, timeout)
+            summary = response.choices[0].message.content.strip()
+            call.record_usage(response.usage, prompt.messages, summary)
+        self._check_truncated(subtopic, getattr(response.choices[0], 'finish_reason', None))
+        await _in_thread(self._store, subtopic, key, summary, call.model)
+        return summary, call.model
+
+    async def agenerate(self, subtopic: str, timeout: Optional[float] = None) -> str:
+        """Call the model for a subtopic; errors, including asyncio.TimeoutError, propagate"""
+        await _in_thread(self._refresh_prompt)
+        key = self.cache_key(subtopic)
+        stored = await _in_thread(self._lookup, subtopic, key)
+        if stored is not None:
+            return stored
+
+        summary, model = await _with_timeout(
+            self.flight.do(key, lambda: self._arequest_summary(subtopic, key, timeout)), timeout
+        )
+        self._answered(subtopic, model)
+        self._remember(subtopic, summary)
+        return summary
+
+    async def agenerate_stream(self, subtopic: str) -> AsyncIterator[str]:
+        """Yield the summary in chunks as the model produces them; errors propagate"""
+        await _in_thread(self._refresh_prompt)
+        key = self.cache_key(subtopic)
+        stored = await _in_thread(self._lookup, subtopic, key)
+        if stored is not None:
+            yield stored
+            return
+
+        future, leader = self.flight.claim(key)
+        while not leader:
+            try:
+                summary, model = await asyncio.shield(future)
+            except FlightAbandoned:
+                # The leader was cancelled or its stream closed before it finished; take over
+                future, leader = self.flight.claim(key)
+                continue
+            self._answered(subtopic, model)
+            self._remember(subtopic, summary)
+            yield summary
+            return
+
+        try:
+            prompt = self._prompt(subtopic)
+            with self.telemetry.track('summarizer', self.model, subtopic) as tracker:
+                stream = await self._acreate_completion(prompt, tracker, stream=True)
+                parts = []
+                usage = None
+                finish_reason = None
+                try:
+                    async for chunk in stream:
+                        usage = getattr(chunk, 'usage', None) or usage
+                        if not chunk.choices:
+                            continue
+                        finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or finish_reason
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            tracker.first_token()
+                            parts.append(delta)
+                            yield delta
+                finally:
+                    await stream.close()
+
+                summary = ''.join(parts).strip()
+                tracker.record_usage(usage, prompt.messages, summary)
+            self._check_truncated(subtopic, finish_reason)
+            await _in_thread(self._store, subtopic, key, summary, tracker.model)
+        except Exception as e:
+            self.flight.fail(key, future, e)
+            raise
+        except BaseException:
+            # Cancelled or closed by our own caller; followers should not see that
+            self.flight.abandon(key, future)
+            raise
+        self.flight.resolve(key, future, (summary, tracker.model))
+        self._remember(subtopic, summary)
+
+    async def asummarize(self, subtopic: str, timeout: Optional[float] = None) -> str:
+        """Generate a summary for the given subtopic"""
+        try:
+            return await self.agenerate(subtopic, timeout)
+        except Exception as e:
+            print(f"❌ Error generating summary for {subtopic}: {str(e) or type(e).__name__}")
+            return self.fallback_message(subtopic)
+
+    async def asummarize_stream(self, subtopic: str) -> AsyncIterator[str]:
+        """Stream a summary for the given subtopic chunk by chunk"""
+        streamed = False
+        try:
+            async for chunk in self.agenerate_stream(subtopic):
+                streamed = True
+                yield chunk
+        except Exception as e:
+            print(f"❌ Error generating summary for {subtopic}: {str(e)}")
+            yield ("\n\n" if streamed else "") + self.fallback_message(subtopic)
+
+    async def asummarize_many(self, topics: Iterable[str],
+                              max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                              timeout: Optional[float] = None) -> AsyncIterator[SummaryResult]:
+        """Summarize several topics concurrently, yielding each SummaryResult as it finishes.
+
+        ``timeout`` applies to each topic. Topics still running when the
+        consumer stops iterating (or is cancelled) are cancelled.
+        """
+        topics = list(topics)
+        if not topics:
+            return
+        slots = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(index: int, topic: str) -> SummaryResult:
+            async with slots:
+                try:
+                    return SummaryResult(index, topic, await self.agenerate(topic, timeout))
+                except Exception as e:
+                    return SummaryResult(index, topic, self.fallback_message(topic),
+                                         str(e) or type(e).__name__)
+
+        tasks = [asyncio.ensure_future(run(i, topic)) for i, topic in enumerate(topics)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def asummarize_all(self, topics: Iterable[str],
+                             max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                             timeout: Optional[float] = None) -> List[SummaryResult]:
+        """Summarize several topics concurrently and return results in input order"""
+        results = [result async for result in self.asummarize_many(topics, max_concurrency, timeout)]
+        return sorted(results, key=lambda result: result.index)
+
+
+class AsyncPlannerAgent(PlannerAgent):
+    """PlannerAgent whose model calls are awaited on an AsyncOpenAI client.
+
+    Syllabus matching, the plan cache, reply parsing and telemetry are
+    shared with PlannerAgent. Use the ``a``-prefixed methods; the inherited
+    synchronous ones expect a synchronous client.
+    """
+
+    async def _acreate_plan(self, messages, call: CallTracker,
+                            timeout: Optional[float] = None, **kwargs):
+        return await self.router.acall(
+            lambda model, attempt_timeout: self.scheduler.call_async(
+                lambda remaining: self.client.chat.completions.create(
+                    timeout=remaining, **self._plan_params(messages, model, **kwargs)
+                ),
+                estimated_tokens=estimate_tokens(messages, PLAN_TOKEN_ESTIMATE),
+                deadline=attempt_timeout,
+                on_retry=call.retried,
+                model=model
+            ),
+            stream=kwargs.get('stream', False),
+            on_model=call.use_model,
+            timeout=timeout
+        )
+
+    async def aplan_subtopics(self, user_topic: str, timeout: Optional[float] = None) -> List[str]:
+        """Break down a user topic into subtopics using AI"""
+        known = self._known_plan(user_topic)
+        if known is not None:
+            return known
+
+        messages = self._plan_messages(user_topic)
+        try:
+            with self.telemetry.track('planner', self.model, user_topic) as call:
+                response = await _with_timeout(self._acreate_plan(messages, call, timeout), timeout)
+                content = response.choices[0].message.content
+                call.record_usage(response.usage, messages, content or "")
+        except Exception as e:
+            # Without a plan the topic itself is still worth summarizing
+            print(f"❌ Error planning subtopics for {user_topic}: {str(e) or type(e).__name__}")
+            return [user_topic]
+
+        return self._accept_plan(user_topic, content)
+
+    async def aplan_subtopics_stream(self, user_topic: str) -> AsyncIterator[str]:
+        """Like aplan_subtopics, but yields each subtopic as soon as the model has written it"""
+        known = self._known_plan(user_topic)
+        if known is not None:
+            for subtopic in known:
+                yield subtopic
+            return
+
+        messages = self._plan_messages(user_topic)
+        parser = StreamingSubtopicParser()
+        subtopics = []
+        try:
+            with self.telemetry.track('planner', self.model, user_topic) as call:
+                stream = await self._acreate_plan(messages, call, stream=True)
+                usage = None
+                try:
+                    async for chunk in stream:
+                        usage = getattr(chunk, 'usage', None) or usage
+                        if not chunk.choices or not chunk.choices[0].delta.content:
+                            continue
+                        call.first_token()
+                        for subtopic in self._new_subtopics(subtopics, parser.feed(chunk.choices[0].delta.content)):
+                            yield subtopic
+                        if len(subtopics) == MAX_SUBTOPICS:
+                            break
+                finally:
+                    await stream.close()
+                call.record_usage(usage, messages, parser.text)
+            # Replies that were not JSON are parsed once complete
+            for subtopic in self._new_subtopics(subtopics, parse_subtopics(parser.text)):
+                yield subtopic
+        except Exception as e:
+            print(f"❌ Error planning subtopics for {user_topic}: {str(e)}")
+
+        if not subtopics:
+            if parser.text:
+                print(f"⚠️ Planner reply for {user_topic} had no usable subtopics. Revising the topic as a whole.")
+            yield user_topic
+            return
+        self.plan_cache.put(self.plan_cache_key(user_topic), subtopics)
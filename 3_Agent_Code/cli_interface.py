@@ -4,16 +4,280 @@
 
 # cli_interface.py
 
+import argparse
+import json
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from llm_client import create_lazy_client
+from pipeline import plan_and_summarize
 from planner_agent import PlannerAgent
-from summarizer_agent import SummarizerAgent
-from utils import print_banner, format_response, save_session_log
+from summarizer_agent import DEFAULT_MAX_CONCURRENCY, SummarizerAgent, SummaryResult
+from summary_cache import SummaryCache
+from precomputed import PrecomputedSummaries
+from session_index import SessionIndex, parse_since, print_entries
+from session_log import SessionLog, export, render
+from syllabus_store import get_syllabus
+from telemetry import Telemetry, format_rollup
+from utils import print_banner, format_response, format_response_header, format_response_footer
 
-def main():
-    # Load environment variables
+# Exit codes of the batch command
+EXIT_OK = 0
+EXIT_PARTIAL = 1      # some topics fell back to the placeholder text
+EXIT_USAGE = 2        # bad arguments or no topics to summarize
+EXIT_FAILED = 3       # every topic failed, e.g. a bad API key
+EXIT_INTERRUPTED = 130
+
+def load_environment():
+    """Read .env; python-dotenv is only imported by commands that may call the model"""
+    from dotenv import load_dotenv
     load_dotenv()
+
+def build_agents(client, history):
+    """Planner and summarizer sharing one telemetry session and the persistent stores"""
+    # numpy is only needed once summaries are looked up
+    from similarity_index import SimilarityIndex, threshold_from_env
+
+    # One telemetry session for both agents, so the closing summary covers every call
+    telemetry = Telemetry()
+    planner = PlannerAgent(client, telemetry=telemetry)
+    summarizer = SummarizerAgent(client, cache=SummaryCache(), precomputed=PrecomputedSummaries.load(),
+                                 telemetry=telemetry, history=history,
+                                 similar=SimilarityIndex(threshold=threshold_from_env()))
+    return planner, summarizer
+
+def journal_result(journal, summarizer, result):
+    """Append a SummaryResult to the session journal with the latency and tokens of its call"""
+    return journal.append(result.topic, result.summary, index=result.index,
+                          model=summarizer.answered_by(result.topic), error=result.error,
+                          call=summarizer.telemetry.latest('summarizer', result.topic),
+                          prompt_hash=summarizer.prompt_hash, temperature=summarizer.temperature)
+
+def summarize_topics(summarizer, topics, journal):
+    """Print summaries for a known list of topics, journaling each one; returns the failed count"""
+    print(f"\n📝 Generating summaries for {len(topics)} topic(s)...\n")
+    print("-" * 50)
+    
+    # The first summary streams to the terminal while the rest are generated
+    # in the background; those are printed and journaled as each one finishes
+    failed = 0
+    pending = summarizer.summarize_many(topics[1:])
+
+    print(format_response_header(topics[0]), end="")
+    chunks = []
+    try:
+        for chunk in summarizer.generate_stream(topics[0]):
+            chunks.append(chunk)
+            print(chunk, end="", flush=True)
+        first = SummaryResult(0, topics[0], "".join(chunks).strip())
+    except Exception as e:
+        first = SummaryResult(0, topics[0], summarizer.fallback_message(topics[0]), str(e))
+        print(("\n\n" if chunks else "") + first.summary, end="")
+    print(format_response_footer())
+    journal_result(journal, summarizer, first)
+    if not first.ok:
+        failed += 1
+        print(f"❌ Error generating summary for {first.topic}: {first.error}")
+
+    for result in pending:
+        result = result._replace(index=result.index + 1)
+        journal_result(journal, summarizer, result)
+        if not result.ok:
+            failed += 1
+            print(f"❌ Error generating summary for {result.topic}: {result.error}")
+        print(format_response(result.topic, result.summary))
+
+    return failed
+
+def plan_and_summarize_topic(planner, summarizer, topic, journal):
+    """Summarize subtopics while the plan is still being written; returns the failed count"""
+    print(f"\n🧩 Planning '{topic}' and summarizing subtopics as they arrive...\n")
+    print("-" * 50)
+    
+    failed = 0
+    for result in plan_and_summarize(planner, summarizer, topic):
+        journal_result(journal, summarizer, result)
+        if not result.ok:
+            failed += 1
+            print(f"❌ Error generating summary for {result.topic}: {result.error}")
+        print(format_response(result.topic, result.summary))
+
+    return failed
+
+def search_history(index):
+    """Look up summaries from earlier sessions by topic or keyword"""
+    query = input("🔎 Topic or keywords to look up: ").strip()
+    if not query:
+        print("❌ Nothing to search for.")
+        return
+    since = input("🗓️ Only sessions since (e.g. 7d, 2024-12-18, blank for all): ").strip()
+    try:
+        since = parse_since(since) if since else None
+    except ValueError:
+        print("⚠️ Could not read that date. Searching all sessions.")
+        since = None
+
+    # An exact topic match is what "what did I get for X" means; fall back to keywords
+    entries = index.find_topic(query, since=since) or index.search(query, since=since)
+    print_entries(entries, full=len(entries) == 1)
+    if len(entries) > 1 and input("\n📖 Show the most relevant summary? (y/n): ").strip().lower() in ['y', 'yes']:
+        print_entries(entries[:1], full=True)
+
+def read_topic_lines(stream):
+    """Topics from a file, one per line; blank lines and # comments are skipped"""
+    return [line.strip() for line in stream if line.strip() and not line.lstrip().startswith('#')]
+
+def collect_batch_topics(args, planner):
+    """Topics named by the batch arguments, in order and without duplicates"""
+    topics = []
+    for category in args.category:
+        if category not in planner.syllabus:
+            raise ValueError(f"Unknown category: {category} (choose from {', '.join(planner.syllabus)})")
+        topics += planner.get_topics_by_category(category)
+    for keywords in args.keywords:
+        topics += planner.filter_topics_by_keywords([k.strip() for k in keywords.split(',') if k.strip()])
+
+    named = list(args.topic)
+    for path in args.topics_file:
+        if path == '-':
+            named += read_topic_lines(sys.stdin)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                named += read_topic_lines(f)
+    if not (args.category or args.keywords or args.topic or args.topics_file):
+        named += read_topic_lines(sys.stdin)
+
+    if args.plan and named:
+        # Ad-hoc topics are broken down into subtopics, several plans at a time
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            named = [subtopic for plan in executor.map(planner.plan_subtopics, named) for subtopic in plan]
+    return list(dict.fromkeys(topics + named))
+
+def progress(message):
+    print(message, file=sys.stderr, flush=True)
+
+def run_batch(args):
+    """Summarize every topic named by the arguments without prompting; returns the exit code"""
+    load_environment()
+    out = sys.stdout
+    # Agents report problems with print(); keep stdout for the summaries themselves
+    with redirect_stdout(sys.stderr):
+        history = SessionIndex()
+        history.ingest_dir()
+        planner, summarizer = build_agents(create_lazy_client(), history)
+        try:
+            topics = collect_batch_topics(args, planner)
+        except (OSError, ValueError) as e:
+            progress(f"❌ {str(e)}")
+            return EXIT_USAGE
+        if not topics:
+            progress("❌ No topics to summarize.")
+            return EXIT_USAGE
+
+        to_stdout = args.output == '-'
+        output_dir = tempfile.mkdtemp(prefix='revision_batch_') if to_stdout else args.output
+        journal = SessionLog.create(output_dir, prefix=args.name)
+        progress(f"📝 Summarizing {len(topics)} topic(s) with {args.jobs} job(s)...")
+        start = time.perf_counter()
+        failed = 0
+        try:
+            results = summarizer.summarize_many(topics, max_concurrency=args.jobs, batched=args.batched)
+            for done, result in enumerate(results, 1):
+                record = journal_result(journal, summarizer, result)
+                if to_stdout and args.format == 'jsonl':
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                if result.ok:
+                    progress(f"[{done}/{len(topics)}] ✅ {result.topic}")
+                else:
+                    failed += 1
+                    progress(f"[{done}/{len(topics)}] ❌ {result.topic}: {result.error}")
+        except KeyboardInterrupt:
+            progress(f"⚠️ Interrupted. Summaries generated so far are kept in: {journal.path}")
+            return EXIT_INTERRUPTED
+        finally:
+            journal.close()
+
+        if to_stdout:
+            if args.format != 'jsonl':
+                out.writelines(render(journal.path, args.format))
+            journal.discard()
+            os.rmdir(output_dir)
+        else:
+            if args.format != 'jsonl':
+                progress(f"📄 Revision pack: {export(journal.path, args.format)}")
+            progress(f"🗃️ Structured log: {journal.path}")
+            history.ingest_file(journal.path)
+
+        progress(f"⏱️ {len(topics) - failed} of {len(topics)} summaries in {time.perf_counter() - start:.1f}s")
+        progress(format_rollup(summarizer.telemetry.rollup()))
+
+    if failed:
+        progress(f"⚠️ {failed} of {len(topics)} summaries could not be generated.")
+        return EXIT_FAILED if failed == len(topics) else EXIT_PARTIAL
+    return EXIT_OK
+
+def list_topics(args):
+    """Print syllabus topics, one per line, without loading any model code"""
+    snapshot = get_syllabus()
+    if args.keywords:
+        topics = snapshot.index.search([k.strip() for k in args.keywords.split(',') if k.strip()])
+    elif args.category:
+        if args.category not in snapshot.categories:
+            print(f"❌ Unknown category: {args.category} (choose from {', '.join(snapshot.categories)})",
+                  file=sys.stderr)
+            return EXIT_USAGE
+        topics = snapshot.categories[args.category]
+    else:
+        topics = snapshot.topics
+    for topic in topics:
+        print(topic)
+    return EXIT_OK
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="AI Revision Agent. Run without arguments for an interactive session."
+    )
+    commands = parser.add_subparsers(dest='command')
+    topics = commands.add_parser('topics', help="list syllabus topics, one per line")
+    topics.add_argument('--category', help="only this category")
+    topics.add_argument('--keywords', help="comma-separated keywords, most relevant first")
+
+    batch = commands.add_parser(
+        'batch', help="summarize topics without prompting",
+        description="Generate a revision pack non-interactively. Topics come from --category, "
+                    "--keywords, --topic and --topics-file, or from stdin (one per line) when none is given. "
+                    f"Exit code: {EXIT_OK} all summarized, {EXIT_PARTIAL} some failed, "
+                    f"{EXIT_USAGE} bad input, {EXIT_FAILED} all failed."
+    )
+    batch.add_argument('--category', action='append', default=[], help="syllabus category (repeatable)")
+    batch.add_argument('--keywords', action='append', default=[],
+                       help="comma-separated keywords matched against the syllabus (repeatable)")
+    batch.add_argument('--topic', action='append', default=[], help="a topic to summarize (repeatable)")
+    batch.add_argument('--topics-file', action='append', default=[],
+                       help="file with one topic per line, - for stdin (repeatable)")
+    batch.add_argument('--plan', action='store_true',
+                       help="break --topic and file topics into subtopics with the planner first")
+    batch.add_argument('--jobs', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                       help="summaries generated at once (default: %(default)s)")
+    batch.add_argument('--batched', action='store_true',
+                       help="send several topics per request; fewer calls, summaries arrive in groups")
+    batch.add_argument('--output', default='-',
+                       help="directory for the journal and revision pack, or - for stdout (default)")
+    batch.add_argument('--format', choices=['jsonl', 'txt', 'md'], default='jsonl',
+                       help="jsonl streams one record per summary as it finishes (default: %(default)s)")
+    batch.add_argument('--name', default='revision_pack', help="file name prefix in --output")
+    args = parser.parse_args(argv)
+    if args.command == 'batch' and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    return args
+
+def interactive():
+    # Load environment variables
+    load_environment()
     
     print_banner()
     
@@ -21,17 +285,20 @@ def main():
     print("🔍 Choose your revision mode:")
     print("1. Full revision (all topics)")
     print("2. Keyword-based revision (filtered topics)")
+    print("3. Search past sessions")
     
-    mode = input("Enter your choice (1/2) or (full/keyword): ").strip().lower()
+    mode = input("Enter your choice (1/2/3) or (full/keyword/history): ").strip().lower()
+    
+    # Past sessions are indexed incrementally, so only new logs are read
+    history = SessionIndex()
+    history.ingest_dir()
+    if mode in ['3', 'history']:
+        search_history(history)
+        return
     
     # Initialize OpenRouter client
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENROUTER_API_KEY")
-    )
-
-    planner = PlannerAgent(client)
-    summarizer = SummarizerAgent(client)
+    planner, summarizer = build_agents(create_lazy_client(), history)
+    telemetry = summarizer.telemetry
 
     if mode in ['2', 'keyword']:
         # Keyword-based revision
@@ -46,30 +313,56 @@ def main():
             print(f"\n🎯 Found {len(topics)} topics matching your keywords:")
             for i, topic in enumerate(topics, 1):
                 print(f"  {i}. {topic}")
+        pipelined = False
     else:
         # Full revision mode
         topic = input("📚 Enter a topic you want to revise: ")
-        topics = planner.plan_subtopics(topic)
+        pipelined = input("⚡ Start summaries while the plan is still being written? (y/n): ").strip().lower() in ['y', 'yes']
+        topics = [topic] if pipelined else planner.plan_subtopics(topic)
 
     if not topics:
         print("❌ No topics found. Please try different keywords or check your input.")
         return
 
-    print(f"\n📝 Generating summaries for {len(topics)} topic(s)...\n")
-    print("-" * 50)
-    
-    summaries = []
-    for topic_item in topics:
-        answer = summarizer.summarize(topic_item)
-        summaries.append(answer)
-        print(format_response(topic_item, answer))
+    # Summaries are journaled as they arrive, so an interrupted run keeps its progress
+    journal = SessionLog.create()
+    try:
+        if pipelined:
+            failed = plan_and_summarize_topic(planner, summarizer, topics[0], journal)
+        else:
+            failed = summarize_topics(summarizer, topics, journal)
+    except KeyboardInterrupt:
+        print(f"\n⚠️ Interrupted. Summaries generated so far are kept in: {journal.path}")
+        return
+    finally:
+        journal.close()
+
+    if failed:
+        print(f"⚠️ {failed} of {journal.count} summaries could not be generated.")
     
+    stats = summarizer.cache.stats()
+    print(f"🗄️ Cache: {stats['hits']} hit(s), {stats['misses']} miss(es), {stats['entries']} stored summaries")
+    print(format_rollup(telemetry.rollup()))
+
     # Ask user if they want to save the session
     save_choice = input("\n💾 Save this revision session to file? (y/n): ").strip().lower()
     if save_choice in ['y', 'yes']:
-        save_session_log(topics, summaries)
+        print(f"📄 Session saved to: {export(journal.path)}")
+        print(f"🗃️ Structured log: {journal.path}")
+        history.ingest_file(journal.path)
+    else:
+        journal.discard()
     
     print("\n✅ Revision session completed! Happy studying! 📚")
 
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'batch':
+        return run_batch(args)
+    if args.command == 'topics':
+        return list_topics(args)
+    interactive()
+    return EXIT_OK
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
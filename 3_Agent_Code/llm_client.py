@@ -0,0 +1,252 @@
+# LLM Client
+
+# Factory for the OpenRouter client shared by the agents, with a cap on in-flight requests.
+
+# llm_client.py
+
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    import asyncio
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+class _ReleasingStream:
+    """Iterates a streaming response and releases its slot exactly once when done"""
+
+    def __init__(self, stream, release):
+        self._released = False
+        self._release = release
+        self._stream = stream
+        self._iterator = iter(stream)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._release()
+            close = getattr(self._stream, 'close', None)
+            if close is not None:
+                close()
+
+    def __del__(self):
+        self.close()
+
+
+class _BoundedCompletions:
+    def __init__(self, completions, slots: threading.BoundedSemaphore):
+        self._completions = completions
+        self._slots = slots
+
+    def create(self, **kwargs):
+        self._slots.acquire()
+        try:
+            response = self._completions.create(**kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        if kwargs.get('stream'):
+            # A stream occupies its slot until it has been read to the end
+            return _ReleasingStream(response, self._slots.release)
+        self._slots.release()
+        return response
+
+
+class _BoundedChat:
+    def __init__(self, chat, slots: threading.BoundedSemaphore):
+        self.completions = _BoundedCompletions(chat.completions, slots)
+
+
+class BoundedClient:
+    """Wraps an OpenAI-compatible client so at most ``max_in_flight`` requests run at once.
+
+    One instance is meant to be shared process-wide: it keeps a single HTTP
+    connection pool alive and the cap applies across every agent using it.
+    """
+
+    def __init__(self, client, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self.chat = _BoundedChat(client.chat, self._slots)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class _AsyncReleasingStream:
+    """Async counterpart of _ReleasingStream"""
+
+    def __init__(self, stream, release):
+        self._released = False
+        self._release = release
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            await self.close()
+            raise
+
+    async def close(self):
+        if not self._released:
+            self._released = True
+            self._release()
+            close = getattr(self._stream, 'close', None)
+            if close is not None:
+                await close()
+
+
+class _AsyncBoundedCompletions:
+    def __init__(self, completions, owner: 'AsyncBoundedClient'):
+        self._completions = completions
+        self._owner = owner
+
+    async def create(self, **kwargs):
+        slots = self._owner.slots()
+        await slots.acquire()
+        try:
+            response = await self._completions.create(**kwargs)
+        except BaseException:
+            slots.release()
+            raise
+        if kwargs.get('stream'):
+            return _AsyncReleasingStream(response, slots.release)
+        slots.release()
+        return response
+
+
+class _AsyncBoundedChat:
+    def __init__(self, chat, owner: 'AsyncBoundedClient'):
+        self.completions = _AsyncBoundedCompletions(chat.completions, owner)
+
+
+class AsyncBoundedClient:
+    """BoundedClient for AsyncOpenAI: waiting for a slot suspends the task, not a thread.
+
+    The semaphore is created on first use so it belongs to the event loop
+    that runs the requests.
+    """
+
+    def __init__(self, client, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self._slots = None
+        self.chat = _AsyncBoundedChat(client.chat, self)
+
+    def slots(self) -> 'asyncio.Semaphore':
+        if self._slots is None:
+            import asyncio
+
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self._slots
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class LazyClient:
+    """Stands in for a client and creates it on first use.
+
+    Importing openai and setting up its connection pool is the slowest part
+    of startup, and runs that only list topics or hit the cache never need it.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def _client_options(api_key: Optional[str], base_url: Optional[str]) -> dict:
+    headers = {}
+    if os.getenv("OPENROUTER_HTTP_REFERER"):
+        headers["HTTP-Referer"] = os.getenv("OPENROUTER_HTTP_REFERER")
+    if os.getenv("OPENROUTER_X_TITLE"):
+        headers["X-Title"] = os.getenv("OPENROUTER_X_TITLE")
+    return {
+        'base_url': base_url or os.getenv("OPENROUTER_BASE_URL") or OPENROUTER_BASE_URL,
+        'api_key': api_key or os.getenv("OPENROUTER_API_KEY"),
+        'default_headers': headers or None,
+        # Retries are handled by the shared CallScheduler
+        'max_retries': 0,
+    }
+
+
+def needs_api_key() -> bool:
+    """False when REVISION_REPLAY_MODE=replay answers every request from a recording"""
+    from replay import replay_mode
+
+    return replay_mode() != 'replay'
+
+
+def create_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                  max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> BoundedClient:
+    """Create the OpenRouter client used by the agents.
+
+    REVISION_REPLAY_MODE=record saves every reply to REVISION_REPLAY_FILE;
+    replay answers from that file instead, without a key or network.
+    """
+    from replay import ReplayClient, RecordingClient, open_store, replay_mode, replay_timing
+
+    mode = replay_mode()
+    if mode == 'replay':
+        return BoundedClient(ReplayClient(open_store(), replay_timing()), max_in_flight)
+
+    from openai import OpenAI
+
+    client = OpenAI(**_client_options(api_key, base_url))
+    if mode == 'record':
+        client = RecordingClient(client, open_store())
+    return BoundedClient(client, max_in_flight)
+
+
+def create_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> AsyncBoundedClient:
+    """Create the AsyncOpenAI-based client used by the async agents; replay modes as in create_client()"""
+    from replay import AsyncReplayClient, AsyncRecordingClient, open_store, replay_mode, replay_timing
+
+    mode = replay_mode()
+    if mode == 'replay':
+        return AsyncBoundedClient(AsyncReplayClient(open_store(), replay_timing()), max_in_flight)
+
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(**_client_options(api_key, base_url))
+    if mode == 'record':
+        client = AsyncRecordingClient(client, open_store())
+    return AsyncBoundedClient(client, max_in_flight)
+
+
+def create_lazy_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                       max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> LazyClient:
+    """create_client(), deferred until the first request"""
+    return LazyClient(lambda: create_client(api_key, base_url, max_in_flight))
@@ -0,0 +1,231 @@
+# Memory Store
+
+# Bounded session memory for the summarizer: LRU-evicted records with optional spill to disk.
+
+# memory_store.py
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+# Every live store, for memory_report()
+_stores = weakref.WeakSet()
+_stores_lock = threading.Lock()
+
+
+def default_context(topic: str) -> str:
+    """Context sent with a topic that was already explained this session"""
+    return f"Previously explained {topic}"
+
+
+def _int_from_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class MemoryRecord:
+    """One remembered topic; ``context`` None stands for default_context(topic)"""
+    __slots__ = ('summary', 'context', 'created', 'size')
+
+    def __init__(self, summary: Optional[str], context: Optional[str], created: float, size: int):
+        self.summary = summary
+        self.context = context
+        self.created = created
+        self.size = size
+
+
+def _record_size(topic: str, summary: Optional[str], context: Optional[str]) -> int:
+    """Bytes a record keeps alive: its key, strings and the record object itself"""
+    size = sys.getsizeof(topic) + MemoryRecord.__basicsize__
+    for value in (summary, context):
+        if value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class MemoryStore:
+    """Session memory of one SummarizerAgent, capped by entries and bytes.
+
+    The least recently used topics are evicted first. With ``spill_dir``,
+    evicted topics are written to a private SQLite file and read back on
+    their next use. The file is deleted when the store is closed or
+    garbage collected.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 spill_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._records: 'OrderedDict[str, MemoryRecord]' = OrderedDict()
+        self._spill = None
+        self._finalizer = None
+        self.bytes = 0
+        self.evictions = 0
+        self.spilled = 0
+        self.restored = 0
+        with _stores_lock:
+            _stores.add(self)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, topic: str) -> bool:
+        return self.get(topic) is not None
+
+    def put(self, topic: str, summary: Optional[str] = None, context: Optional[str] = None,
+            created: Optional[float] = None):
+        """Remember a topic; ``context`` defaults to default_context(topic)"""
+        if context == default_context(topic):
+            context = None
+        record = MemoryRecord(summary, context, time.monotonic() if created is None else created,
+                              _record_size(topic, summary, context))
+        with self._lock:
+            old = self._records.pop(topic, None)
+            if old is not None:
+                self.bytes -= old.size
+            self._records[topic] = record
+            self.bytes += record.size
+            self._evict()
+
+    def get(self, topic: str) -> Optional[MemoryRecord]:
+        with self._lock:
+            record = self._records.get(topic)
+            if record is not None:
+                self._records.move_to_end(topic)
+                return record
+            if self._spill is None:
+                return None
+            row = self._spill.execute(
+                "SELECT summary, context, created FROM memory WHERE topic = ?", (topic,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._spill.execute("DELETE FROM memory WHERE topic = ?", (topic,))
+            self.restored += 1
+        self.put(topic, *row)
+        return self.get(topic)
+
+    def as_dict(self, topic: str) -> Dict[str, Any]:
+        """The record in the shape SummarizerAgent.get_from_memory() has always returned"""
+        record = self.get(topic)
+        if record is None:
+            return {}
+        memory = {'timestamp': record.created}
+        if record.summary is not None:
+            memory['summary'] = record.summary
+        context = default_context(topic) if record.context is None else record.context
+        if context:
+            memory['context'] = context
+        return memory
+
+    def _evict(self):
+        """Drop least recently used records until both caps hold; the newest always stays"""
+        while len(self._records) > 1 and (len(self._records) > self.max_entries or self.bytes > self.max_bytes):
+            topic, record = self._records.popitem(last=False)
+            self.bytes -= record.size
+            self.evictions += 1
+            if self.spill_dir is not None:
+                self._write_spill(topic, record)
+
+    def _write_spill(self, topic: str, record: MemoryRecord):
+        if self._spill is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix='session_memory_', suffix='.sqlite', dir=self.spill_dir)
+            os.close(fd)
+            self._spill = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._spill.execute("PRAGMA journal_mode=OFF")
+            self._spill.execute(
+                "CREATE TABLE memory (topic TEXT PRIMARY KEY, summary TEXT, context TEXT, created REAL)"
+            )
+            self._finalizer = weakref.finalize(self, _remove_file, path)
+        self._spill.execute("INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?)",
+                            (topic, record.summary, record.context, record.created))
+        self.spilled += 1
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self.bytes = 0
+            if self._spill is not None:
+                self._spill.execute("DELETE FROM memory")
+
+    def close(self):
+        """Forget everything and delete the spill file"""
+        with self._lock:
+            self._records.clear()
+            self.bytes = 0
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+                self._finalizer()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            spilled_now = (self._spill.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+                           if self._spill is not None else 0)
+            return {
+                'entries': len(self._records),
+                'bytes': self.bytes,
+                'evictions': self.evictions,
+                'on_disk': spilled_now,
+                'restored': self.restored,
+            }
+
+
+def memory_from_env() -> MemoryStore:
+    """MemoryStore sized by SUMMARY_MEMORY_MAX_ENTRIES / SUMMARY_MEMORY_MAX_BYTES, spilling to SUMMARY_MEMORY_SPILL_DIR"""
+    return MemoryStore(
+        max_entries=_int_from_env("SUMMARY_MEMORY_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+        max_bytes=_int_from_env("SUMMARY_MEMORY_MAX_BYTES", DEFAULT_MAX_BYTES),
+        spill_dir=os.getenv("SUMMARY_MEMORY_SPILL_DIR") or None,
+    )
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size on Linux; None elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def memory_report() -> Dict[str, Any]:
+    """Totals over every live MemoryStore in the process, with the process RSS"""
+    with _stores_lock:
+        stores = list(_stores)
+    report = {'stores': len(stores), 'entries': 0, 'bytes': 0, 'evictions': 0, 'on_disk': 0, 'restored': 0}
+    for store in stores:
+        for key, value in store.stats().items():
+            report[key] += value
+    report['rss_bytes'] = _rss_bytes()
+    return report
+
+
+def format_memory_report(report: Dict[str, Any]) -> str:
+    """One-line memory summary"""
+    rss = f", process RSS {report['rss_bytes'] / 1024 ** 2:.0f} MB" if report.get('rss_bytes') else ""
+    return (
+        f"🧠 Session memory: {report['entries']} topics in {report['stores']} session(s), "
+        f"{report['bytes'] / 1024:.0f} KB ({report['evictions']} evicted, {report['on_disk']} on disk){rss}"
+    )
@@ -0,0 +1,341 @@
+# Model Router
+
+# Chooses the model for each call from live latency and error statistics, with fallback and hedged requests.
+
+# model_router.py
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telemetry import MODEL_PRICES
+
+# The first model is the agent's primary: its name keys the caches
+DEFAULT_SUMMARIZER_MODELS = ("openai/gpt-3.5-turbo", "openai/gpt-4o-mini")
+# Listing subtopics is a short task; the cheaper, faster model is enough
+DEFAULT_PLANNER_MODELS = ("openai/gpt-4o-mini", "openai/gpt-3.5-turbo")
+
+# Seconds one model may take, retries included, before the next one is tried
+DEFAULT_ATTEMPT_TIMEOUT = 45.0
+# Latencies and outcomes remembered per model
+LATENCY_WINDOW = 100
+OUTCOME_WINDOW = 20
+# Latencies needed before a model is ranked on them or hedged at its p95
+MIN_SAMPLES = 20
+# Stalls common enough to reach the p95 would never be hedged; wait at most this many medians
+HEDGE_MEDIAN_MULTIPLE = 3.0
+# A model that failed this many calls in a row is skipped for a while
+FAILURES_BEFORE_COOLDOWN = 3
+COOLDOWN_SECONDS = 30.0
+# At most this share of calls may send a hedge request
+MAX_HEDGE_RATE = 0.1
+# Seconds of latency worth $1 more per million completion tokens
+COST_WEIGHT = 0.05
+HEDGE_WORKERS = 32
+
+
+def models_from_env(name: str, default: Iterable[str]) -> Tuple[str, ...]:
+    """Comma-separated candidate models from an environment variable, if set"""
+    models = tuple(model.strip() for model in os.getenv(name, "").split(",") if model.strip())
+    return models or tuple(default)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+class ModelStats:
+    """Recent latencies and outcomes of one candidate model"""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=OUTCOME_WINDOW)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+
+    @property
+    def success_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 1.0
+
+    def as_dict(self) -> Dict[str, float]:
+        latencies = list(self.latencies)
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'success_rate': self.success_rate,
+            'p50_latency_seconds': _percentile(latencies, 0.5) if latencies else 0.0,
+            'p95_latency_seconds': _percentile(latencies, 0.95) if latencies else 0.0,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'fallbacks': self.fallbacks,
+        }
+
+
+class ModelRouter:
+    """Routes one agent's calls across its candidate models.
+
+    Each call goes to the model expected to answer fastest, which is its
+    median latency divided by its recent success rate, plus a small
+    penalty for price. Models without enough samples keep their configured
+    order, after the measured ones. When a model fails or times out, the next
+    one is tried. If a non-streamed call has not answered within its model's
+    p95 latency (at most three times its median), the same request is also
+    sent to the next model, for at most one call in ten. The first
+    answer wins. An async loser is cancelled. A synchronous loser cannot be,
+    so it finishes in the background; its answer feeds the statistics and
+    is passed to ``on_discarded`` so the tokens it cost are still counted.
+
+    Streams are routed and fall back only if opening them fails. The time to
+    open a stream says little about the whole reply, so streams add no
+    latency samples and are never hedged.
+    """
+
+    def __init__(self, models: Iterable[str], attempt_timeout: float = DEFAULT_ATTEMPT_TIMEOUT,
+                 hedging: bool = True, max_hedge_rate: float = MAX_HEDGE_RATE,
+                 cost_weight: float = COST_WEIGHT):
+        self.models = tuple(models)
+        if not self.models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.attempt_timeout = attempt_timeout
+        self.hedging = hedging
+        self.max_hedge_rate = max_hedge_rate
+        self.cost_weight = cost_weight
+        self._lock = threading.Lock()
+        self._stats = {model: ModelStats() for model in self.models}
+        self._executor = None
+        self.calls = 0
+        self.hedges = 0
+
+    @property
+    def primary(self) -> str:
+        return self.models[0]
+
+    def _score(self, model: str) -> Tuple[int, float]:
+        stats = self._stats[model]
+        if len(stats.latencies) < MIN_SAMPLES:
+            return 1, self.models.index(model)
+        expected = _percentile(list(stats.latencies), 0.5) / max(stats.success_rate, 0.05)
+        return 0, expected + self.cost_weight * MODEL_PRICES.get(model, (0.0, 0.0))[1]
+
+    def ranked(self) -> List[str]:
+        """Candidates in the order they would be tried now; cooling-down models last"""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.models, key=lambda model: (self._stats[model].cooldown_until > now,
+                                                          self._score(model)))
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait for ``model`` before hedging, or None when a hedge is not allowed"""
+        if not self.hedging:
+            return None
+        with self._lock:
+            latencies = list(self._stats[model].latencies)
+            if len(latencies) < MIN_SAMPLES or self.hedges >= self.max_hedge_rate * self.calls:
+                return None
+        return min(_percentile(latencies, 0.95), HEDGE_MEDIAN_MULTIPLE * _percentile(latencies, 0.5))
+
+    def _take_hedge(self, model: str) -> bool:
+        with self._lock:
+            if self.hedges >= self.max_hedge_rate * self.calls:
+                return False
+            self.hedges += 1
+            self._stats[model].hedges += 1
+            return True
+
+    def _record(self, model: str, seconds: Optional[float], ok: bool):
+        with self._lock:
+            stats = self._stats[model]
+            stats.calls += 1
+            stats.outcomes.append(ok)
+            if ok:
+                stats.consecutive_failures = 0
+                if seconds is not None:
+                    stats.latencies.append(seconds)
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= FAILURES_BEFORE_COOLDOWN:
+                stats.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def _start_call(self) -> List[str]:
+        with self._lock:
+            self.calls += 1
+        return self.ranked()
+
+    def _fell_back(self, model: str, error: BaseException, candidates: List[str]):
+        with self._lock:
+            self._stats[candidates[0]].fallbacks += 1
+        print(f"⚠️ {model} failed ({str(error) or type(error).__name__}). Trying {candidates[0]}.")
+
+    def _won(self, model: str, primary: str):
+        if model != primary:
+            with self._lock:
+                self._stats[model].hedge_wins += 1
+
+    def _attempt(self, fn: Callable[[str, float], Any], model: str, timed: bool) -> Any:
+        start = time.perf_counter()
+        try:
+            result = fn(model, self.attempt_timeout)
+        except Exception:
+            self._record(model, None, False)
+            raise
+        self._record(model, time.perf_counter() - start if timed else None, True)
+        return result
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='model-hedge')
+            return self._executor
+
+    @staticmethod
+    def _discard(future, model: str, start: float, on_discarded: Callable[[str, Any, float], None]):
+        if not future.cancelled() and future.exception() is None:
+            on_discarded(model, future.result(), time.perf_counter() - start)
+
+    def _race(self, fn: Callable[[str, float], Any], model: str, delay: float,
+              candidates: List[str],
+              on_discarded: Optional[Callable[[str, Any, float], None]] = None) -> Tuple[str, Any]:
+        """Run ``model``; if it is slower than ``delay``, race it against the next candidate"""
+        pool = self._pool()
+        start = time.perf_counter()
+        futures = {pool.submit(self._attempt, fn, model, True): model}
+        done, _ = wait(futures, timeout=delay)
+        if not done and self._take_hedge(model):
+            backup = candidates.pop(0)
+            futures[pool.submit(self._attempt, fn, backup, True)] = backup
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self._won(futures[future], model)
+                if on_discarded is not None:
+                    for loser in pending:
+                        loser.add_done_callback(
+                            lambda loser, name=futures[loser]: self._discard(loser, name, start, on_discarded)
+                        )
+                return futures[future], result
+        raise error
+
+    def call(self, fn: Callable[[str, float], Any], stream: bool = False,
+             on_model: Optional[Callable[[str], None]] = None,
+             on_discarded: Optional[Callable[[str, Any, float], None]] = None) -> Any:
+        """Return ``fn(model, timeout)`` from the first candidate that answers.
+
+        ``on_model`` is told which model's answer is returned, and
+        ``on_discarded`` gets (model, answer, seconds) of a losing hedge that
+        answered later. The last error is raised once every candidate has
+        failed.
+        """
+        candidates = self._start_call()
+        while True:
+            model = candidates.pop(0)
+            delay = self._hedge_delay(model) if candidates and not stream else None
+            try:
+                if delay is None:
+                    result = self._attempt(fn, model, timed=not stream)
+                else:
+                    model, result = self._race(fn, model, delay, candidates, on_discarded)
+            except Exception as e:
+                if not candidates:
+                    raise
+                self._fell_back(model, e, candidates)
+                continue
+            if on_model is not None:
+                on_model(model)
+            return result
+
+    async def _aattempt(self, fn: Callable[[str, float], Awaitable[Any]], model: str,
+                        timeout: Optional[float], timed: bool) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await fn(model, self.attempt_timeout if timeout is None else min(timeout, self.attempt_timeout))
+        except Exception:
+            self._record(model, None, False)
+            raise
+        self._record(model, time.perf_counter() - start if timed else None, True)
+        return result
+
+    async def _arace(self, fn: Callable[[str, float], Awaitable[Any]], model: str, delay: float,
+                     candidates: List[str], timeout: Optional[float]) -> Tuple[str, Any]:
+        """_race() for coroutines; the losing request is cancelled"""
+        import asyncio
+
+        tasks = {asyncio.ensure_future(self._aattempt(fn, model, timeout, True)): model}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._take_hedge(model):
+                backup = candidates.pop(0)
+                tasks[asyncio.ensure_future(self._aattempt(fn, backup, timeout, True))] = backup
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self._won(tasks[task], model)
+                    return tasks[task], task.result()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def acall(self, fn: Callable[[str, float], Awaitable[Any]], stream: bool = False,
+                    on_model: Optional[Callable[[str], None]] = None,
+                    timeout: Optional[float] = None) -> Any:
+        """call() for coroutines: ``await fn(model, timeout)``; no attempt outlives ``timeout``"""
+        candidates = self._start_call()
+        while True:
+            model = candidates.pop(0)
+            delay = self._hedge_delay(model) if candidates and not stream else None
+            try:
+                if delay is None:
+                    result = await self._aattempt(fn, model, timeout, timed=not stream)
+                else:
+                    model, result = await self._arace(fn, model, delay, candidates, timeout)
+            except Exception as e:
+                if not candidates:
+                    raise
+                self._fell_back(model, e, candidates)
+                continue
+            if on_model is not None:
+                on_model(model)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'models': {model: stats.as_dict() for model, stats in self._stats.items()},
+            }
+
+
+def _hedging_from_env() -> bool:
+    return os.getenv("MODEL_HEDGING", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+# Process-wide routers, so every session's calls feed the same statistics
+shared_summarizer_router = ModelRouter(models_from_env("SUMMARIZER_MODELS", DEFAULT_SUMMARIZER_MODELS),
+                                       hedging=_hedging_from_env())
+shared_planner_router = ModelRouter(models_from_env("PLANNER_MODELS", DEFAULT_PLANNER_MODELS),
+                                    hedging=_hedging_from_env())
@@ -0,0 +1,124 @@
+# Pipeline
+
+# Runs planning and summarizing as overlapping stages for ad-hoc topics.
+
+# pipeline.py
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+from planner_agent import PlannerAgent
+from summarizer_agent import DEFAULT_MAX_CONCURRENCY, SummarizerAgent, SummaryResult
+
+DEFAULT_QUEUE_DEPTH = 2
+# How often blocked stages look for a stop request, in seconds
+STOP_POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+def plan_and_summarize(planner: PlannerAgent, summarizer: SummarizerAgent, user_topic: str,
+                       max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                       max_queue: int = DEFAULT_QUEUE_DEPTH,
+                       stop: Optional[threading.Event] = None) -> Iterator[SummaryResult]:
+    """Plan a topic and summarize each subtopic as soon as the planner emits it.
+
+    The planner streams its reply into a queue of at most ``max_queue``
+    subtopics; a dispatcher hands them to up to ``max_concurrency``
+    summarizer workers. Results are yielded as they finish, with ``index``
+    giving the position of the subtopic in the plan.
+
+    Setting ``stop``, or leaving the loop early, stops both stages: the
+    plan stream is closed and subtopics not yet started are dropped.
+    Summaries already being generated finish in the background.
+    """
+    # Set when the consumer leaves; the caller's ``stop`` is only read
+    left = threading.Event()
+
+    def stopping() -> bool:
+        return left.is_set() or (stop is not None and stop.is_set())
+
+    subtopics = queue.Queue(maxsize=max(1, max_queue))
+    results = queue.Queue()
+    slots = threading.Semaphore(max(1, max_concurrency))
+
+    def put(item) -> bool:
+        """Queue a subtopic once there is room; False if stopped first"""
+        while not stopping():
+            try:
+                subtopics.put(item, timeout=STOP_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def plan():
+        stream = planner.plan_subtopics_stream(user_topic)
+        try:
+            for subtopic in stream:
+                if not put(subtopic):
+                    break
+        finally:
+            stream.close()
+            put(_DONE)
+
+    def finished(index: int, subtopic: str, future):
+        slots.release()
+        if future.cancelled():
+            return
+        try:
+            results.put(SummaryResult(index, subtopic, future.result()))
+        except Exception as e:
+            results.put(SummaryResult(index, subtopic, summarizer.fallback_message(subtopic), str(e)))
+
+    def next_subtopic():
+        """The next subtopic once a worker is free, _DONE at the end, or None if stopped"""
+        # Only take the next subtopic once a worker is free, so the queue
+        # applies back-pressure to the planner
+        while not slots.acquire(timeout=STOP_POLL_SECONDS):
+            if stopping():
+                return None
+        while not stopping():
+            try:
+                return subtopics.get(timeout=STOP_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        slots.release()
+        return None
+
+    def dispatch():
+        executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+        futures = []
+        try:
+            index = 0
+            while True:
+                subtopic = next_subtopic()
+                if subtopic is None or subtopic is _DONE:
+                    break
+                future = executor.submit(summarizer.generate, subtopic)
+                future.add_done_callback(
+                    lambda f, index=index, subtopic=subtopic: finished(index, subtopic, f)
+                )
+                futures.append(future)
+                index += 1
+        finally:
+            if stopping():
+                for future in futures:
+                    future.cancel()
+            # Every result is queued before _DONE unless the consumer has gone
+            executor.shutdown(wait=not stopping())
+            results.put(_DONE)
+
+    threading.Thread(target=plan, name="plan-stage", daemon=True).start()
+    threading.Thread(target=dispatch, name="summarize-stage", daemon=True).start()
+
+    try:
+        while True:
+            result = results.get()
+            if result is _DONE:
+                return
+            yield result
+    finally:
+        left.set()
@@ -4,73 +4,318 @@
 
 # planner_agent.py
 
-from openai import OpenAI
 import json
-import os
-from typing import List
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Mapping, Optional, Tuple
+from model_router import ModelRouter, shared_planner_router
+from scheduler import CallScheduler, estimate_tokens, shared_scheduler
+from syllabus_store import SyllabusSnapshot, get_syllabus
+from telemetry import CallTracker, Telemetry
+from topic_index import TopicIndex, tokenize
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Completion tokens reserved per plan when rate limiting
+PLAN_TOKEN_ESTIMATE = 150
+MAX_SUBTOPICS = 5
+MAX_SUBTOPIC_LENGTH = 120
+
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+?)\s*$")
+
+
+def normalize_topic(topic: str) -> str:
+    """Cache key for a free-form topic: case, spacing and punctuation do not matter"""
+    return " ".join(tokenize(topic))
+
+
+def _clean_subtopics(items) -> List[str]:
+    """Keep distinct, non-empty, reasonably short strings, at most MAX_SUBTOPICS"""
+    subtopics = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, str):
+            continue
+        item = " ".join(item.split()).strip(" .")
+        key = item.lower()
+        if not item or len(item) > MAX_SUBTOPIC_LENGTH or key in seen:
+            continue
+        seen.add(key)
+        subtopics.append(item)
+        if len(subtopics) == MAX_SUBTOPICS:
+            break
+    return subtopics
+
+
+def parse_subtopics(content: str) -> List[str]:
+    """Extract subtopics from the planner's reply.
+
+    The reply should be a JSON object {"subtopics": [...]} (a bare array is
+    accepted too). If it is not valid JSON, only bulleted or numbered lines
+    are used, so preambles and closing remarks never become subtopics.
+    """
+    content = content or ""
+    start = min((i for i in (content.find("{"), content.find("[")) if i != -1), default=-1)
+    if start != -1:
+        end = max(content.rfind("}"), content.rfind("]"))
+        try:
+            data = json.loads(content[start:end + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            data = data.get("subtopics")
+        if isinstance(data, list):
+            return _clean_subtopics(data)
+
+    items = []
+    for line in content.splitlines():
+        match = _LIST_ITEM_RE.match(line)
+        if match:
+            items.append(match.group(1).strip("*_ "))
+    return _clean_subtopics(items)
+
+
+class StreamingSubtopicParser:
+    """Pulls subtopics out of a JSON reply while it is still arriving.
+
+    Every string inside the first JSON array is returned by feed() as soon
+    as its closing quote arrives, so callers can act on the first subtopic
+    before the model has finished writing the rest.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._in_array = False
+        self._in_string = False
+        self._escaped = False
+        self._current = []
+
+    def feed(self, chunk: str) -> List[str]:
+        self.text += chunk
+        completed = []
+        for char in chunk:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._in_array:
+                        try:
+                            completed.append(json.loads('"' + "".join(self._current) + '"'))
+                        except ValueError:
+                            pass
+                    self._current = []
+                    continue
+                self._current.append(char)
+            elif char == '"':
+                self._in_string = True
+            elif char == "[":
+                self._in_array = True
+            elif char == "]":
+                self._in_array = False
+        return completed
+
+
+class PlanCache:
+    """Bounded, thread-safe LRU of plans keyed by normalized topic"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 24 * 60 * 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, key: str, subtopics: List[str]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), tuple(subtopics))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Process-wide so every session benefits from plans made by the others
+shared_plan_cache = PlanCache()
 
 class PlannerAgent:
-    def __init__(self, client: OpenAI):
+    def __init__(self, client: 'OpenAI', scheduler: Optional[CallScheduler] = None,
+                 plan_cache: Optional[PlanCache] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 router: Optional[ModelRouter] = None):
         self.client = client
-        self.syllabus = self._load_syllabus()
+        self.router = router if router is not None else shared_planner_router
+        # Plans are cached under the primary model, whichever candidate wrote them
+        self.model = self.router.primary
+        self.scheduler = scheduler if scheduler is not None else shared_scheduler
+        self.plan_cache = plan_cache if plan_cache is not None else shared_plan_cache
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
         self.system_prompt = (
             "You are a planner agent that breaks down academic topics into 3–5 focused subtopics "
-            "suitable for quick revision before an exam. Keep subtopics concise and specific."
+            "suitable for quick revision before an exam. Keep subtopics concise and specific. "
+            'Respond with only a JSON object of the form {"subtopics": ["...", "..."]} '
+            "and no other text."
         )
 
-    def _load_syllabus(self) -> dict:
-        """Load the syllabus from JSON file"""
-        try:
-            syllabus_path = os.path.join(os.path.dirname(__file__), 'syllabus.json')
-            with open(syllabus_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print("⚠️ Syllabus file not found. Using basic planning mode.")
-            return {}
+    @property
+    def snapshot(self) -> SyllabusSnapshot:
+        """Shared syllabus snapshot; picks up edits to syllabus.json automatically"""
+        return get_syllabus()
+
+    @property
+    def syllabus(self) -> Mapping[str, Tuple[str, ...]]:
+        return self.snapshot.categories
+
+    @property
+    def index(self) -> TopicIndex:
+        return self.snapshot.index
 
     def get_all_topics(self) -> List[str]:
         """Get all topics from the syllabus"""
-        all_topics = []
-        for category, topics in self.syllabus.items():
-            all_topics.extend(topics)
-        return all_topics
+        return list(self.snapshot.topics)
 
     def filter_topics_by_keywords(self, keywords: List[str]) -> List[str]:
-        """Filter syllabus topics based on keywords"""
-        filtered_topics = []
-        all_topics = self.get_all_topics()
-        
-        for topic in all_topics:
-            topic_lower = topic.lower()
-            for keyword in keywords:
-                if keyword.lower() in topic_lower:
-                    if topic not in filtered_topics:
-                        filtered_topics.append(topic)
-                    break
-        
-        return filtered_topics
+        """Filter syllabus topics based on keywords, most relevant first"""
+        return self.index.search(keywords)
 
     def get_topics_by_category(self, category: str) -> List[str]:
         """Get topics from a specific category"""
-        return self.syllabus.get(category, [])
+        return list(self.syllabus.get(category, ()))
 
-    def plan_subtopics(self, user_topic: str) -> List[str]:
-        """Break down a user topic into subtopics using AI"""
-        # First check if the topic exists in syllabus
-        syllabus_topics = self.filter_topics_by_keywords([user_topic])
-        
-        if syllabus_topics:
-            return syllabus_topics[:5]  # Limit to 5 topics
-        
-        # If not in syllabus, use AI to break down
-        messages = [
+    def plan_cache_key(self, user_topic: str) -> str:
+        return f"{self.model}\n{normalize_topic(user_topic)}"
+
+    def _cached_plan(self, user_topic: str) -> Optional[List[str]]:
+        start = time.perf_counter()
+        cached = self.plan_cache.get(self.plan_cache_key(user_topic))
+        if cached is not None:
+            self.telemetry.record_cache_hit('planner', self.model, user_topic,
+                                            time.perf_counter() - start)
+        return cached
+
+    def _plan_messages(self, user_topic: str) -> List[dict]:
+        return [
             {"role": "system", "content": self.system_prompt},
             {"role": "user", "content": f"Break down this topic for revision: {user_topic}"}
         ]
-        response = self.client.chat.completions.create(
-            model="openai/gpt-3.5-turbo",
-            messages=messages,
-            temperature=0.3
+
+    def _plan_params(self, messages: List[dict], model: Optional[str] = None, **kwargs) -> dict:
+        """Arguments of chat.completions.create, shared with the async agent"""
+        return dict(model=model or self.model, messages=messages, temperature=0.3, **kwargs)
+
+    def _create_plan(self, messages: List[dict], call: CallTracker, **kwargs):
+        """Send a planning request to the routed model through the shared rate limiter and retry policy"""
+        return self.router.call(
+            lambda model, attempt_timeout: self.scheduler.call(
+                lambda timeout: self.client.chat.completions.create(
+                    timeout=timeout, **self._plan_params(messages, model, **kwargs)
+                ),
+                estimated_tokens=estimate_tokens(messages, PLAN_TOKEN_ESTIMATE),
+                deadline=attempt_timeout,
+                on_retry=call.retried,
+                model=model
+            ),
+            stream=kwargs.get('stream', False),
+            on_model=call.use_model,
+            on_discarded=call.discarded
         )
-        content = response.choices[0].message.content
-        return [line.strip(" -1234567890. ") for line in content.strip().split("\n") if line.strip()]
+
+    def _known_plan(self, user_topic: str) -> Optional[List[str]]:
+        """Subtopics available without a model call: syllabus matches or a cached plan"""
+        syllabus_topics = self.index.search([user_topic], limit=MAX_SUBTOPICS, phrase_only=True)
+        if syllabus_topics:
+            return syllabus_topics
+        return self._cached_plan(user_topic)
+
+    def _accept_plan(self, user_topic: str, content: Optional[str]) -> List[str]:
+        """Parse the planner's reply and cache the plan; the topic itself if nothing is usable"""
+        subtopics = parse_subtopics(content)
+        if not subtopics:
+            print(f"⚠️ Planner reply for {user_topic} had no usable subtopics. Revising the topic as a whole.")
+            return [user_topic]
+
+        self.plan_cache.put(self.plan_cache_key(user_topic), subtopics)
+        return subtopics
+
+    def plan_subtopics(self, user_topic: str) -> List[str]:
+        """Break down a user topic into subtopics using AI"""
+        # First check if the topic exists in syllabus or was planned before
+        known = self._known_plan(user_topic)
+        if known is not None:
+            return known
+
+        # If not in syllabus, use AI to break down
+        messages = self._plan_messages(user_topic)
+        try:
+            with self.telemetry.track('planner', self.model, user_topic) as call:
+                response = self._create_plan(messages, call)
+                content = response.choices[0].message.content
+                call.record_usage(response.usage, messages, content or "")
+        except Exception as e:
+            # Without a plan the topic itself is still worth summarizing
+            print(f"❌ Error planning subtopics for {user_topic}: {str(e)}")
+            return [user_topic]
+
+        return self._accept_plan(user_topic, content)
+
+    def plan_subtopics_stream(self, user_topic: str) -> Iterator[str]:
+        """Like plan_subtopics, but yields each subtopic as soon as the model has written it"""
+        known = self._known_plan(user_topic)
+        if known is not None:
+            yield from known
+            return
+
+        messages = self._plan_messages(user_topic)
+        parser = StreamingSubtopicParser()
+        subtopics = []
+        try:
+            with self.telemetry.track('planner', self.model, user_topic) as call:
+                stream = self._create_plan(messages, call, stream=True)
+                usage = None
+                for chunk in stream:
+                    usage = getattr(chunk, 'usage', None) or usage
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    call.first_token()
+                    for subtopic in self._new_subtopics(subtopics, parser.feed(chunk.choices[0].delta.content)):
+                        yield subtopic
+                    if len(subtopics) == MAX_SUBTOPICS:
+                        break
+                close = getattr(stream, 'close', None)
+                if close is not None:
+                    close()
+                call.record_usage(usage, messages, parser.text)
+            # Replies that were not JSON are parsed once complete
+            yield from self._new_subtopics(subtopics, parse_subtopics(parser.text))
+        except Exception as e:
+            print(f"❌ Error planning subtopics for {user_topic}: {str(e)}")
+
+        if not subtopics:
+            if parser.text:
+                print(f"⚠️ Planner reply for {user_topic} had no usable subtopics. Revising the topic as a whole.")
+            yield user_topic
+            return
+        self.plan_cache.put(self.plan_cache_key(user_topic), subtopics)
+
+    @staticmethod
+    def _new_subtopics(subtopics: List[str], candidates: Iterable[str]) -> Iterator[str]:
+        """Validate candidates against those already accepted, appending and yielding new ones"""
+        for subtopic in _clean_subtopics(list(subtopics) + list(candidates))[len(subtopics):]:
+            subtopics.append(subtopic)
+            yield subtopic
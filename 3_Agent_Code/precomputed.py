@@ -0,0 +1,107 @@
+# Precomputed Summaries
+
+# Versioned artifact of summaries generated ahead of time by warm.py.
+
+# precomputed.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+FORMAT_VERSION = 1
+DEFAULT_ARTIFACT_PATH = os.path.join(os.path.dirname(__file__), 'precomputed', 'summaries.json')
+
+
+class PrecomputedSummaries:
+    """Summaries for syllabus topics, each tagged with the cache key it was built under.
+
+    An entry is only served while its key matches the caller's current key,
+    so a change of prompt, model or temperature makes it stale automatically.
+    """
+
+    def __init__(self, path: str = DEFAULT_ARTIFACT_PATH):
+        self.path = path
+        self.build = 0
+        self.built_at = None
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_ARTIFACT_PATH) -> 'PrecomputedSummaries':
+        """Load the artifact, or return an empty one if it is missing or unreadable"""
+        store = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return store
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read precomputed summaries ({e}). Ignoring {path}.")
+            return store
+
+        if data.get('format_version') != FORMAT_VERSION:
+            print(f"⚠️ Precomputed summaries use an unsupported format. Ignoring {path}.")
+            return store
+
+        store.build = data.get('build', 0)
+        store.built_at = data.get('built_at')
+        store.entries = data.get('entries', {})
+        return store
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, topic: str, key: str) -> Optional[str]:
+        """Return the stored summary if it was built under the given key"""
+        entry = self.entries.get(topic)
+        if entry and entry.get('key') == key:
+            return entry['summary']
+        return None
+
+    def is_fresh(self, topic: str, key: str, category: str, max_age: Optional[float] = None) -> bool:
+        """True when the entry matches the current key and syllabus category and is young enough"""
+        entry = self.entries.get(topic)
+        if not entry or entry.get('key') != key or entry.get('category') != category:
+            return False
+        if max_age is not None and time.time() - entry.get('generated_at', 0) > max_age:
+            return False
+        return True
+
+    def put(self, topic: str, key: str, category: str, summary: str):
+        with self._lock:
+            self.entries[topic] = {
+                'category': category,
+                'key': key,
+                'summary': summary,
+                'generated_at': time.time(),
+            }
+
+    def prune(self, keep_topics) -> int:
+        """Drop entries for topics that are no longer in the syllabus"""
+        keep_topics = set(keep_topics)
+        with self._lock:
+            removed = [topic for topic in self.entries if topic not in keep_topics]
+            for topic in removed:
+                del self.entries[topic]
+        return len(removed)
+
+    def save(self, bump_build: bool = False):
+        """Write the artifact atomically so an interrupted run leaves a valid file"""
+        with self._lock:
+            if bump_build:
+                self.build += 1
+                self.built_at = datetime.now().isoformat(timespec='seconds')
+            data = {
+                'format_version': FORMAT_VERSION,
+                'build': self.build,
+                'built_at': self.built_at,
+                'entries': self.entries,
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
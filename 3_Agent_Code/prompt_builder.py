@@ -0,0 +1,274 @@
+# Prompt Builder
+
+# Assembles summarizer prompts within an input token budget and sizes max_tokens from the prompt.
+
+# prompt_builder.py
+
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Prompt tokens allowed per summary request, system prompt included
+DEFAULT_INPUT_BUDGET = 400
+# Memory context that would have to be cut below this many tokens is left out
+MIN_CONTEXT_TOKENS = 8
+# Completion tokens when the prompt names no word target
+DEFAULT_MAX_TOKENS = 400
+# Prompt and completion tokens one request may use in total (gpt-3.5-turbo's context window)
+DEFAULT_CONTEXT_WINDOW = 4096
+# English prose averages about 1.3 tokens per word; leave room for the upper end
+TOKENS_PER_WORD = 1.4
+# Headings, bullets and markdown around the summary's words
+FORMAT_TOKENS = 150
+# Chat formatting tokens around every message, and priming the reply
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+# Prompt and completion tokens allowed per batched request; the longest batch fits gpt-3.5-turbo's 4096-token reply
+DEFAULT_BATCH_TOKEN_BUDGET = 3000
+MAX_BATCH_SIZE = 8
+# Completion tokens of each "=== SUMMARY n ===" line and the blank line around it
+BATCH_SECTION_TOKENS = 10
+# A batched summary shorter than this share of the prompt's minimum word count is redone on its own
+BATCH_MIN_WORD_SHARE = 0.5
+MIN_SUMMARY_WORDS = 20
+
+BATCH_INSTRUCTIONS = (
+    "You will be given several numbered subtopics. Write one complete summary for each, "
+    "in the format above and in the order given. Begin each summary with a line "
+    '"=== SUMMARY <number> ===" and write nothing outside the summaries.'
+)
+
+_WORD_TARGET_RE = re.compile(r"(\d+)\s*(?:-|–|to)\s*(\d+)\s*words", re.IGNORECASE)
+_TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_CHECK_MARK_RE = re.compile(r"^✅\s*", re.MULTILINE)
+_BATCH_MARKER_RE = re.compile(r"^[ \t>*#]*=+\s*SUMMARY\s+(\d+)\s*=+[ \t*]*$", re.MULTILINE | re.IGNORECASE)
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def budget_from_env(default: int = DEFAULT_INPUT_BUDGET) -> int:
+    """Input token budget from SUMMARY_INPUT_TOKEN_BUDGET, if set"""
+    try:
+        return int(os.getenv("SUMMARY_INPUT_TOKEN_BUDGET", default))
+    except ValueError:
+        return default
+
+
+def batch_budget_from_env(default: int = DEFAULT_BATCH_TOKEN_BUDGET) -> int:
+    """Batched request token budget from SUMMARY_BATCH_TOKEN_BUDGET, if set"""
+    try:
+        return int(os.getenv("SUMMARY_BATCH_TOKEN_BUDGET", default))
+    except ValueError:
+        return default
+
+
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None when tiktoken is not installed"""
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+                try:
+                    # OpenRouter names are "vendor/model"
+                    _encodings[model] = tiktoken.encoding_for_model(model.split('/')[-1])
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding('cl100k_base')
+            except Exception:
+                # Not installed, or its encoding files could not be fetched
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str = 'gpt-3.5-turbo') -> int:
+    """Tokens in ``text``; exact with tiktoken installed, otherwise a close local estimate"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # About one token per 4 characters of a word, one per punctuation mark, two per emoji
+    return sum((len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == '_'
+               else (len(piece.encode('utf-8')) + 1) // 2
+               for piece in _TOKEN_PIECE_RE.findall(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = 'gpt-3.5-turbo') -> int:
+    """Prompt tokens of a chat request, including the per-message formatting"""
+    return sum(MESSAGE_OVERHEAD + count_tokens(m.get('content') or '', model) for m in messages) + REPLY_OVERHEAD
+
+
+def compact_prompt(text: str) -> str:
+    """The same instructions in fewer tokens.
+
+    Trailing spaces (markdown line breaks), runs of blank lines and the
+    check-mark bullets of the instruction list carry no meaning for the
+    model. The output template is left exactly as written.
+    """
+    text = _CHECK_MARK_RE.sub("- ", text)
+    lines = [line.rstrip() for line in text.strip().splitlines()]
+    compacted = []
+    for line in lines:
+        if line or (compacted and compacted[-1]):
+            compacted.append(line)
+    return "\n".join(compacted)
+
+
+def word_target(prompt: str) -> Optional[Tuple[int, int]]:
+    """The (min, max) summary length the prompt asks for, e.g. "150-200 words" """
+    match = _WORD_TARGET_RE.search(prompt)
+    if match is None:
+        return None
+    low, high = sorted((int(match.group(1)), int(match.group(2))))
+    return low, high
+
+
+def completion_budget(prompt: str, default: int = DEFAULT_MAX_TOKENS) -> int:
+    """max_tokens that fits the longest summary the prompt allows, with its formatting"""
+    target = word_target(prompt)
+    if target is None:
+        return default
+    return int(target[1] * TOKENS_PER_WORD) + FORMAT_TOKENS
+
+
+def trim_to_tokens(text: str, max_tokens: int, model: str = 'gpt-3.5-turbo') -> str:
+    """Trailing words of ``text`` that fit in ``max_tokens``, marked with … when cut.
+
+    Context grows by appending, so the oldest part is the one dropped.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    words = text.split()
+    room = max_tokens - count_tokens("…", model)
+    low, high = 0, len(words)
+    # Longest suffix that still fits with the ellipsis
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[len(words) - middle:]), model) <= room:
+            low = middle
+        else:
+            high = middle - 1
+    return "…" + " ".join(words[len(words) - low:]) if low else ""
+
+
+def split_batch_reply(content: str) -> Dict[int, str]:
+    """Summaries of a batched reply by their 1-based number; the first section of each number wins"""
+    markers = list(_BATCH_MARKER_RE.finditer(content or ""))
+    sections = {}
+    for marker, following in zip(markers, markers[1:] + [None]):
+        number = int(marker.group(1))
+        text = content[marker.end():following.start() if following else len(content)].strip()
+        sections.setdefault(number, text)
+    return sections
+
+
+class PromptPlan(NamedTuple):
+    """Messages for one summary request and what building them saved"""
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    raw_prompt_tokens: int     # tokens the untrimmed, uncompacted prompt would have used
+    max_tokens: int
+    context_trimmed: bool = False
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.raw_prompt_tokens - self.prompt_tokens)
+
+
+class PromptBuilder:
+    """Builds summarizer requests for one system prompt.
+
+    The system prompt is compacted once; memory context is cut to whatever
+    room the input budget leaves after the system prompt and the subtopic.
+    ``max_tokens`` follows the word target stated in the prompt, cut to
+    whatever the context window leaves after a prompt over budget.
+    """
+
+    def __init__(self, system_prompt: str, input_budget: int = DEFAULT_INPUT_BUDGET,
+                 model: str = 'gpt-3.5-turbo', context_window: int = DEFAULT_CONTEXT_WINDOW):
+        self.model = model
+        self.input_budget = input_budget
+        self.context_window = context_window
+        self.raw_system_prompt = system_prompt
+        self.system_prompt = compact_prompt(system_prompt)
+        self.max_tokens = completion_budget(system_prompt)
+        target = word_target(system_prompt)
+        self.min_summary_words = int(target[0] * BATCH_MIN_WORD_SHARE) if target else MIN_SUMMARY_WORDS
+        self._raw_system_tokens = count_tokens(system_prompt, model)
+        self._system_tokens = count_tokens(self.system_prompt, model)
+        self._over_budget_warned = False
+
+    def _raw_tokens(self, user_message: str, context: str = '') -> int:
+        """Tokens of a single-topic request with the prompt as written and the context untrimmed"""
+        context_tokens = count_tokens("\n\nPrevious context: " + context, self.model) if context else 0
+        return (2 * MESSAGE_OVERHEAD + REPLY_OVERHEAD + self._raw_system_tokens
+                + count_tokens(user_message, self.model) + context_tokens)
+
+    def build(self, subtopic: str, context: str = '') -> PromptPlan:
+        user_message = f"Explain this subtopic for revision: {subtopic}"
+        context_prefix = "\n\nPrevious context: "
+        user_tokens = count_tokens(user_message, self.model)
+        overhead = 2 * MESSAGE_OVERHEAD + REPLY_OVERHEAD
+        raw_tokens = self._raw_tokens(user_message, context)
+
+        used = overhead + self._system_tokens + user_tokens
+        trimmed = False
+        if context:
+            room = self.input_budget - used - count_tokens(context_prefix, self.model)
+            kept = trim_to_tokens(context, room, self.model) if room >= MIN_CONTEXT_TOKENS else ""
+            trimmed = kept != context
+            if kept:
+                user_message += context_prefix + kept
+                used += count_tokens(context_prefix + kept, self.model)
+        if used > self.input_budget and not self._over_budget_warned:
+            self._over_budget_warned = True
+            print(f"⚠️ Summary prompt uses {used} tokens, over the {self.input_budget}-token input budget. "
+                  f"Shorten the prompt template or raise SUMMARY_INPUT_TOKEN_BUDGET.")
+
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+        max_tokens = max(1, min(self.max_tokens, self.context_window - used))
+        return PromptPlan(messages, used, raw_tokens, max_tokens, trimmed)
+
+    def _batch_messages(self, subtopics: List[str]) -> List[Dict[str, str]]:
+        lines = "\n".join(f"{number}. {subtopic}" for number, subtopic in enumerate(subtopics, 1))
+        return [
+            {"role": "system", "content": f"{self.system_prompt}\n\n{BATCH_INSTRUCTIONS}"},
+            {"role": "user", "content": f"Explain each of these subtopics for revision:\n{lines}"}
+        ]
+
+    def _batch_completion_tokens(self, count: int) -> int:
+        return count * (self.max_tokens + BATCH_SECTION_TOKENS)
+
+    def pack_batches(self, subtopics: List[str], token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET) -> List[List[int]]:
+        """Positions of ``subtopics`` grouped into requests that each fit ``token_budget``.
+
+        A request costs its prompt plus room for every summary in the reply,
+        so the budget mostly decides how many summaries share one request.
+        """
+        batches, current = [], []
+        for position, subtopic in enumerate(subtopics):
+            candidate = current + [position]
+            tokens = (count_message_tokens(self._batch_messages([subtopics[i] for i in candidate]), self.model)
+                      + self._batch_completion_tokens(len(candidate)))
+            if current and (tokens > token_budget or len(current) == MAX_BATCH_SIZE):
+                batches.append(current)
+                candidate = [position]
+            current = candidate
+        if current:
+            batches.append(current)
+        return batches
+
+    def build_batch(self, subtopics: List[str]) -> PromptPlan:
+        """One request for several subtopics; saved tokens are counted against a request per subtopic"""
+        messages = self._batch_messages(subtopics)
+        raw_tokens = sum(self._raw_tokens(f"Explain this subtopic for revision: {subtopic}") for subtopic in subtopics)
+        return PromptPlan(messages, count_message_tokens(messages, self.model), raw_tokens,
+                          self._batch_completion_tokens(len(subtopics)))
+
+    def complete_summary(self, summary: Optional[str]) -> bool:
+        """True when a summary split from a batched reply is long enough to keep"""
+        return bool(summary) and len(summary.split()) >= self.min_summary_words
@@ -0,0 +1,409 @@
+# Replay
+
+# Records model responses to a JSONL file and replays them offline, keyed by a canonical form of each request.
+
+# replay.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+REPLAY_MODES = ('record', 'replay')
+DEFAULT_REPLAY_FILE = os.path.join(os.path.dirname(__file__), 'cache', 'replay.jsonl')
+
+# Request arguments that change how a reply is delivered, not what it says. The
+# model is left out so that routing and hedging replay the same recorded answer.
+_DELIVERY_ARGS = frozenset({'model', 'timeout', 'stream', 'stream_options', 'extra_headers'})
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class ReplayMissError(LookupError):
+    """Replay mode found no recording for a request"""
+
+
+def replay_mode() -> Optional[str]:
+    """'record', 'replay' or None, from REVISION_REPLAY_MODE"""
+    mode = os.getenv("REVISION_REPLAY_MODE", "").strip().lower()
+    if mode in ("", "off"):
+        return None
+    if mode not in REPLAY_MODES:
+        print(f"⚠️ Unknown REVISION_REPLAY_MODE {mode!r}; expected record or replay. Using the live API.")
+        return None
+    return mode
+
+
+def replay_file() -> str:
+    return os.getenv("REVISION_REPLAY_FILE") or DEFAULT_REPLAY_FILE
+
+
+def replay_timing(default: float = 1.0) -> float:
+    """Multiplier for recorded delays from REVISION_REPLAY_TIMING: 1 as recorded, 0 instant"""
+    try:
+        return max(0.0, float(os.getenv("REVISION_REPLAY_TIMING", default)))
+    except ValueError:
+        return default
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    """Hash of everything in a chat.completions.create call that decides the reply"""
+    canonical = {name: value for name, value in kwargs.items()
+                 if name not in _DELIVERY_ARGS and value is not None}
+    text = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def _usage_dict(usage: Any) -> Optional[Dict[str, int]]:
+    if usage is None:
+        return None
+    return {name: getattr(usage, name, None) for name in ('prompt_tokens', 'completion_tokens', 'total_tokens')}
+
+
+class ReplayStore:
+    """Recorded replies in an append-only JSONL file, one line per request key.
+
+    A later line for the same key replaces an earlier one, so recording
+    again refreshes a request without rewriting the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interrupted recording
+                        continue
+                    self._entries[entry['key']] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._entries[entry['key']] = entry
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def open_store(path: Optional[str] = None) -> ReplayStore:
+    """The process-wide store for a file, so every client records to and replays from one index"""
+    path = os.path.abspath(path or replay_file())
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ReplayStore(path)
+        return _stores[path]
+
+
+# Recording
+
+def _entry(key: str, model: Optional[str], content: str, finish_reason: Optional[str], usage: Any,
+           latency: float, chunks: Optional[List[list]] = None, complete: bool = True) -> Dict[str, Any]:
+    entry = {
+        'key': key,
+        'model': model,
+        'content': content,
+        'finish_reason': finish_reason,
+        'usage': _usage_dict(usage),
+        'latency': round(latency, 4),
+    }
+    if chunks is not None:
+        entry['chunks'] = chunks    # [seconds after the request, text]
+    if not complete:
+        entry['complete'] = False   # the reader stopped the stream early
+    return entry
+
+
+class _ChunkRecorder:
+    """Collects the deltas of a streamed reply, shared by the sync and async recording streams"""
+
+    def __init__(self, store: ReplayStore, key: str, model: Optional[str], start: float):
+        self.store = store
+        self.key = key
+        self.model = model
+        self.start = start
+        self.chunks = []
+        self.usage = None
+        self.finish_reason = None
+        self.saved = False
+
+    def add(self, chunk):
+        self.usage = getattr(chunk, 'usage', None) or self.usage
+        self.model = getattr(chunk, 'model', None) or self.model
+        if not chunk.choices:
+            return
+        self.finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or self.finish_reason
+        delta = chunk.choices[0].delta.content
+        if delta:
+            self.chunks.append([round(time.perf_counter() - self.start, 4), delta])
+
+    def save(self, complete: bool):
+        if self.saved:
+            return
+        self.saved = True
+        self.store.put(_entry(self.key, self.model, ''.join(text for _, text in self.chunks),
+                              self.finish_reason, self.usage, time.perf_counter() - self.start,
+                              self.chunks, complete))
+
+
+class _RecordingStream:
+    def __init__(self, stream, recorder: _ChunkRecorder):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._recorder = recorder
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._iterator)
+        except StopIteration:
+            self._recorder.save(complete=True)
+            raise
+        self._recorder.add(chunk)
+        return chunk
+
+    def close(self):
+        self._recorder.save(complete=False)
+        close = getattr(self._stream, 'close', None)
+        if close is not None:
+            close()
+
+
+class _AsyncRecordingStream:
+    def __init__(self, stream, recorder: _ChunkRecorder):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._recorder = recorder
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._recorder.save(complete=True)
+            raise
+        self._recorder.add(chunk)
+        return chunk
+
+    async def close(self):
+        self._recorder.save(complete=False)
+        close = getattr(self._stream, 'close', None)
+        if close is not None:
+            await close()
+
+
+def _record_response(store: ReplayStore, key: str, response, start: float):
+    choice = response.choices[0]
+    store.put(_entry(key, getattr(response, 'model', None), choice.message.content or '',
+                     getattr(choice, 'finish_reason', None), getattr(response, 'usage', None),
+                     time.perf_counter() - start))
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, store: ReplayStore):
+        self._completions = completions
+        self._store = store
+
+    def create(self, **kwargs):
+        key = request_key(kwargs)
+        start = time.perf_counter()
+        response = self._completions.create(**kwargs)
+        if kwargs.get('stream'):
+            return _RecordingStream(response, _ChunkRecorder(self._store, key, kwargs.get('model'), start))
+        _record_response(self._store, key, response, start)
+        return response
+
+
+class _AsyncRecordingCompletions(_RecordingCompletions):
+    async def create(self, **kwargs):
+        key = request_key(kwargs)
+        start = time.perf_counter()
+        response = await self._completions.create(**kwargs)
+        if kwargs.get('stream'):
+            return _AsyncRecordingStream(response, _ChunkRecorder(self._store, key, kwargs.get('model'), start))
+        _record_response(self._store, key, response, start)
+        return response
+
+
+class RecordingClient:
+    """Wraps an OpenAI-compatible client and saves every reply it receives to a ReplayStore"""
+
+    def __init__(self, client, store: ReplayStore):
+        self.client = client
+        self.store = store
+        completions = _RecordingCompletions(client.chat.completions, store)
+        self.chat = SimpleNamespace(completions=completions)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class AsyncRecordingClient(RecordingClient):
+    """RecordingClient for AsyncOpenAI"""
+
+    def __init__(self, client, store: ReplayStore):
+        super().__init__(client, store)
+        self.chat = SimpleNamespace(completions=_AsyncRecordingCompletions(client.chat.completions, store))
+
+
+# Replay
+
+def _completion(entry: Dict[str, Any]) -> SimpleNamespace:
+    """A reply shaped like openai's ChatCompletion, as far as the agents read it"""
+    usage = SimpleNamespace(**entry['usage']) if entry.get('usage') else None
+    return SimpleNamespace(
+        id=f"replay-{entry['key']}", model=entry.get('model'), usage=usage,
+        choices=[SimpleNamespace(index=0, finish_reason=entry.get('finish_reason'),
+                                 message=SimpleNamespace(role='assistant', content=entry['content']))]
+    )
+
+
+def _chunk(content: Optional[str], finish_reason: Optional[str] = None, usage=None,
+           model: Optional[str] = None) -> SimpleNamespace:
+    return SimpleNamespace(model=model, usage=usage, choices=[
+        SimpleNamespace(index=0, finish_reason=finish_reason, delta=SimpleNamespace(content=content))
+    ])
+
+
+def _replay_chunks(entry: Dict[str, Any]) -> List[list]:
+    """[(delay before the chunk, chunk)] for a recorded reply, streamed or not"""
+    recorded = entry.get('chunks') or [[entry.get('latency', 0.0), entry['content']]]
+    model = entry.get('model')
+    timeline = []
+    previous = 0.0
+    for offset, text in recorded:
+        timeline.append((max(0.0, offset - previous), _chunk(text, model=model)))
+        previous = offset
+    if entry.get('complete', True):
+        usage = SimpleNamespace(**entry['usage']) if entry.get('usage') else None
+        timeline.append((max(0.0, entry.get('latency', previous) - previous),
+                         _chunk(None, entry.get('finish_reason'), usage, model)))
+    return timeline
+
+
+class _ReplayStream:
+    def __init__(self, entry: Dict[str, Any], timing: float):
+        self._timeline = iter(_replay_chunks(entry))
+        self._timing = timing
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        delay, chunk = next(self._timeline)
+        if delay and self._timing:
+            time.sleep(delay * self._timing)
+        return chunk
+
+    def close(self):
+        self._timeline = iter(())
+
+
+class _AsyncReplayStream(_ReplayStream):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        import asyncio
+
+        try:
+            delay, chunk = next(self._timeline)
+        except StopIteration:
+            raise StopAsyncIteration
+        if delay and self._timing:
+            await asyncio.sleep(delay * self._timing)
+        return chunk
+
+    async def close(self):
+        self._timeline = iter(())
+
+
+class _ReplayCompletions:
+    def __init__(self, store: ReplayStore, timing: float):
+        self._store = store
+        self._timing = timing
+
+    def _lookup(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(kwargs)
+        entry = self._store.get(key)
+        # A stream the reader stopped early can only be replayed as a stream
+        if entry is None or (not kwargs.get('stream') and not entry.get('complete', True)):
+            raise ReplayMissError(f"No recorded response for request {key} in {self._store.path}. "
+                                  f"Record it with REVISION_REPLAY_MODE=record.")
+        return entry
+
+    def create(self, **kwargs):
+        entry = self._lookup(kwargs)
+        if kwargs.get('stream'):
+            return _ReplayStream(entry, self._timing)
+        if self._timing:
+            time.sleep(entry.get('latency', 0.0) * self._timing)
+        return _completion(entry)
+
+
+class _AsyncReplayCompletions(_ReplayCompletions):
+    async def create(self, **kwargs):
+        import asyncio
+
+        entry = self._lookup(kwargs)
+        if kwargs.get('stream'):
+            return _AsyncReplayStream(entry, self._timing)
+        if self._timing:
+            await asyncio.sleep(entry.get('latency', 0.0) * self._timing)
+        return _completion(entry)
+
+
+class ReplayClient:
+    """Answers chat.completions.create from a ReplayStore without a key or network.
+
+    Replies keep their recorded latency, or streaming chunk timing,
+    multiplied by ``timing``. A request that was never recorded raises
+    ReplayMissError.
+    """
+
+    def __init__(self, store: ReplayStore, timing: float = 1.0):
+        self.store = store
+        self.timing = timing
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(store, timing))
+
+
+class AsyncReplayClient(ReplayClient):
+    """ReplayClient for the async agents"""
+
+    def __init__(self, store: ReplayStore, timing: float = 1.0):
+        super().__init__(store, timing)
+        self.chat = SimpleNamespace(completions=_AsyncReplayCompletions(store, timing))
@@ -0,0 +1,414 @@
+# Call Scheduler
+
+# Shared rate limiting, retries and deadlines for every model call.
+
+# scheduler.py
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+# No client-side limit unless one is configured; the provider's 429s are still backed off
+DEFAULT_REQUESTS_PER_MINUTE = 0
+DEFAULT_TOKENS_PER_MINUTE = 0
+DEFAULT_MAX_RETRIES = 4
+# Seconds of recent requests that estimate the rate a provider throttled
+OBSERVED_WINDOW = 10.0
+# Share of its ceiling a throttled rate recovers per successful call
+RECOVERY_STEP = 0.05
+DEFAULT_DEADLINE = 90.0
+
+# Errors raised by the openai package for network trouble, matched by name so
+# this module does not need to import it
+_TRANSIENT_ERROR_NAMES = {'APIConnectionError', 'APITimeoutError'}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call could not complete before its deadline"""
+
+
+def estimate_tokens(messages: Iterable[Dict[str, str]], completion_tokens: int = 0) -> int:
+    """Rough token count (about 4 characters per token) used for rate limiting"""
+    characters = sum(len(message.get('content') or '') for message in messages)
+    return characters // 4 + completion_tokens
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code if isinstance(code, int) else None
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for failures worth retrying: throttling, timeouts, server and network errors"""
+    if type(error).__name__ in _TRANSIENT_ERROR_NAMES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)) and not isinstance(error, DeadlineExceeded):
+        return True
+    code = status_code(error)
+    return code is not None and (code in (408, 409, 429) or code >= 500)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After(-Ms) headers"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # Rare (most servers send seconds), and email.utils is slow to import
+    from email.utils import parsedate_to_datetime
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate_per_minute``"""
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0):
+        self.burst_seconds = burst_seconds
+        self.rate_per_minute = rate_per_minute
+        self.capacity = max(1.0, rate_per_minute * burst_seconds / 60)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate_per_minute: float):
+        with self._lock:
+            self._refill()
+            self.rate_per_minute = rate_per_minute
+            self.capacity = max(1.0, rate_per_minute * self.burst_seconds / 60)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate_per_minute / 60
+        )
+        self._updated = now
+
+    def _reserve(self, amount: float, deadline: Optional[float]) -> float:
+        """Take ``amount`` tokens and return 0, or return the seconds to wait first"""
+        with self._lock:
+            self._refill()
+            amount = min(amount, self.capacity)
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            wait = (amount - self._tokens) * 60 / self.rate_per_minute
+        if deadline is not None and time.monotonic() + wait > deadline:
+            raise DeadlineExceeded("Rate limit wait would exceed the call deadline")
+        return wait
+
+    def acquire(self, amount: float = 1.0, deadline: Optional[float] = None):
+        """Block until ``amount`` tokens are available; deadline is a time.monotonic() value"""
+        while True:
+            wait = self._reserve(amount, deadline)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1.0, deadline: Optional[float] = None):
+        """Like acquire(), but waits without blocking the event loop"""
+        import asyncio
+
+        while True:
+            wait = self._reserve(amount, deadline)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def refund(self, amount: float):
+        """Return tokens reserved by an over-estimate (negative amounts charge extra)"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class ModelLimit:
+    """Request and token budgets of one model or provider.
+
+    The request rate adapts to the provider: it is halved on every 429 and
+    creeps back towards its ceiling on each success. A rate of 0 configures
+    no limit; the first 429 then starts one at half the rate observed over
+    the last OBSERVED_WINDOW seconds, which is lifted again once it has
+    recovered to that observed rate.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.max_requests_per_minute = requests_per_minute
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        # Rate the request limit recovers to; for an unconfigured limit, the rate that was throttled
+        self._ceiling = requests_per_minute
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def current_rate(self) -> Optional[float]:
+        return self.requests.rate_per_minute if self.requests else None
+
+    def _prune(self, now: float):
+        while self._sent and self._sent[0] < now - OBSERVED_WINDOW:
+            self._sent.popleft()
+
+    def _record_sent(self):
+        if not self.max_requests_per_minute:
+            now = time.monotonic()
+            with self._lock:
+                self._sent.append(now)
+                self._prune(now)
+
+    def observed_rate(self) -> float:
+        """Requests per minute sent over the last OBSERVED_WINDOW seconds (unconfigured limits only)"""
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._sent) * 60 / OBSERVED_WINDOW
+
+    def acquire(self, estimated_tokens: int, deadline: float):
+        requests = self.requests
+        if requests:
+            requests.acquire(1, deadline)
+        if self.tokens and estimated_tokens:
+            self.tokens.acquire(estimated_tokens, deadline)
+        self._record_sent()
+
+    async def acquire_async(self, estimated_tokens: int, deadline: float):
+        requests = self.requests
+        if requests:
+            await requests.acquire_async(1, deadline)
+        if self.tokens and estimated_tokens:
+            await self.tokens.acquire_async(estimated_tokens, deadline)
+        self._record_sent()
+
+    def succeeded(self, result: Any, estimated_tokens: int):
+        with self._lock:
+            requests = self.requests
+            if requests and requests.rate_per_minute < self._ceiling:
+                rate = min(self._ceiling, requests.rate_per_minute + self._ceiling * RECOVERY_STEP)
+                if rate >= self._ceiling and not self.max_requests_per_minute:
+                    # Recovered to the rate that was throttled; no limit was asked for
+                    self.requests = None
+                else:
+                    requests.set_rate(rate)
+        usage = getattr(result, 'usage', None)
+        if self.tokens and estimated_tokens and getattr(usage, 'total_tokens', None):
+            self.tokens.refund(estimated_tokens - usage.total_tokens)
+
+    def throttled(self):
+        observed = self.observed_rate()
+        with self._lock:
+            if self.requests is None:
+                # No limit was configured: start one at half the rate that was just refused
+                self._ceiling = max(1.0, observed)
+                self.requests = TokenBucket(max(1.0, observed / 2))
+                return
+            floor = max(1.0, self._ceiling * RECOVERY_STEP)
+            self.requests.set_rate(max(floor, self.requests.rate_per_minute / 2))
+
+
+class CallScheduler:
+    """Runs model calls under request and token budgets, retrying transient failures.
+
+    ``requests_per_minute`` and ``tokens_per_minute`` apply to each model
+    separately. ``limits`` overrides them for a model, or for every model of
+    a provider when the name ends in "/" (e.g. "anthropic/"), whose models
+    then share one budget. Retries use exponential backoff with full jitter
+    unless the server sends Retry-After.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 30.0,
+                 deadline: float = DEFAULT_DEADLINE,
+                 limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.limits = dict(limits or {})
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._budgets: Dict[str, ModelLimit] = {}
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def _budget_name(self, model: Optional[str]) -> str:
+        """The limits entry a model falls under: itself, its provider, or its own default budget"""
+        model = model or ''
+        if model in self.limits:
+            return model
+        providers = [name for name in self.limits if name.endswith('/') and model.startswith(name)]
+        return max(providers, key=len) if providers else model
+
+    def limit_for(self, model: Optional[str]) -> ModelLimit:
+        name = self._budget_name(model)
+        with self._lock:
+            limit = self._budgets.get(name)
+            if limit is None:
+                rates = self.limits.get(name, (self.requests_per_minute, self.tokens_per_minute))
+                limit = self._budgets[name] = ModelLimit(*rates)
+            return limit
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn: Callable[[float], Any], estimated_tokens: int = 0,
+             deadline: Optional[float] = None,
+             on_retry: Optional[Callable[[BaseException], None]] = None,
+             model: Optional[str] = None) -> Any:
+        """Run ``fn(timeout)`` with ``model``'s rate limits and retries.
+
+        ``fn`` receives the seconds left before the deadline, to pass on as the
+        request timeout. Non-transient errors, and transient ones once retries
+        or time run out, are raised to the caller. ``on_retry`` is called with
+        the error before each retry.
+        """
+        end = self._start(deadline)
+        limit = self.limit_for(model)
+        attempt = 0
+        while True:
+            limit.acquire(estimated_tokens, end)
+            try:
+                result = fn(self._remaining(end))
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, end, limit)
+                if on_retry is not None:
+                    on_retry(e)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            limit.succeeded(result, estimated_tokens)
+            return result
+
+    async def call_async(self, fn: Callable[[float], Awaitable[Any]], estimated_tokens: int = 0,
+                         deadline: Optional[float] = None,
+                         on_retry: Optional[Callable[[BaseException], None]] = None,
+                         model: Optional[str] = None) -> Any:
+        """call() for coroutines: ``await fn(timeout)`` under the same budgets and retry policy.
+
+        Shares its rate limits with synchronous callers of this scheduler.
+        Cancelling the awaiting task cancels the request or wait in progress.
+        """
+        import asyncio
+
+        end = self._start(deadline)
+        limit = self.limit_for(model)
+        attempt = 0
+        while True:
+            await limit.acquire_async(estimated_tokens, end)
+            try:
+                result = await fn(self._remaining(end))
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, end, limit)
+                if on_retry is not None:
+                    on_retry(e)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            limit.succeeded(result, estimated_tokens)
+            return result
+
+    def _start(self, deadline: Optional[float]) -> float:
+        with self._lock:
+            self.calls += 1
+        return time.monotonic() + (deadline if deadline is not None else self.deadline)
+
+    @staticmethod
+    def _remaining(end: float) -> float:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Call deadline passed before the request was sent")
+        return remaining
+
+    def _retry_delay(self, error: Exception, attempt: int, end: float, limit: ModelLimit) -> float:
+        """Seconds to wait before retrying; re-raises ``error`` when it should not be retried"""
+        if status_code(error) == 429:
+            with self._lock:
+                self.throttled += 1
+            limit.throttled()
+        delay = retry_after(error)
+        if delay is None:
+            delay = self._backoff(attempt)
+        if (not is_transient(error) or attempt >= self.max_retries
+                or time.monotonic() + delay >= end):
+            with self._lock:
+                self.failures += 1
+            raise error
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rates = {name or 'default': limit.current_rate
+                     for name, limit in self._budgets.items() if limit.current_rate is not None}
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'failures': self.failures,
+                'requests_per_minute': rates,
+            }
+
+
+def _rate_from_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def limits_from_env(name: str = "OPENROUTER_MODEL_LIMITS") -> Dict[str, Tuple[float, float]]:
+    """Per-model or per-provider limits, e.g. "openai/gpt-4o-mini=500:200000,anthropic/=50".
+
+    Each entry is ``name=requests_per_minute[:tokens_per_minute]``; 0 or a
+    missing token rate means no limit.
+    """
+    limits = {}
+    for entry in os.getenv(name, "").split(","):
+        if not entry.strip():
+            continue
+        try:
+            model, rates = entry.split("=", 1)
+            requests, _, tokens = rates.partition(":")
+            limits[model.strip()] = (float(requests or 0), float(tokens or 0))
+        except ValueError:
+            print(f"⚠️ Ignoring {name} entry {entry.strip()!r}; expected name=requests_per_minute[:tokens_per_minute].")
+    return limits
+
+
+# Process-wide scheduler shared by every agent unless one is passed explicitly.
+# OPENROUTER_RPM and OPENROUTER_TPM apply to each model; by default nothing is limited.
+shared_scheduler = CallScheduler(
+    requests_per_minute=_rate_from_env("OPENROUTER_RPM", DEFAULT_REQUESTS_PER_MINUTE),
+    tokens_per_minute=_rate_from_env("OPENROUTER_TPM", DEFAULT_TOKENS_PER_MINUTE),
+    limits=limits_from_env(),
+)
@@ -0,0 +1,337 @@
+# Session Index
+
+# Searchable SQLite index of past revision sessions, so earlier summaries can be found and reused.
+
+# session_index.py
+#
+# Usage:
+#   python 3_Agent_Code/session_index.py ingest                  # index sample_output/
+#   python 3_Agent_Code/session_index.py topic Backpropagation --since 7d
+#   python 3_Agent_Code/session_index.py search "gradient descent" --limit 5
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from session_log import SESSION_DIR, read_records
+from topic_index import tokenize
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'sessions.sqlite3')
+# Past summaries older than this are not reused in place of a model call
+DEFAULT_REUSE_MAX_AGE = 30 * 24 * 60 * 60
+
+_TEXT_ENTRY_RE = re.compile(r"^🔹 Topic: (.+?)\n-{30}\n(.*?)\n-{30}\n", re.MULTILINE | re.DOTALL)
+_FILENAME_TIME_RE = re.compile(r"(\d{8}_\d{6})")
+_FALLBACK_PREFIX = "Unable to generate summary for"
+
+
+def normalize(topic: str) -> str:
+    return " ".join(tokenize(topic))
+
+
+def parse_since(value: str) -> float:
+    """Epoch seconds for "7d", "12h", "30m" (ago) or an ISO date such as 2024-12-18"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([dhm])", value.strip())
+    if match:
+        unit = {'d': 86400, 'h': 3600, 'm': 60}[match.group(2)]
+        return time.time() - float(match.group(1)) * unit
+    return datetime.fromisoformat(value.strip()).timestamp()
+
+
+class SessionEntry(NamedTuple):
+    """One topic of a past session"""
+    source: str
+    created: float
+    topic: str
+    category: Optional[str]
+    model: Optional[str]
+    summary: str
+
+    @property
+    def date(self) -> str:
+        return datetime.fromtimestamp(self.created).strftime("%Y-%m-%d %H:%M")
+
+
+class SessionIndex:
+    """SQLite index over session logs (.txt and .jsonl), with full-text search.
+
+    ingest_dir() only re-reads files whose size or mtime changed. Keyword
+    search uses FTS5 when the SQLite build has it and LIKE otherwise.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # (mtime_ns, size) of every file known to be indexed, so unchanged files cost one stat
+        self._indexed: Dict[str, Tuple[int, int]] = {}
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY,"
+                " mtime_ns INTEGER NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " id INTEGER PRIMARY KEY,"
+                " source TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " topic TEXT NOT NULL,"
+                " topic_norm TEXT NOT NULL,"
+                " category TEXT,"
+                " model TEXT,"
+                " summary TEXT NOT NULL,"
+                " prompt_hash TEXT,"
+                " temperature REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_topic ON entries (topic_norm, created)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_source ON entries (source)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            self.fts = self._create_fts()
+
+    def _create_fts(self) -> bool:
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+                " topic, summary, content='entries', content_rowid='id')"
+            )
+            self._conn.executescript(
+                "CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN"
+                "  INSERT INTO entries_fts (rowid, topic, summary) VALUES (new.id, new.topic, new.summary);"
+                " END;"
+                "CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN"
+                "  INSERT INTO entries_fts (entries_fts, rowid, topic, summary)"
+                "  VALUES ('delete', old.id, old.topic, old.summary);"
+                " END;"
+            )
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    # Ingestion
+
+    @staticmethod
+    def _session_time(path: str) -> float:
+        match = _FILENAME_TIME_RE.search(os.path.basename(path))
+        if match:
+            try:
+                return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+            except ValueError:
+                pass
+        return os.path.getmtime(path)
+
+    @staticmethod
+    def _read_entries(path: str, created: float) -> Iterable[tuple]:
+        """(created, topic, category, model, summary, prompt_hash, temperature) for every usable topic in a log"""
+        if path.endswith('.jsonl'):
+            for record in read_records(path):
+                if record.get('error') or not record.get('text'):
+                    continue
+                stamp = record.get('timestamp')
+                when = datetime.fromisoformat(stamp).timestamp() if stamp else created
+                yield (when, record['topic'], record.get('category'), record.get('model'), record['text'],
+                       record.get('prompt_hash'), record.get('temperature'))
+            return
+
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        for match in _TEXT_ENTRY_RE.finditer(text):
+            yield created, match.group(1).strip(), None, None, match.group(2).strip(), None, None
+
+    def ingest_file(self, path: str, force: bool = False) -> int:
+        """Index one session log; returns the number of topics added (0 if unchanged)"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if not force and self._indexed.get(path) == version:
+            return 0
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if not force and row == version:
+            self._indexed[path] = version
+            return 0
+
+        rows = [
+            (path, created, topic, normalize(topic), category, model, summary, prompt_hash, temperature)
+            for created, topic, category, model, summary, prompt_hash, temperature
+            in self._read_entries(path, self._session_time(path))
+            if not summary.startswith(_FALLBACK_PREFIX)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE source = ?", (path,))
+            self._conn.executemany(
+                "INSERT INTO entries (source, created, topic, topic_norm, category, model, summary,"
+                " prompt_hash, temperature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size)
+            )
+        self._indexed[path] = version
+        return len(rows)
+
+    def ingest_dir(self, directory: str = SESSION_DIR) -> int:
+        """Index every new or changed session log in a directory"""
+        if not os.path.isdir(directory):
+            return 0
+        with os.scandir(directory) as scan:
+            files = {entry.name: entry for entry in scan}
+        added = 0
+        for name in sorted(files):
+            stem, ext = os.path.splitext(name)
+            if ext not in ('.txt', '.jsonl'):
+                continue
+            if ext == '.txt' and stem + '.jsonl' in files:
+                continue  # rendered from a journal that is indexed with more detail
+            try:
+                stat = files[name].stat()
+                if self._indexed.get(os.path.abspath(files[name].path)) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                added += self.ingest_file(files[name].path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not index session log {name}: {str(e)}")
+        return added
+
+    # Lookup
+
+    def _query(self, where: List[str], params: list, limit: Optional[int],
+               join: str = "", order: str = "e.created DESC") -> List[SessionEntry]:
+        sql = "SELECT e.source, e.created, e.topic, e.category, e.model, e.summary FROM entries e " + join
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ?"
+            params = params + [limit]
+        with self._lock:
+            return [SessionEntry(*row) for row in self._conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _time_filter(where: List[str], params: list, since: Optional[float], until: Optional[float]):
+        if since is not None:
+            where.append("e.created >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("e.created < ?")
+            params.append(until)
+
+    def find_topic(self, topic: str, since: Optional[float] = None, until: Optional[float] = None,
+                   limit: Optional[int] = 10) -> List[SessionEntry]:
+        """Past summaries of this topic (case and punctuation insensitive), newest first"""
+        where, params = ["e.topic_norm = ?"], [normalize(topic)]
+        self._time_filter(where, params, since, until)
+        return self._query(where, params, limit)
+
+    def by_date(self, since: Optional[float] = None, until: Optional[float] = None,
+                limit: Optional[int] = 50) -> List[SessionEntry]:
+        where, params = [], []
+        self._time_filter(where, params, since, until)
+        return self._query(where, params, limit)
+
+    def search(self, query: str, since: Optional[float] = None, until: Optional[float] = None,
+               limit: Optional[int] = 10) -> List[SessionEntry]:
+        """Past summaries whose topic or text contains every keyword (prefixes match), best first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        where, params = [], []
+        self._time_filter(where, params, since, until)
+        if self.fts:
+            where.insert(0, "entries_fts MATCH ?")
+            params.insert(0, " AND ".join(f'"{token}"*' for token in tokens))
+            return self._query(where, params, limit,
+                               join="JOIN entries_fts ON entries_fts.rowid = e.id",
+                               order="bm25(entries_fts, 10.0, 1.0), e.created DESC")
+        for token in tokens:
+            where.append("(e.topic LIKE ? OR e.summary LIKE ?)")
+            params += [f"%{token}%", f"%{token}%"]
+        return self._query(where, params, limit)
+
+    def reusable(self, topic: str, model: str, prompt_hash: str, temperature: float,
+                 max_age: float = DEFAULT_REUSE_MAX_AGE) -> Optional[str]:
+        """Most recent past summary of this topic that can stand in for a new model call.
+
+        Only summaries journaled with the same model, system prompt and
+        temperature qualify; plain-text logs record none of these and are
+        never reused.
+        """
+        where = ["e.topic_norm = ?", "e.created >= ?", "e.model = ?", "e.prompt_hash = ?", "e.temperature = ?"]
+        params = [normalize(topic), time.time() - max_age, model, prompt_hash, temperature]
+        entries = self._query(where, params, 1)
+        return entries[0].summary if entries else None
+
+    def stats(self):
+        with self._lock:
+            files, = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()
+            entries, = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return {'files': files, 'entries': entries, 'full_text': self.fts}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def print_entries(entries: List[SessionEntry], full: bool = False):
+    if not entries:
+        print("❌ No matching sessions found.")
+        return
+    for entry in entries:
+        print(f"\n🗓️ {entry.date}  🔹 {entry.topic}  ({os.path.basename(entry.source)})")
+        if full:
+            print("-" * 50)
+            print(entry.summary)
+            print("-" * 50)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Index and search past revision sessions.")
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help="index file (default: %(default)s)")
+    parser.add_argument('--logs', default=SESSION_DIR, help="session log directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('ingest', help="index new or changed session logs")
+    for name, help_text in (('topic', "past summaries of a topic"), ('search', "keyword search")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('query')
+        command.add_argument('--since', help='e.g. 7d, 12h or 2024-12-18')
+        command.add_argument('--until', help='e.g. 1d or 2024-12-25')
+        command.add_argument('--limit', type=int, default=10)
+        command.add_argument('--full', action='store_true', help="print the summaries too")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    index = SessionIndex(args.index)
+    added = index.ingest_dir(args.logs)
+
+    if args.command == 'ingest':
+        stats = index.stats()
+        print(f"🗂️ Indexed {added} new topic(s); {stats['entries']} topics from {stats['files']} session log(s).")
+        return 0
+
+    try:
+        since = parse_since(args.since) if args.since else None
+        until = parse_since(args.until) if args.until else None
+    except ValueError as e:
+        print(f"❌ Invalid date: {str(e)}")
+        return 2
+    lookup = index.find_topic if args.command == 'topic' else index.search
+    print_entries(lookup(args.query, since=since, until=until, limit=args.limit), full=args.full)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# Session Log
+
+# Append-only JSONL journal of a revision session, and renderers to text or markdown.
+
+# session_log.py
+
+import itertools
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+from syllabus_store import get_syllabus
+
+SESSION_DIR = os.path.join(os.path.dirname(__file__), 'sample_output')
+FORMAT_VERSION = 1
+
+TEXT_HEADER = "🤖 AI Revision Agent - Session Log\n" + "=" * 50 + "\n\n"
+
+
+def text_block(topic: str, summary: str) -> str:
+    """One topic as it appears in a .txt session log"""
+    return f"🔹 Topic: {topic}\n{'-' * 30}\n{summary}\n{'-' * 30}\n\n"
+
+
+def markdown_block(record: Dict[str, Any]) -> str:
+    details = [part for part in (
+        (record.get('category') or '').replace('_', ' '),
+        record.get('model'),
+        f"{record['latency_seconds']:.1f}s" if record.get('latency_seconds') is not None else None,
+        f"{record['completion_tokens']} tokens" if record.get('completion_tokens') else None,
+    ) if part]
+    block = f"## 🔹 {record['topic']}\n\n"
+    if details:
+        block += f"_{' · '.join(details)}_\n\n"
+    if record.get('error'):
+        block += f"> ⚠️ {record['error']}\n\n"
+    return block + f"{record.get('text', '')}\n\n"
+
+
+def summary_record(topic: str, text: str, index: Optional[int] = None,
+                   category: Optional[str] = None, model: Optional[str] = None,
+                   error: Optional[str] = None, call: Any = None, prompt_hash: Optional[str] = None,
+                   temperature: Optional[float] = None) -> Dict[str, Any]:
+    """The journal record of one summary; ``call`` is the telemetry CallRecord that produced it, if known"""
+    return {
+        'type': 'summary',
+        'index': index,
+        'topic': topic,
+        'category': category if category is not None else get_syllabus().category_of(topic),
+        'model': model if model is not None else getattr(call, 'model', None),
+        'prompt_hash': prompt_hash,
+        'temperature': temperature,
+        'latency_seconds': getattr(call, 'wall_seconds', None),
+        'prompt_tokens': getattr(call, 'prompt_tokens', None),
+        'completion_tokens': getattr(call, 'completion_tokens', None),
+        'text': text,
+        'error': error,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+class SessionLog:
+    """Writes each summary to a JSONL journal as soon as it arrives.
+
+    Every record is flushed (and fsynced when ``durable``) before append()
+    returns, so an interrupted run keeps everything generated so far and
+    memory use does not grow with the number of topics. A torn final line
+    left by a crash is skipped when the journal is read.
+    """
+
+    def __init__(self, path: str, durable: bool = True):
+        self.path = path
+        self.durable = durable
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        torn = self._ends_mid_record(path)
+        self._file = open(path, 'a', encoding='utf-8')
+        self.count = 0
+        if torn:
+            # Start on a fresh line if an earlier run was cut off mid-record
+            self._file.write("\n")
+        if self._file.tell() == 0:
+            self._write({'type': 'session', 'version': FORMAT_VERSION,
+                         'started_at': datetime.now().isoformat(timespec='seconds')})
+
+    @staticmethod
+    def _ends_mid_record(path: str) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except FileNotFoundError:
+            return False
+
+    @classmethod
+    def create(cls, output_dir: Optional[str] = None, prefix: str = 'revision_session',
+               durable: bool = True) -> 'SessionLog':
+        """Start a new journal named after the current time, numbered if another was started in the same second"""
+        output_dir = output_dir or SESSION_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for number in itertools.count(1):
+            suffix = f"_{number}" if number > 1 else ""
+            path = os.path.join(output_dir, f"{prefix}_{timestamp}{suffix}.jsonl")
+            try:
+                # Claims the name, so concurrent sessions never share a journal
+                open(path, 'x').close()
+            except FileExistsError:
+                continue
+            return cls(path, durable)
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.durable:
+            os.fsync(self._file.fileno())
+
+    def append(self, topic: str, text: str, index: Optional[int] = None,
+               category: Optional[str] = None, model: Optional[str] = None,
+               error: Optional[str] = None, call: Any = None, prompt_hash: Optional[str] = None,
+               temperature: Optional[float] = None) -> Dict[str, Any]:
+        """Journal one summary and return its record"""
+        record = summary_record(topic, text, index, category, model, error, call, prompt_hash, temperature)
+        with self._lock:
+            self._write(record)
+            self.count += 1
+        return record
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def save_copy(self, output_dir: Optional[str] = None) -> str:
+        """Copy the journal, as written so far, into ``output_dir`` (sample_output by default) and return the copy's path"""
+        out_path = os.path.join(output_dir or SESSION_DIR, os.path.basename(self.path))
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+            shutil.copy2(self.path, out_path)
+        return out_path
+
+    def discard(self):
+        """Close and delete the journal"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> 'SessionLog':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _summary_offsets(path: str):
+    """(order, offset) of every summary record, without keeping the records in memory"""
+    offsets = []
+    with open(path, 'rb') as f:
+        offset = f.tell()
+        for line in iter(f.readline, b''):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None  # torn write from an interrupted run
+            if isinstance(record, dict) and record.get('type') == 'summary':
+                index = record.get('index')
+                offsets.append(((index if index is not None else len(offsets)), len(offsets), offset))
+            offset = f.tell()
+    return offsets
+
+
+def read_records(path: str, ordered: bool = True) -> Iterator[Dict[str, Any]]:
+    """Yield the summary records of a journal, in topic order unless ``ordered`` is False"""
+    offsets = _summary_offsets(path)
+    if ordered:
+        offsets.sort()
+    with open(path, 'rb') as f:
+        for _, _, offset in offsets:
+            f.seek(offset)
+            yield json.loads(f.readline())
+
+
+def render(path: str, fmt: str = 'txt') -> Iterator[str]:
+    """Render a journal as text or markdown, one topic at a time"""
+    if fmt not in ('txt', 'md'):
+        raise ValueError(f"Unknown session log format: {fmt}")
+    yield TEXT_HEADER if fmt == 'txt' else "# 🤖 AI Revision Agent - Session Log\n\n"
+    for record in read_records(path):
+        yield text_block(record['topic'], record['text']) if fmt == 'txt' else markdown_block(record)
+
+
+def export(path: str, fmt: str = 'txt', out_path: Optional[str] = None) -> str:
+    """Write the rendered journal next to it (or to ``out_path``) and return the file path.
+
+    An export written after the journal's last change is already current and
+    is left as it is.
+    """
+    out_path = out_path or os.path.splitext(path)[0] + '.' + fmt
+    try:
+        if os.stat(out_path).st_mtime_ns > os.stat(path).st_mtime_ns:
+            return out_path
+    except FileNotFoundError:
+        pass
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for part in render(path, fmt):
+            f.write(part)
+    os.replace(tmp_path, out_path)
+    return out_path
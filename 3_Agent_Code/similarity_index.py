@@ -0,0 +1,283 @@
+# Similarity Index
+
+# Offline character n-gram TF-IDF index for finding paraphrases of already summarized topics.
+
+# similarity_index.py
+
+import os
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from topic_index import tokenize
+
+# Cosine similarity above which a word-aligned topic is treated as a paraphrase
+DEFAULT_THRESHOLD = 0.65
+DEFAULT_DIMENSIONS = 1024
+DEFAULT_MAX_ENTRIES = 10_000
+NGRAM_SIZE = 3
+# Whole-word features count more than a single n-gram
+WORD_WEIGHT = 2.0
+# Candidates checked against the word-alignment guard per lookup
+TOP_K = 5
+# Trigram overlap at which two words count as spelling variants (normalization/normalisation)
+WORD_VARIANT_OVERLAP = 0.5
+# Leading characters spelling variants must share (overfitting/underfitting, encoder/decoder differ)
+WORD_VARIANT_PREFIX = 3
+# Longest acronym looked up in the initials tables
+MAX_ACRONYM = 8
+
+# Words that never change what a topic is about
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'the', 'of', 'in', 'for', 'to', 'on', 'with', 'vs', 'versus', 'or',
+    'introduction', 'intro', 'overview', 'basic', 'basics', 'fundamentals', 'concepts',
+})
+
+
+def threshold_from_env(default: float = DEFAULT_THRESHOLD) -> float:
+    """Similarity threshold from SUMMARY_SIMILARITY_THRESHOLD, if set"""
+    try:
+        return float(os.getenv("SUMMARY_SIMILARITY_THRESHOLD", default))
+    except ValueError:
+        return default
+
+
+def _stem(word: str) -> str:
+    """Crude plural folding: LSTMs -> lstm, networks -> network"""
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def topic_words(text: str) -> List[str]:
+    """Significant, plural-folded words of a topic"""
+    return [_stem(word) for word in tokenize(text) if word not in STOPWORDS]
+
+
+def _initials(words: List[str]) -> str:
+    return "".join(word[0] for word in words)
+
+
+def _span_initials(words: List[str]) -> Iterable[str]:
+    """Initials of every run of 2 to MAX_ACRONYM consecutive words"""
+    for start in range(len(words)):
+        for end in range(start + 2, min(len(words), start + MAX_ACRONYM) + 1):
+            yield _initials(words[start:end])
+
+
+def _trigrams(word: str) -> set:
+    padded = f" {word} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def _variants(a: str, b: str) -> bool:
+    """Same word up to spelling; a prefix or a different number makes a different word"""
+    if a == b:
+        return True
+    if a.endswith(b) or b.endswith(a) or any(c.isdigit() for c in a + b):
+        return False  # supervised/unsupervised, gpt3/gpt4
+    if a[:WORD_VARIANT_PREFIX] != b[:WORD_VARIANT_PREFIX]:
+        return False  # overfitting/underfitting, oversampling/undersampling
+    ga, gb = _trigrams(a), _trigrams(b)
+    return len(ga & gb) / len(ga | gb) >= WORD_VARIANT_OVERLAP
+
+
+def _aligned(a: List[str], b: List[str]) -> bool:
+    """True when every word of each topic has a counterpart in the other.
+
+    Words match themselves, their spelling variants, or an acronym of
+    consecutive words on the other side (lstm <-> long short term memory).
+    """
+    matched_a, matched_b = set(), set()
+    for i, x in enumerate(a):
+        for j, y in enumerate(b):
+            if _variants(x, y):
+                matched_a.add(i)
+                matched_b.add(j)
+
+    for words, others, matched, matched_others in ((a, b, matched_a, matched_b), (b, a, matched_b, matched_a)):
+        for i, word in enumerate(words):
+            if i in matched or len(word) < 2:
+                continue
+            for start in range(len(others) - len(word) + 1):
+                if _initials(others[start:start + len(word)]) == word:
+                    matched.add(i)
+                    matched_others.update(range(start, start + len(word)))
+                    break
+    return len(matched_a) == len(a) and len(matched_b) == len(b)
+
+
+def _expanded(words: List[str], others: List[str]) -> List[str]:
+    """Words with every acronym of consecutive words in ``others`` spelled out"""
+    expanded = []
+    for word in words:
+        for start in range(len(others) - len(word) + 1):
+            if len(word) >= 2 and _initials(others[start:start + len(word)]) == word:
+                expanded += others[start:start + len(word)]
+                break
+        else:
+            expanded.append(word)
+    return expanded
+
+
+class SimilarityIndex:
+    """Finds a previously summarized topic that is a paraphrase of a new one.
+
+    Topics are embedded locally as hashed character trigram and word
+    features, weighted by TF-IDF; a lookup is one matrix-vector product over
+    every stored topic. The best candidates above ``threshold`` must also
+    pass a word-alignment check, so "Supervised Learning" never stands in
+    for "Unsupervised Learning", nor "Overfitting" for "Underfitting".
+    Acronyms are matched through a separate initials table because they
+    share too few n-grams with their expansion;
+    they are scored with the acronym spelled out, and an acronym that expands
+    to more than one stored topic matches none of them.
+    """
+
+    def __init__(self, topics: Iterable[str] = (), threshold: float = DEFAULT_THRESHOLD,
+                 dimensions: int = DEFAULT_DIMENSIONS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._topics: List[str] = []
+        self._words: List[List[str]] = []
+        self._rows: Dict[str, int] = {}             # normalized topic -> row
+        self._initials: Dict[str, set] = {}         # initials of consecutive words -> rows
+        self._acronyms: Dict[str, set] = {}         # short words (possible acronyms) -> rows
+        self._counts = np.zeros((0, dimensions), dtype=np.float32)
+        self._df = np.zeros(dimensions, dtype=np.float32)
+        self._weighted = None   # TF-IDF rows scaled to unit length
+        self._idf = None
+        self._idf_rows = 0      # number of topics the IDF was computed from
+        self.lookups = 0
+        self.matches = 0
+        self.add_many(topics)
+
+    def __len__(self) -> int:
+        return len(self._topics)
+
+    def _bucket(self, feature: str) -> int:
+        # crc32 rather than hash(): stable across processes and runs
+        return zlib.crc32(feature.encode('utf-8')) % self.dimensions
+
+    def _features(self, words: List[str]) -> np.ndarray:
+        counts = np.zeros(self.dimensions, dtype=np.float32)
+        for word in words:
+            for gram in _trigrams(word):
+                counts[self._bucket(gram)] += 1.0
+            counts[self._bucket("w:" + word)] += WORD_WEIGHT
+        return counts
+
+    def add(self, topic: str):
+        self.add_many([topic])
+
+    def add_many(self, topics: Iterable[str]):
+        with self._lock:
+            new_counts = []
+            for topic in topics:
+                words = topic_words(topic)
+                key = " ".join(words)
+                if not words or key in self._rows:
+                    continue
+                row = len(self._topics)
+                self._rows[key] = row
+                self._topics.append(topic)
+                self._words.append(words)
+                self._register(row, words)
+                new_counts.append(self._features(words))
+            if not new_counts:
+                return
+            added = np.vstack(new_counts)
+            self._counts = np.vstack([self._counts, added])
+            self._df += (added > 0).sum(axis=0)
+            if len(self._topics) > self.max_entries:
+                self._drop_oldest(len(self._topics) - self.max_entries)
+            self._update_weights(added)
+
+    def _drop_oldest(self, count: int):
+        self._df -= (self._counts[:count] > 0).sum(axis=0)
+        self._counts = self._counts[count:]
+        self._topics = self._topics[count:]
+        self._words = self._words[count:]
+        self._rows = {" ".join(words): row for row, words in enumerate(self._words)}
+        self._initials = {}
+        self._acronyms = {}
+        for row, words in enumerate(self._words):
+            self._register(row, words)
+        self._weighted = None
+
+    def _register(self, row: int, words: List[str]):
+        for initials in _span_initials(words):
+            self._initials.setdefault(initials, set()).add(row)
+        for word in words:
+            if 2 <= len(word) <= MAX_ACRONYM:
+                self._acronyms.setdefault(word, set()).add(row)
+
+    def _weigh(self, counts: np.ndarray) -> np.ndarray:
+        weighted = np.where(counts > 0, 1.0 + np.log(np.maximum(counts, 1.0)), 0.0) * self._idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return (weighted / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def _update_weights(self, added: np.ndarray):
+        """Weigh new rows with the current IDF; recompute it all once the index grew by 10%"""
+        rows = len(self._topics)
+        if self._weighted is None or rows > self._idf_rows * 1.1 + 10:
+            self._idf = np.log((1.0 + rows) / (1.0 + self._df)) + 1.0
+            self._idf_rows = rows
+            self._weighted = self._weigh(self._counts)
+        else:
+            self._weighted = np.vstack([self._weighted, self._weigh(added)])
+
+    def nearest(self, topic: str, threshold: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """The stored topic that paraphrases this one, with its cosine similarity, or None"""
+        threshold = self.threshold if threshold is None else threshold
+        words = topic_words(topic)
+        with self._lock:
+            self.lookups += 1
+            if not words or not self._topics:
+                return None
+
+            exact = self._rows.get(" ".join(words))
+            if exact is not None:
+                self.matches += 1
+                return self._topics[exact], 1.0
+
+            scores = self._weighted @ self._weigh(self._features(words))
+            top = np.argpartition(-scores, min(TOP_K, len(scores)) - 1)[:TOP_K]
+            for row in sorted(top, key=lambda row: -scores[row]):
+                if scores[row] < threshold:
+                    break
+                if _aligned(words, self._words[row]):
+                    self.matches += 1
+                    return self._topics[row], float(scores[row])
+
+            # Acronyms and their expansions share almost no n-grams
+            candidates = set()
+            for word in words:
+                candidates.update(self._initials.get(word, ()))
+            for initials in _span_initials(words):
+                candidates.update(self._acronyms.get(initials, ()))
+            matches = []
+            for row in candidates:
+                if not _aligned(words, self._words[row]):
+                    continue
+                score = float(self._weigh(self._features(_expanded(words, self._words[row])))
+                              @ self._weigh(self._features(_expanded(self._words[row], words))))
+                if score >= threshold:
+                    matches.append((self._topics[row], score))
+            if len(matches) == 1:
+                self.matches += 1
+                return matches[0]
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'topics': len(self._topics),
+                'lookups': self.lookups,
+                'matches': self.matches,
+                'match_rate': self.matches / self.lookups if self.lookups else 0.0,
+            }
@@ -0,0 +1,208 @@
+# Single Flight
+
+# Coalesces identical in-flight requests so only one of them reaches the model.
+
+# single_flight.py
+
+import threading
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class FlightAbandoned(Exception):
+    """The leader stopped without an outcome, e.g. its stream was closed; claim() the key again"""
+
+
+class FlightCall:
+    """A request in progress; followers wait on it for the leader's outcome"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+        self._abandoned = False
+
+    def wait(self, timeout: float = None) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for an identical in-flight request")
+        if self._abandoned:
+            raise FlightAbandoned("The identical in-flight request was stopped")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, FlightCall] = {}
+        self.executed = 0
+        self.merged = 0
+
+    def claim(self, key: str) -> Tuple[FlightCall, bool]:
+        """Join the call in progress for key, or start one. Returns (call, is_leader).
+
+        The leader must finish the call with resolve(), fail() or abandon().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.merged += 1
+                return call, False
+            call = FlightCall()
+            self._calls[key] = call
+            self.executed += 1
+            return call, True
+
+    def resolve(self, key: str, call: FlightCall, value: Any):
+        with self._lock:
+            self._calls.pop(key, None)
+        call._value = value
+        call._done.set()
+
+    def fail(self, key: str, call: FlightCall, error: Exception):
+        """Hand the leader's error to every follower"""
+        with self._lock:
+            self._calls.pop(key, None)
+        call._error = error
+        call._done.set()
+
+    def abandon(self, key: str, call: FlightCall):
+        """Release a call the leader stopped without an outcome; its followers claim the key again.
+
+        Used for GeneratorExit, KeyboardInterrupt and the like, which belong
+        to the leader's caller and must not be raised in other sessions.
+        """
+        with self._lock:
+            self._calls.pop(key, None)
+        call._abandoned = True
+        call._done.set()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn for key, or wait for the identical call already running"""
+        while True:
+            call, leader = self.claim(key)
+            if leader:
+                break
+            try:
+                return call.wait()
+            except FlightAbandoned:
+                continue
+        try:
+            value = fn()
+        except Exception as e:
+            self.fail(key, call, e)
+            raise
+        except BaseException:
+            self.abandon(key, call)
+            raise
+        self.resolve(key, call, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {'executed': self.executed, 'merged': self.merged, 'in_flight': in_flight}
+
+
+class _AsyncFlight:
+    def __init__(self, task: 'asyncio.Future', loop):
+        self.task = task
+        self.loop = loop
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop.
+
+    The first caller's coroutine runs as a task that every identical caller
+    awaits. A cancelled caller only stops waiting; the request itself is
+    cancelled once nobody is waiting for it any more.
+
+    asyncio is imported on first use; synchronous callers never load it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _AsyncFlight] = {}
+        self.executed = 0
+        self.merged = 0
+
+    def _joinable(self, key: str, loop) -> Optional[_AsyncFlight]:
+        flight = self._calls.get(key)
+        if flight is not None and flight.loop is loop:
+            self.merged += 1
+            return flight
+        return None
+
+    def _start(self, key: str, task: 'asyncio.Future', loop) -> _AsyncFlight:
+        flight = _AsyncFlight(task, loop)
+        self._calls[key] = flight
+        task.add_done_callback(lambda task, key=key: self._finished(key, task))
+        self.executed += 1
+        return flight
+
+    def claim(self, key: str) -> Tuple['asyncio.Future', bool]:
+        """Join the call in progress for key, or start one. Returns (future, is_leader).
+
+        The leader must finish the call with resolve(), fail() or abandon();
+        followers await the future.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        flight = self._joinable(key, loop)
+        if flight is not None:
+            return flight.task, False
+        return self._start(key, loop.create_future(), loop).task, True
+
+    def resolve(self, key: str, future: 'asyncio.Future', value: Any):
+        if not future.done():
+            future.set_result(value)
+
+    def fail(self, key: str, future: 'asyncio.Future', error: Exception):
+        """Hand the leader's error to every follower"""
+        if not future.done():
+            future.set_exception(error)
+            future.exception()  # followers re-raise it; nobody waiting is not an error
+
+    def abandon(self, key: str, future: 'asyncio.Future'):
+        """Release a call the leader stopped without an outcome; its followers claim the key again.
+
+        Used when the leader is cancelled or its stream closed, which must not
+        cancel the tasks waiting on it.
+        """
+        flight = self._calls.get(key)
+        if flight is not None and flight.task is future:
+            del self._calls[key]
+        self.fail(key, future, FlightAbandoned("The identical in-flight request was stopped"))
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or wait for the identical call already running"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            flight = self._joinable(key, loop) or self._start(key, asyncio.ensure_future(fn()), loop)
+
+            flight.waiters += 1
+            try:
+                return await asyncio.shield(flight.task)
+            except FlightAbandoned:
+                continue
+            finally:
+                flight.waiters -= 1
+                # A claimed call belongs to its leader, which keeps it going for its own caller
+                if not flight.waiters and not flight.task.done() and isinstance(flight.task, asyncio.Task):
+                    flight.task.cancel()
+
+    def _finished(self, key: str, task: 'asyncio.Future'):
+        flight = self._calls.get(key)
+        if flight is not None and flight.task is task:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {'executed': self.executed, 'merged': self.merged, 'in_flight': len(self._calls)}
@@ -3,21 +3,136 @@
 # This agent generates summaries based on the plan using dynamic prompt loading.
 # summarizer_agent.py
 
-from openai import OpenAI
 import os
-from typing import Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from summary_cache import SummaryCache, prompt_fingerprint, summary_key
+from precomputed import PrecomputedSummaries
+from single_flight import FlightAbandoned, FlightCall, SingleFlight
+from memory_store import MemoryStore, memory_from_env
+from model_router import ModelRouter, shared_summarizer_router
+from prompt_builder import PromptBuilder, PromptPlan, batch_budget_from_env, budget_from_env, split_batch_reply
+from scheduler import CallScheduler, shared_scheduler
+from telemetry import CallTracker, Telemetry
+
+if TYPE_CHECKING:
+    # Only needed for annotations; openai and numpy are slow to import
+    from openai import OpenAI
+    from session_index import SessionIndex
+    from similarity_index import SimilarityIndex
+
+DEFAULT_MAX_CONCURRENCY = 4
+# Subtopics whose answering model is remembered for journaling
+ANSWERED_BY_ENTRIES = 1024
+PROMPT_PATH = os.path.join(os.path.dirname(__file__), 'prompts', 'revision_prompt.txt')
+
+# The prompt text is shared by every agent in the process and re-read only when the file changes
+_shared_prompt = {}
+_shared_prompt_lock = threading.Lock()
+
+# Process-wide so identical requests from different sessions are coalesced
+shared_flight = SingleFlight()
+
+
+class SummaryResult(NamedTuple):
+    """Outcome of a single topic in a batch run"""
+    index: int
+    topic: str
+    summary: str
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _cancel_all(futures: Iterable):
+    for future in futures:
+        future.cancel()
+
+
+class SummaryResults:
+    """Results of summarize_many() as they finish.
+
+    close() cancels the topics not started yet, even before the first
+    result has been read; closing a plain generator that early would skip
+    its cleanup.
+    """
+
+    def __init__(self, results: Iterator[SummaryResult], cancel: Callable[[], None]):
+        self._results = results
+        self._cancel = cancel
+
+    def __iter__(self) -> 'SummaryResults':
+        return self
+
+    def __next__(self) -> SummaryResult:
+        return next(self._results)
+
+    def cancel(self):
+        """Cancel the topics not started yet; safe to call from another thread"""
+        self._cancel()
+
+    def close(self):
+        self._results.close()
+        self._cancel()
+
 
 class SummarizerAgent:
-    def __init__(self, client: OpenAI):
+    def __init__(self, client: 'OpenAI', cache: Optional[SummaryCache] = None,
+                 precomputed: Optional[PrecomputedSummaries] = None,
+                 flight: Optional[SingleFlight] = None,
+                 scheduler: Optional[CallScheduler] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 history: Optional['SessionIndex'] = None,
+                 similar: Optional['SimilarityIndex'] = None,
+                 router: Optional[ModelRouter] = None,
+                 memory: Optional[MemoryStore] = None):
         self.client = client
-        self.system_prompt = self._load_prompt_template()
-        self.session_memory = {}  # Store context for session memory
+        self.router = router if router is not None else shared_summarizer_router
+        # Summaries are cached under the primary model, whichever candidate wrote them
+        self.model = self.router.primary
+        self.temperature = 0.5
+        self.session_memory = memory if memory is not None else memory_from_env()  # Store context for session memory
+        self.cache = cache
+        self.precomputed = precomputed
+        self.history = history
+        self.similar = similar
+        self.flight = flight if flight is not None else shared_flight
+        self.scheduler = scheduler if scheduler is not None else shared_scheduler
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.input_budget = budget_from_env()
+        self.batch_budget = batch_budget_from_env()
+        # The prompt file is read, and the similarity index seeded, on first use
+        self._prompt_mtime = -1.0
+        self._system_prompt = None
+        self._prompt_hash = None
+        self._prompt_builder = None
+        self._seeded = similar is None
+        self._seed_lock = threading.Lock()
+        # Model that wrote each recent summary; a fallback or hedge may answer instead of the primary
+        self._answered_by: 'OrderedDict[str, str]' = OrderedDict()
+        self._answered_lock = threading.Lock()
+
+    @property
+    def system_prompt(self) -> str:
+        if self._system_prompt is None:
+            self._refresh_prompt()
+        return self._system_prompt
+
+    @property
+    def prompt_hash(self) -> str:
+        if self._prompt_hash is None:
+            self._refresh_prompt()
+        return self._prompt_hash
 
     def _load_prompt_template(self) -> str:
         """Load the system prompt from the prompts directory"""
         try:
-            prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'revision_prompt.txt')
-            with open(prompt_path, 'r', encoding='utf-8') as f:
+            with open(PROMPT_PATH, 'r', encoding='utf-8') as f:
                 return f.read().strip()
         except FileNotFoundError:
             print("⚠️ Prompt template not found. Using default prompt.")
@@ -27,46 +142,433 @@ class SummarizerAgent:
                 "Be technically accurate, exam-oriented, and to the point."
             )
 
+    def _refresh_prompt(self):
+        """Reload the prompt when its file changes so cache keys follow edits"""
+        try:
+            mtime = os.stat(PROMPT_PATH).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._prompt_mtime:
+            return
+
+        with _shared_prompt_lock:
+            if _shared_prompt.get('mtime', -1.0) != mtime:
+                _shared_prompt['text'] = self._load_prompt_template()
+                _shared_prompt['mtime'] = mtime
+            self._system_prompt = _shared_prompt['text']
+        self._prompt_hash = prompt_fingerprint(self._system_prompt)
+        self._prompt_builder = PromptBuilder(self._system_prompt, self.input_budget, self.model)
+        if self.cache is not None:
+            # Summaries written under an older prompt can never be hit again
+            self.cache.retain_prompt(self._prompt_hash)
+        # Set last: other threads skip the refresh once it matches, and use the builder right away
+        self._prompt_mtime = mtime
+
     def add_to_memory(self, topic: str, context: Dict[str, Any]):
-        """Add topic context to session memory"""
-        self.session_memory[topic] = context
+        """Add topic context to session memory; only its 'summary' and 'context' are kept"""
+        self.session_memory.put(topic, context.get('summary'), context.get('context', ''))
 
     def get_from_memory(self, topic: str) -> Dict[str, Any]:
         """Retrieve topic context from session memory"""
-        return self.session_memory.get(topic, {})
+        return self.session_memory.as_dict(topic)
 
-    def summarize(self, subtopic: str) -> str:
-        """Generate a summary for the given subtopic"""
+    @staticmethod
+    def fallback_message(subtopic: str) -> str:
+        """Text shown in place of a summary that could not be generated"""
+        return f"Unable to generate summary for {subtopic}. Please try again."
+
+    def cache_key(self, subtopic: str) -> str:
+        """Key of this subtopic's summary under the current model and prompt"""
+        return summary_key(self.model, self.temperature, self.system_prompt, subtopic)
+
+    def _answered(self, subtopic: str, model: str):
+        with self._answered_lock:
+            self._answered_by[subtopic] = model
+            self._answered_by.move_to_end(subtopic)
+            if len(self._answered_by) > ANSWERED_BY_ENTRIES:
+                self._answered_by.popitem(last=False)
+
+    def answered_by(self, subtopic: str) -> str:
+        """The model that wrote the summary last served for this subtopic"""
+        with self._answered_lock:
+            return self._answered_by.get(subtopic, self.model)
+
+    def _remember(self, subtopic: str, summary: str):
+        """Store this summary in memory for potential follow-up"""
+        self.session_memory.put(subtopic, summary)
+
+    def _seed_similar(self):
+        """Make every summary we can already serve findable by paraphrase"""
+        with self._seed_lock:
+            if self._seeded:
+                return
+            topics = list(self.precomputed.entries) if self.precomputed is not None else []
+            if self.cache is not None:
+                topics += self.cache.subtopics(self.prompt_hash)
+            self.similar.add_many(topics)
+            self._seeded = True
+
+    def _stored(self, subtopic: str, key: str) -> Optional[str]:
+        stored = None
+        if self.precomputed is not None:
+            stored = self.precomputed.get(subtopic, key)
+        if stored is None and self.cache is not None:
+            stored = self.cache.get(key)
+        return stored
+
+    def _lookup(self, subtopic: str, key: str) -> Optional[str]:
+        """Return an already generated summary from the precomputed artifact, cache or past sessions.
+
+        A paraphrase of a stored topic ("LSTMs & GRUs" for "LSTM and GRU")
+        is served that topic's summary when a similarity index is attached.
+        """
+        start = time.perf_counter()
+        stored = self._stored(subtopic, key)
+        if stored is None and self.similar is not None:
+            if not self._seeded:
+                self._seed_similar()
+            match = self.similar.nearest(subtopic)
+            if match is not None and match[0] != subtopic:
+                stored = self._stored(match[0], self.cache_key(match[0]))
+        if stored is None and self.history is not None:
+            stored = self.history.reusable(subtopic, self.model, self.prompt_hash, self.temperature)
+        if stored is not None:
+            self.telemetry.record_cache_hit('summarizer', self.model, subtopic,
+                                            time.perf_counter() - start)
+            # Only the primary's answers are stored under its key
+            self._answered(subtopic, self.model)
+            self._remember(subtopic, stored)
+        return stored
+
+    def _prompt(self, subtopic: str) -> PromptPlan:
+        """The request for a subtopic, with any previous context trimmed to the input budget"""
+        if self._prompt_builder is None:
+            self._refresh_prompt()
         # Check if we have previous context for this topic
         memory_context = self.get_from_memory(subtopic)
-        
-        # Prepare the user message with context if available
-        user_message = f"Explain this subtopic for revision: {subtopic}"
-        if memory_context:
-            user_message += f"\n\nPrevious context: {memory_context.get('context', '')}"
-
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": user_message}
-        ]
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="openai/gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.5
-            )
+        return self._prompt_builder.build(subtopic, memory_context.get('context', '') if memory_context else '')
+
+    def _build_messages(self, subtopic: str) -> List[Dict[str, str]]:
+        return self._prompt(subtopic).messages
+
+    def _store(self, subtopic: str, key: str, summary: str, model: str):
+        """Keep a freshly generated summary in the shared cache.
+
+        Keys name the primary model, so an answer from a fallback or hedge
+        model is served to this session but not cached.
+        """
+        self._answered(subtopic, model)
+        if self.cache is not None and summary and model == self.model:
+            self.cache.put(key, summary, self.prompt_hash, self.model, subtopic)
+            if self.similar is not None:
+                self.similar.add(subtopic)
+
+    def _completion_params(self, messages: List[Dict[str, str]], model: Optional[str] = None,
+                           **kwargs) -> Dict[str, Any]:
+        """Arguments of chat.completions.create, shared with the async agent"""
+        return dict(model=model or self.model, messages=messages, temperature=self.temperature, **kwargs)
+
+    def _create_completion(self, prompt: PromptPlan, call: CallTracker, **kwargs):
+        """Send a completion request to the routed model through the shared rate limiter and retry policy"""
+        call.record_prompt(prompt.saved_tokens)
+        return self.router.call(
+            lambda model, attempt_timeout: self.scheduler.call(
+                lambda timeout: self.client.chat.completions.create(
+                    timeout=timeout, **self._completion_params(prompt.messages, model, max_tokens=prompt.max_tokens,
+                                                               **kwargs)
+                ),
+                estimated_tokens=prompt.prompt_tokens + prompt.max_tokens,
+                deadline=attempt_timeout,
+                on_retry=call.retried,
+                model=model
+            ),
+            stream=kwargs.get('stream', False),
+            on_model=call.use_model,
+            on_discarded=call.discarded
+        )
+
+    def _check_truncated(self, subtopic: str, finish_reason: Optional[str]):
+        if finish_reason == 'length':
+            print(f"⚠️ Summary for {subtopic} reached the {self._prompt_builder.max_tokens}-token limit "
+                  f"and may be cut short.")
+
+    def _request_summary(self, subtopic: str, key: str) -> Tuple[str, str]:
+        """(summary, model that wrote it)"""
+        prompt = self._prompt(subtopic)
+        with self.telemetry.track('summarizer', self.model, subtopic) as call:
+            response = self._create_completion(prompt, call)
             summary = response.choices[0].message.content.strip()
-            
-            # Store this summary in memory for potential follow-up
-            self.add_to_memory(subtopic, {
-                'summary': summary,
-                'context': f"Previously explained {subtopic}",
-                'timestamp': str(os.times())
-            })
-            
-            return summary
-            
+            call.record_usage(response.usage, prompt.messages, summary)
+        self._check_truncated(subtopic, getattr(response.choices[0], 'finish_reason', None))
+        self._store(subtopic, key, summary, call.model)
+        return summary, call.model
+
+    def generate(self, subtopic: str) -> str:
+        """Call the model for a subtopic; errors propagate to the caller"""
+        self._refresh_prompt()
+        key = self.cache_key(subtopic)
+        stored = self._lookup(subtopic, key)
+        if stored is not None:
+            return stored
+
+        # Identical requests already in flight (from any session) share one model call
+        summary, model = self.flight.do(key, lambda: self._request_summary(subtopic, key))
+        self._answered(subtopic, model)
+        self._remember(subtopic, summary)
+        return summary
+
+    def regenerate(self, subtopic: str) -> str:
+        """Call the model even when a summary is stored, and replace the cached one"""
+        self._refresh_prompt()
+        summary, _ = self._request_summary(subtopic, self.cache_key(subtopic))
+        self._remember(subtopic, summary)
+        return summary
+
+    def generate_stream(self, subtopic: str) -> Iterator[str]:
+        """Yield the summary in chunks as the model produces them; errors propagate.
+
+        A stored summary, or the result of an identical request already in
+        flight, is yielded as a single chunk. The full text is kept in memory
+        and the cache once the stream has been consumed.
+        """
+        self._refresh_prompt()
+        key = self.cache_key(subtopic)
+        stored = self._lookup(subtopic, key)
+        if stored is not None:
+            yield stored
+            return
+
+        call, leader = self.flight.claim(key)
+        while not leader:
+            try:
+                summary, model = call.wait()
+            except FlightAbandoned:
+                # The leader's stream was closed before it finished; take over
+                call, leader = self.flight.claim(key)
+                continue
+            self._answered(subtopic, model)
+            self._remember(subtopic, summary)
+            yield summary
+            return
+
+        try:
+            prompt = self._prompt(subtopic)
+            with self.telemetry.track('summarizer', self.model, subtopic) as tracker:
+                stream = self._create_completion(prompt, tracker, stream=True)
+                parts = []
+                usage = None
+                finish_reason = None
+                for chunk in stream:
+                    # OpenRouter reports usage on the final chunk
+                    usage = getattr(chunk, 'usage', None) or usage
+                    if not chunk.choices:
+                        continue
+                    finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or finish_reason
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        tracker.first_token()
+                        parts.append(delta)
+                        yield delta
+
+                summary = ''.join(parts).strip()
+                tracker.record_usage(usage, prompt.messages, summary)
+            self._check_truncated(subtopic, finish_reason)
+            self._store(subtopic, key, summary, tracker.model)
+        except Exception as e:
+            self.flight.fail(key, call, e)
+            raise
+        except BaseException:
+            # Closed or interrupted by our own caller; followers should not see that
+            self.flight.abandon(key, call)
+            raise
+        self.flight.resolve(key, call, (summary, tracker.model))
+        self._remember(subtopic, summary)
+
+    def summarize(self, subtopic: str) -> str:
+        """Generate a summary for the given subtopic"""
+        try:
+            return self.generate(subtopic)
+        except Exception as e:
+            print(f"❌ Error generating summary for {subtopic}: {str(e)}")
+            return self.fallback_message(subtopic)
+
+    def summarize_stream(self, subtopic: str) -> Iterator[str]:
+        """Stream a summary for the given subtopic chunk by chunk"""
+        streamed = False
+        try:
+            for chunk in self.generate_stream(subtopic):
+                streamed = True
+                yield chunk
         except Exception as e:
             print(f"❌ Error generating summary for {subtopic}: {str(e)}")
-            return f"Unable to generate summary for {subtopic}. Please try again."
+            yield ("\n\n" if streamed else "") + self.fallback_message(subtopic)
+
+    def summarize_many(self, topics: Iterable[str],
+                       max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                       batched: bool = False) -> Iterator[SummaryResult]:
+        """Summarize several topics in parallel.
+
+        Requests are submitted as soon as this is called, at most
+        ``max_concurrency`` at a time. The returned iterator yields a
+        SummaryResult as each topic finishes; a failing topic is reported
+        through ``error`` and does not cancel the others. Closing the
+        iterator early cancels the topics that have not started yet.
+
+        ``batched`` packs topics into shared requests; see _summarize_batched.
+        """
+        topics = list(topics)
+        if not topics:
+            return iter(())
+        if batched:
+            return self._summarize_batched(topics, max_concurrency)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(topics))))
+        futures = {executor.submit(self.generate, topic): (i, topic) for i, topic in enumerate(topics)}
+        # Already-submitted work keeps running; this only releases the threads when done
+        executor.shutdown(wait=False)
+        return SummaryResults(self._iter_completed(futures), lambda: _cancel_all(futures))
+
+    def _iter_completed(self, futures) -> Iterator[SummaryResult]:
+        try:
+            for future in as_completed(futures):
+                index, topic = futures[future]
+                try:
+                    yield SummaryResult(index, topic, future.result())
+                except Exception as e:
+                    yield SummaryResult(index, topic, self.fallback_message(topic), str(e))
+        finally:
+            _cancel_all(futures)
+
+    def _request_batch(self, items: List[Tuple[int, str]]) -> Tuple[List[SummaryResult], List[Tuple[int, str]]]:
+        """Summarize several topics in one request: (accepted results, topics to redo on their own).
+
+        Each topic claims its single-flight key first. A topic already being
+        requested elsewhere is left out of the request and takes that call's
+        summary instead.
+        """
+        claimed, joined = [], []
+        for index, topic in items:
+            key = self.cache_key(topic)
+            call, leader = self.flight.claim(key)
+            (claimed if leader else joined).append((index, topic, key, call))
+
+        results, failed = self._send_batch(claimed) if claimed else ([], [])
+        for index, topic, key, call in joined:
+            try:
+                summary, model = call.wait()
+            except FlightAbandoned:
+                failed.append((index, topic))  # requested again on its own, which claims it afresh
+                continue
+            except Exception as e:
+                results.append(SummaryResult(index, topic, self.fallback_message(topic), str(e)))
+                continue
+            self._answered(topic, model)
+            self._remember(topic, summary)
+            results.append(SummaryResult(index, topic, summary))
+        return results, failed
+
+    def _send_batch(self, claimed: List[Tuple[int, str, str, FlightCall]]
+                    ) -> Tuple[List[SummaryResult], List[Tuple[int, str]]]:
+        """The batched request for topics whose flights we lead; every flight not resolved is abandoned"""
+        topics = [topic for _, topic, _, _ in claimed]
+        prompt = self._prompt_builder.build_batch(topics)
+        results, failed, resolved = [], [], set()
+        try:
+            try:
+                with self.telemetry.track('summarizer', self.model, " | ".join(topics)) as call:
+                    response = self._create_completion(prompt, call)
+                    content = response.choices[0].message.content or ""
+                    call.record_usage(response.usage, prompt.messages, content)
+            except Exception as e:
+                print(f"⚠️ Batched request for {len(claimed)} topics failed ({str(e)}). "
+                      f"Requesting them one by one.")
+                return [], [(index, topic) for index, topic, _, _ in claimed]
+
+            sections = split_batch_reply(content)
+            if getattr(response.choices[0], 'finish_reason', None) == 'length' and sections:
+                # The reply was cut off inside its last summary
+                del sections[max(sections)]
+            for number, (index, topic, key, flight) in enumerate(claimed, 1):
+                summary = sections.get(number)
+                if not self._prompt_builder.complete_summary(summary):
+                    failed.append((index, topic))
+                    continue
+                self._store(topic, key, summary, call.model)
+                self.flight.resolve(key, flight, (summary, call.model))
+                resolved.add(key)
+                self._remember(topic, summary)
+                results.append(SummaryResult(index, topic, summary))
+        finally:
+            # Followers of a failed or missing topic claim it again, as its retry here does
+            for _, _, key, flight in claimed:
+                if key not in resolved:
+                    self.flight.abandon(key, flight)
+        if failed:
+            print(f"⚠️ {len(failed)} of {len(claimed)} batched summaries were missing or incomplete. "
+                  f"Requesting them one by one.")
+        return results, failed
+
+    def _run_batch(self, items: List[Tuple[int, str]]) -> Tuple[List[SummaryResult], List[Tuple[int, str]]]:
+        if len(items) > 1:
+            return self._request_batch(items)
+        index, topic = items[0]
+        try:
+            return [SummaryResult(index, topic, self.generate(topic))], []
+        except Exception as e:
+            return [SummaryResult(index, topic, self.fallback_message(topic), str(e))], []
+
+    def _summarize_batched(self, topics: List[str], max_concurrency: int) -> Iterator[SummaryResult]:
+        """summarize_many() with several topics per request.
+
+        Stored summaries are yielded first. The remaining topics are packed
+        into requests that fit ``batch_budget`` prompt and completion tokens,
+        so the system prompt is sent once per batch rather than once per
+        topic. Each summary in a reply is checked on its own, and one that is
+        missing or too short is requested again in a single call. Topics with
+        session context are always requested alone, so their context is
+        sent.
+        """
+        self._refresh_prompt()
+        stored, jobs, batchable = [], [], []
+        for index, topic in enumerate(topics):
+            summary = self._lookup(topic, self.cache_key(topic))
+            if summary is not None:
+                stored.append(SummaryResult(index, topic, summary))
+            elif self.get_from_memory(topic):
+                jobs.append([(index, topic)])
+            else:
+                batchable.append((index, topic))
+        packed = self._prompt_builder.pack_batches([topic for _, topic in batchable], self.batch_budget)
+        jobs = [[batchable[position] for position in batch] for batch in packed] + jobs
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(topics))))
+        pending = {executor.submit(self._run_batch, items): items for items in jobs}
+
+        def cancel():
+            _cancel_all(list(pending))
+            executor.shutdown(wait=False)
+
+        return SummaryResults(self._iter_batched(stored, executor, pending), cancel)
+
+    def _iter_batched(self, stored: List[SummaryResult], executor: ThreadPoolExecutor,
+                      pending) -> Iterator[SummaryResult]:
+        try:
+            yield from stored
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    results, failed = future.result()
+                    yield from results
+                    for item in failed:
+                        pending[executor.submit(self._run_batch, [item])] = [item]
+        finally:
+            _cancel_all(list(pending))
+            executor.shutdown(wait=False)
+
+    def summarize_all(self, topics: Iterable[str],
+                      max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                      batched: bool = False) -> List[SummaryResult]:
+        """Summarize several topics in parallel and return results in input order"""
+        results = list(self.summarize_many(topics, max_concurrency, batched))
+        return sorted(results, key=lambda result: result.index)
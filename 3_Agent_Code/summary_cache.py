@@ -0,0 +1,164 @@
+# Summary Cache
+
+# Disk-backed cache of generated summaries, shared across runs and processes.
+
+# summary_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'summaries.sqlite3')
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+
+
+def prompt_fingerprint(system_prompt: str) -> str:
+    """Short stable hash identifying a version of the system prompt"""
+    return hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+
+
+def summary_key(model: str, temperature: float, system_prompt: str, subtopic: str) -> str:
+    """Content address of a summary: everything that changes the model's answer"""
+    payload = json.dumps([model, temperature, system_prompt, subtopic], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """SQLite-backed summary store with TTL expiry and LRU eviction"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " key TEXT PRIMARY KEY,"
+                " prompt_hash TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " subtopic TEXT NOT NULL,"
+                " summary TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS summaries_last_access ON summaries (last_access)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached summary for a key, or None on a miss"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT summary, created FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, summary: str, prompt_hash: str, model: str, subtopic: str):
+        """Store a summary and evict least recently used entries beyond the limits"""
+        now = time.time()
+        size = len(summary.encode('utf-8'))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries"
+                " (key, prompt_hash, model, subtopic, summary, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, prompt_hash, model, subtopic, summary, size, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        """Drop expired rows, then the least recently used until within limits"""
+        expired = self._conn.execute(
+            "DELETE FROM summaries WHERE created < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self.evictions += max(expired, 0)
+
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM summaries ORDER BY last_access ASC"
+        ).fetchall()
+        victims = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM summaries WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def retain_prompt(self, prompt_hash: str) -> int:
+        """Delete entries generated with any other version of the prompt"""
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM summaries WHERE prompt_hash != ?", (prompt_hash,)
+            ).rowcount
+        self.evictions += max(removed, 0)
+        return removed
+
+    def subtopics(self, prompt_hash: str) -> List[str]:
+        """Subtopics with a summary stored under this prompt version"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT subtopic FROM summaries WHERE prompt_hash = ? ORDER BY last_access", (prompt_hash,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self):
+        """Remove every cached summary"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM summaries")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size of the cache"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': count,
+            'bytes': total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,203 @@
+# Summary Jobs
+
+# Background summary generation that outlives the page run that started it.
+
+# summary_jobs.py
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from pipeline import plan_and_summarize
+from planner_agent import PlannerAgent
+from session_log import SessionLog
+from summarizer_agent import DEFAULT_MAX_CONCURRENCY, SummarizerAgent, SummaryResult
+
+# Finished jobs are kept this long for pages that still show them
+DEFAULT_JOB_TTL = 60 * 60
+# Job journals stay here until the user saves the session to sample_output
+JOB_JOURNAL_DIR = os.path.join(tempfile.gettempdir(), 'revision_agent_jobs')
+
+
+class SummaryJob:
+    """Summaries for one request, filled in by a worker thread and read by any page run.
+
+    ``topics`` grows while a planning job's subtopics arrive. The topic being
+    streamed has its text so far in ``partial`` until its result is in.
+    """
+
+    def __init__(self, topics: List[str], journal: SessionLog, planning: bool = False):
+        self.id = uuid.uuid4().hex
+        self.journal = journal
+        self.planning = planning
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._stop = threading.Event()
+        self._on_cancel = None
+        self._lock = threading.Lock()
+        self._topics = list(topics)
+        self._results: Dict[int, SummaryResult] = {}
+        self._partial: Dict[int, str] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._stop.is_set()
+
+    def topics(self) -> List[str]:
+        with self._lock:
+            return list(self._topics)
+
+    def results(self) -> List[SummaryResult]:
+        """Finished topics in plan or input order"""
+        with self._lock:
+            return [self._results[index] for index in sorted(self._results)]
+
+    def partial(self, index: int) -> Optional[str]:
+        with self._lock:
+            return self._partial.get(index)
+
+    def progress(self) -> Tuple[int, int]:
+        """(finished topics, known topics)"""
+        with self._lock:
+            return len(self._results), len(self._topics)
+
+    def cancel(self):
+        """Stop soon; summaries already finished are kept, the rest are dropped"""
+        self._stop.set()
+        if self._on_cancel is not None:
+            self._on_cancel()
+
+    def _stream(self, index: int, text: str):
+        with self._lock:
+            self._partial[index] = text
+
+    def _record(self, result: SummaryResult, summarizer: Optional[SummarizerAgent]):
+        call = summarizer.telemetry.latest('summarizer', result.topic) if summarizer is not None else None
+        settings = dict(model=summarizer.answered_by(result.topic), prompt_hash=summarizer.prompt_hash,
+                        temperature=summarizer.temperature) if summarizer is not None else {}
+        self.journal.append(result.topic, result.summary, index=result.index,
+                            error=result.error, call=call, **settings)
+        with self._lock:
+            while len(self._topics) <= result.index:
+                self._topics.append(result.topic)
+            self._topics[result.index] = result.topic
+            self._results[result.index] = result
+            self._partial.pop(result.index, None)
+
+    def _finish(self):
+        self.journal.close()
+        self.finished = time.time()
+
+
+class JobStore:
+    """Summary jobs by id, shared by every session of the process.
+
+    A page starts a job, keeps its id, and re-reads its results on each
+    run; reruns caused by other widgets neither restart nor lose the work.
+    Journals are written to ``journal_dir`` and deleted when their job
+    expires; SessionLog.save_copy() keeps one.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_JOB_TTL, journal_dir: str = JOB_JOURNAL_DIR):
+        self.ttl = ttl
+        self.journal_dir = journal_dir
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, SummaryJob] = {}
+
+    def get(self, job_id: Optional[str]) -> Optional[SummaryJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _add(self, job: SummaryJob, target, *args) -> SummaryJob:
+        now = time.time()
+        with self._lock:
+            for job_id, old in list(self._jobs.items()):
+                if old.done and now - old.finished > self.ttl:
+                    del self._jobs[job_id]
+                    old.journal.discard()
+            self._jobs[job.id] = job
+        threading.Thread(target=target, args=(job,) + args, name=f"summary-job-{job.id[:8]}",
+                         daemon=True).start()
+        return job
+
+    def submit(self, summarizer: SummarizerAgent, topics: List[str],
+               known: Optional[Mapping[str, str]] = None,
+               max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+               journal_prefix: str = 'streamlit_session') -> SummaryJob:
+        """Summarize topics in the background; summaries in ``known`` are reused without a model call"""
+        job = SummaryJob(topics, SessionLog.create(self.journal_dir, prefix=journal_prefix))
+        known = known or {}
+        for index, topic in enumerate(topics):
+            if topic in known:
+                job._record(SummaryResult(index, topic, known[topic]), None)
+        pending = [(index, topic) for index, topic in enumerate(topics) if topic not in known]
+        return self._add(job, _run_summaries, summarizer, pending, max_concurrency)
+
+    def submit_plan(self, planner: PlannerAgent, summarizer: SummarizerAgent, topic: str,
+                    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                    journal_prefix: str = 'streamlit_session') -> SummaryJob:
+        """Plan a topic and summarize its subtopics as they arrive, in the background"""
+        job = SummaryJob([], SessionLog.create(self.journal_dir, prefix=journal_prefix), planning=True)
+        return self._add(job, _run_plan, planner, summarizer, topic, max_concurrency)
+
+
+def _run_summaries(job: SummaryJob, summarizer: SummarizerAgent,
+                   pending: List[Tuple[int, str]], max_concurrency: int):
+    results = None
+    try:
+        if not pending:
+            return
+        # The first topic streams into job.partial while the rest run in the background
+        (first_index, first_topic), rest = pending[0], pending[1:]
+        results = summarizer.summarize_many([topic for _, topic in rest], max_concurrency)
+        # Topics waiting for a worker are cancelled as soon as Stop is pressed
+        job._on_cancel = getattr(results, 'cancel', None)
+        if job.cancelled and job._on_cancel is not None:
+            job._on_cancel()
+        chunks = []
+        stream = summarizer.generate_stream(first_topic)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                job._stream(first_index, "".join(chunks))
+                if job.cancelled:
+                    break
+            if not job.cancelled:
+                job._record(SummaryResult(first_index, first_topic, "".join(chunks).strip()), summarizer)
+        except Exception as e:
+            job._record(SummaryResult(first_index, first_topic, summarizer.fallback_message(first_topic),
+                                      str(e)), summarizer)
+        finally:
+            stream.close()
+
+        for result in results:
+            if job.cancelled:
+                break
+            job._record(result._replace(index=rest[result.index][0]), summarizer)
+    finally:
+        # Topics that have not started are cancelled
+        close = getattr(results, 'close', None)
+        if close is not None:
+            close()
+        job._finish()
+
+
+def _run_plan(job: SummaryJob, planner: PlannerAgent, summarizer: SummarizerAgent,
+              topic: str, max_concurrency: int):
+    # Stop reaches the planner and dispatcher directly, not only when the next result arrives
+    results = plan_and_summarize(planner, summarizer, topic, max_concurrency, stop=job._stop)
+    try:
+        for result in results:
+            if job.cancelled:
+                break
+            job._record(result, summarizer)
+    finally:
+        results.close()
+        job._finish()
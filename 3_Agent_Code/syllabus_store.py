@@ -0,0 +1,105 @@
+# Syllabus Store
+
+# Process-wide, memoized syllabus loader shared by every agent and session.
+
+# syllabus_store.py
+
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from topic_index import TopicIndex
+
+SYLLABUS_PATH = os.path.join(os.path.dirname(__file__), 'syllabus.json')
+
+
+class SyllabusSnapshot:
+    """Immutable parsed syllabus with precomputed lookup views"""
+
+    def __init__(self, categories: Mapping[str, Iterable[str]], version: str = ''):
+        self.version = version
+        self.categories: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {category: tuple(topics) for category, topics in categories.items()}
+        )
+        self.topics: Tuple[str, ...] = tuple(
+            topic for topics in self.categories.values() for topic in topics
+        )
+        topic_to_category: Dict[str, str] = {}
+        for category, topics in self.categories.items():
+            for topic in topics:
+                topic_to_category.setdefault(topic, category)
+        self.topic_to_category: Mapping[str, str] = MappingProxyType(topic_to_category)
+        self.index = TopicIndex(self.topics)
+
+    def __bool__(self) -> bool:
+        return bool(self.categories)
+
+    def category_of(self, topic: str) -> Optional[str]:
+        return self.topic_to_category.get(topic)
+
+
+class SyllabusStore:
+    """Parses the syllabus once and re-parses only when the file changes.
+
+    A cheap stat() runs on each access; the file is re-read when its mtime or
+    size moves, and a new snapshot is built only if the content hash differs.
+    """
+
+    def __init__(self, path: str = SYLLABUS_PATH):
+        self.path = path
+        self._snapshot = None
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def _current_stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def get(self) -> SyllabusSnapshot:
+        stat = self._current_stat()
+        snapshot = self._snapshot
+        if snapshot is not None and stat == self._stat:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and stat == self._stat:
+                return self._snapshot
+            self._snapshot = self._reload(self._snapshot)
+            self._stat = stat
+            return self._snapshot
+
+    def _reload(self, previous: Optional[SyllabusSnapshot]) -> SyllabusSnapshot:
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            print("⚠️ Syllabus file not found. Using basic planning mode.")
+            return SyllabusSnapshot({})
+
+        version = hashlib.sha256(raw).hexdigest()[:16]
+        if previous is not None and previous.version == version:
+            return previous
+        try:
+            return SyllabusSnapshot(json.loads(raw.decode('utf-8')), version)
+        except ValueError as e:
+            print(f"⚠️ Syllabus file could not be parsed ({e}).")
+            return previous if previous is not None else SyllabusSnapshot({})
+
+
+_stores: Dict[str, SyllabusStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_syllabus(path: str = SYLLABUS_PATH) -> SyllabusSnapshot:
+    """Current snapshot of the syllabus at path, shared across the process"""
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(path, SyllabusStore(path))
+    return store.get()
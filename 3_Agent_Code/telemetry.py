@@ -0,0 +1,429 @@
+# Telemetry
+
+# Per-call latency, token and cost records for every model call, sent to pluggable sinks.
+
+# telemetry.py
+
+import csv
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from scheduler import estimate_tokens
+
+# USD per million (prompt, completion) tokens; unknown models are costed at zero
+MODEL_PRICES = {
+    "openai/gpt-3.5-turbo": (0.50, 1.50),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+    "openai/gpt-4o": (2.50, 10.00),
+}
+
+# Upper bounds, in seconds, of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+# Latencies kept per session for the rollup percentiles
+ROLLUP_WINDOW = 10_000
+
+logger = logging.getLogger("revision_agent.telemetry")
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class CallRecord(NamedTuple):
+    """One planner or summarizer request, or a request answered from a cache"""
+    agent: str
+    model: str
+    topic: str
+    started_at: float
+    wall_seconds: float
+    ttft_seconds: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    cache_hit: bool = False
+    retries: int = 0
+    error: Optional[str] = None
+    prompt_tokens_saved: int = 0   # by compacting the prompt and trimming context
+    discarded: bool = False        # a losing hedge request: billed, but its answer was not used
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class LogSink:
+    """Writes one line per call to the ``revision_agent.telemetry`` logger"""
+
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+
+    def emit(self, record: CallRecord):
+        ttft = f"{record.ttft_seconds:.3f}s" if record.ttft_seconds is not None else "-"
+        logger.log(
+            self.level,
+            "%s model=%s topic=%r wall=%.3fs ttft=%s tokens=%d/%d saved=%d cost=$%.6f cache_hit=%s retries=%d error=%s",
+            record.agent, record.model, record.topic, record.wall_seconds, ttft,
+            record.prompt_tokens, record.completion_tokens, record.prompt_tokens_saved, record.cost_usd,
+            record.cache_hit, record.retries, record.error or "-"
+        )
+
+
+class CSVSink:
+    """Appends calls to a CSV file, writing the header when the file is new"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def emit(self, record: CallRecord):
+        with self._lock:
+            new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(CallRecord._fields)
+                writer.writerow(record)
+
+
+class PrometheusSink:
+    """Aggregates calls into Prometheus text-format metrics.
+
+    render() returns the exposition text; serve() exposes it at /metrics on
+    a background thread so a local Prometheus can scrape it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}       # (agent, model, outcome) -> count
+        self._tokens = {}      # (agent, model, kind) -> count
+        self._saved = {}       # (agent, model) -> prompt tokens saved
+        self._cost = {}        # (agent, model) -> USD
+        self._retries = {}     # (agent, model) -> count
+        self._latency = {}     # (agent, model) -> [bucket counts..., sum, count]
+        self._ttft = {}        # (agent, model) -> [sum, count]
+        self.server = None
+
+    def emit(self, record: CallRecord):
+        labels = (record.agent, record.model)
+        outcome = "cache_hit" if record.cache_hit else ("ok" if record.ok else "error")
+        if record.discarded:
+            outcome = "discarded"
+        with self._lock:
+            key = labels + (outcome,)
+            self._calls[key] = self._calls.get(key, 0) + 1
+            if record.cache_hit:
+                return
+            for kind, count in (("prompt", record.prompt_tokens), ("completion", record.completion_tokens)):
+                key = labels + (kind,)
+                self._tokens[key] = self._tokens.get(key, 0) + count
+            self._saved[labels] = self._saved.get(labels, 0) + record.prompt_tokens_saved
+            self._cost[labels] = self._cost.get(labels, 0.0) + record.cost_usd
+            self._retries[labels] = self._retries.get(labels, 0) + record.retries
+
+            latency = self._latency.setdefault(labels, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if record.wall_seconds <= bound:
+                    latency[i] += 1
+            latency[-2] += record.wall_seconds
+            latency[-1] += 1
+            if record.ttft_seconds is not None:
+                ttft = self._ttft.setdefault(labels, [0.0, 0])
+                ttft[0] += record.ttft_seconds
+                ttft[1] += 1
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines += ["# HELP revision_agent_calls_total Model calls by outcome.",
+                      "# TYPE revision_agent_calls_total counter"]
+            for (agent, model, outcome), count in sorted(self._calls.items()):
+                lines.append(f"revision_agent_calls_total{self._labels(agent=agent, model=model, outcome=outcome)} {count}")
+
+            lines += ["# HELP revision_agent_tokens_total Tokens used by model calls.",
+                      "# TYPE revision_agent_tokens_total counter"]
+            for (agent, model, kind), count in sorted(self._tokens.items()):
+                lines.append(f"revision_agent_tokens_total{self._labels(agent=agent, model=model, kind=kind)} {count}")
+
+            lines += ["# HELP revision_agent_prompt_tokens_saved_total Prompt tokens saved by compaction and context trimming.",
+                      "# TYPE revision_agent_prompt_tokens_saved_total counter"]
+            for (agent, model), count in sorted(self._saved.items()):
+                lines.append(f"revision_agent_prompt_tokens_saved_total{self._labels(agent=agent, model=model)} {count}")
+
+            lines += ["# HELP revision_agent_cost_usd_total Estimated cost of model calls.",
+                      "# TYPE revision_agent_cost_usd_total counter"]
+            for (agent, model), cost in sorted(self._cost.items()):
+                lines.append(f"revision_agent_cost_usd_total{self._labels(agent=agent, model=model)} {cost:.6f}")
+
+            lines += ["# HELP revision_agent_retries_total Retried attempts of model calls.",
+                      "# TYPE revision_agent_retries_total counter"]
+            for (agent, model), count in sorted(self._retries.items()):
+                lines.append(f"revision_agent_retries_total{self._labels(agent=agent, model=model)} {count}")
+
+            lines += ["# HELP revision_agent_call_seconds Wall time of model calls.",
+                      "# TYPE revision_agent_call_seconds histogram"]
+            for (agent, model), latency in sorted(self._latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, latency):
+                    labels = self._labels(agent=agent, model=model, le=bound)
+                    lines.append(f"revision_agent_call_seconds_bucket{labels} {count}")
+                labels = self._labels(agent=agent, model=model, le="+Inf")
+                lines.append(f"revision_agent_call_seconds_bucket{labels} {latency[-1]}")
+                labels = self._labels(agent=agent, model=model)
+                lines.append(f"revision_agent_call_seconds_sum{labels} {latency[-2]:.6f}")
+                lines.append(f"revision_agent_call_seconds_count{labels} {latency[-1]}")
+
+            lines += ["# HELP revision_agent_time_to_first_token_seconds Time until the first token arrived.",
+                      "# TYPE revision_agent_time_to_first_token_seconds summary"]
+            for (agent, model), (total, count) in sorted(self._ttft.items()):
+                labels = self._labels(agent=agent, model=model)
+                lines.append(f"revision_agent_time_to_first_token_seconds_sum{labels} {total:.6f}")
+                lines.append(f"revision_agent_time_to_first_token_seconds_count{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = '127.0.0.1'):
+        """Start the /metrics endpoint on a daemon thread (once)"""
+        if self.server is not None:
+            return self.server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = sink.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="telemetry-metrics", daemon=True).start()
+        return self.server
+
+
+def sinks_from_env(spec: Optional[str] = None) -> List[Any]:
+    """Build sinks from REVISION_TELEMETRY, e.g. "log,csv:telemetry.csv,prometheus:9464" """
+    spec = os.getenv("REVISION_TELEMETRY", "") if spec is None else spec
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, value = item.partition(':')
+        kind = kind.lower()
+        try:
+            if kind == 'log':
+                sinks.append(LogSink())
+            elif kind == 'csv':
+                sinks.append(CSVSink(value or 'telemetry.csv'))
+            elif kind == 'prometheus':
+                sink = PrometheusSink()
+                sink.serve(int(value or 9464))
+                sinks.append(sink)
+            else:
+                print(f"⚠️ Unknown telemetry sink '{kind}' ignored.")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not start telemetry sink '{item}': {str(e)}")
+    return sinks
+
+
+_default_sinks = None
+_default_sinks_lock = threading.Lock()
+
+
+def default_sinks() -> List[Any]:
+    """Process-wide sinks configured from the environment, created on first use"""
+    global _default_sinks
+    with _default_sinks_lock:
+        if _default_sinks is None:
+            _default_sinks = sinks_from_env()
+        return _default_sinks
+
+
+class CallTracker:
+    """Times one call; returned by Telemetry.track() and recorded when the block exits"""
+
+    def __init__(self, telemetry: 'Telemetry', agent: str, model: str, topic: str):
+        self.telemetry = telemetry
+        self.agent = agent
+        self.model = model
+        self.topic = topic
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.prompt_tokens_saved = 0
+        self.ttft_seconds = None
+        self._started_at = time.time()
+        self._start = time.perf_counter()
+
+    def retried(self, error: Optional[BaseException] = None):
+        """Count a retried attempt; usable as CallScheduler.call(on_retry=...)"""
+        self.retries += 1
+
+    def use_model(self, model: str):
+        """Record and cost the call under the model a router chose for it"""
+        self.model = model
+
+    def discarded(self, model: str, response: Any, seconds: float):
+        """Record a losing hedge that answered after the winner; usable as ModelRouter.call(on_discarded=...)"""
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', None) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', None) or 0
+        self.telemetry.record(CallRecord(
+            agent=self.agent, model=model, topic=self.topic, started_at=self._started_at,
+            wall_seconds=seconds, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            cost_usd=estimate_cost(model, prompt_tokens, completion_tokens), discarded=True
+        ))
+
+    def first_token(self):
+        if self.ttft_seconds is None:
+            self.ttft_seconds = time.perf_counter() - self._start
+
+    def record_prompt(self, saved_tokens: int):
+        """Prompt tokens the prompt builder saved on this call"""
+        self.prompt_tokens_saved = saved_tokens
+
+    def record_usage(self, usage: Any = None, messages: Iterable[Dict[str, str]] = (), text: str = ''):
+        """Take token counts from ``response.usage``, or estimate them when it is missing"""
+        prompt_tokens = getattr(usage, 'prompt_tokens', None)
+        completion_tokens = getattr(usage, 'completion_tokens', None)
+        self.prompt_tokens = prompt_tokens if prompt_tokens is not None else estimate_tokens(messages)
+        self.completion_tokens = completion_tokens if completion_tokens is not None else len(text) // 4
+
+    def __enter__(self) -> 'CallTracker':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._start
+        error = None
+        if exc_type is not None:
+            error = str(exc) or exc_type.__name__
+        ttft = self.ttft_seconds
+        if ttft is None and error is None:
+            # A non-streamed reply arrives all at once
+            ttft = wall
+        self.telemetry.record(CallRecord(
+            agent=self.agent, model=self.model, topic=self.topic,
+            started_at=self._started_at, wall_seconds=wall, ttft_seconds=ttft,
+            prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens,
+            cost_usd=estimate_cost(self.model, self.prompt_tokens, self.completion_tokens),
+            retries=self.retries, error=error, prompt_tokens_saved=self.prompt_tokens_saved
+        ))
+        return False
+
+
+class Telemetry:
+    """Collects call records for one session and forwards them to sinks.
+
+    Each CLI run or Streamlit session gets its own instance so rollup()
+    describes only that session; the sinks default to the process-wide
+    ones configured through REVISION_TELEMETRY.
+    """
+
+    def __init__(self, sinks: Optional[List[Any]] = None):
+        self.sinks = sinks if sinks is not None else default_sinks()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=ROLLUP_WINDOW)
+        self._ttfts = deque(maxlen=ROLLUP_WINDOW)
+        self._latest = OrderedDict()  # (agent, topic) -> CallRecord
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.prompt_tokens_saved = 0
+        self.cost_usd = 0.0
+
+    def track(self, agent: str, model: str, topic: str) -> CallTracker:
+        """``with telemetry.track(...) as call:`` around a model call"""
+        return CallTracker(self, agent, model, topic)
+
+    def record_cache_hit(self, agent: str, model: str, topic: str, seconds: float = 0.0):
+        self.record(CallRecord(agent=agent, model=model, topic=topic, started_at=time.time(),
+                               wall_seconds=seconds, ttft_seconds=seconds, cache_hit=True))
+
+    def record(self, record: CallRecord):
+        with self._lock:
+            key = (record.agent, record.topic)
+            if not record.discarded:
+                self._latest[key] = record
+                self._latest.move_to_end(key)
+                if len(self._latest) > ROLLUP_WINDOW:
+                    self._latest.popitem(last=False)
+            if record.cache_hit:
+                self.cache_hits += 1
+            else:
+                self.calls += 1
+                self.errors += 0 if record.ok else 1
+                self.retries += record.retries
+                self.prompt_tokens += record.prompt_tokens
+                self.completion_tokens += record.completion_tokens
+                self.prompt_tokens_saved += record.prompt_tokens_saved
+                self.cost_usd += record.cost_usd
+                if not record.discarded:
+                    # Nobody waited for a losing hedge
+                    self._latencies.append(record.wall_seconds)
+                if record.ok and record.ttft_seconds is not None:
+                    self._ttfts.append(record.ttft_seconds)
+
+        for sink in self.sinks:
+            try:
+                sink.emit(record)
+            except Exception as e:
+                # Telemetry must never break a revision session
+                print(f"⚠️ Telemetry sink {type(sink).__name__} failed: {str(e)}")
+
+    def latest(self, agent: str, topic: str) -> Optional[CallRecord]:
+        """Most recent record for this agent and topic, e.g. to journal its latency"""
+        with self._lock:
+            return self._latest.get((agent, topic))
+
+    def rollup(self) -> Dict[str, Any]:
+        """Totals and latency figures for this session"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            ttfts = list(self._ttfts)
+            served = self.calls + self.cache_hits
+            return {
+                'calls': self.calls,
+                'cache_hits': self.cache_hits,
+                'cache_hit_rate': self.cache_hits / served if served else 0.0,
+                'errors': self.errors,
+                'retries': self.retries,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'prompt_tokens_saved': self.prompt_tokens_saved,
+                'cost_usd': self.cost_usd,
+                'avg_latency_seconds': sum(latencies) / len(latencies) if latencies else 0.0,
+                'p95_latency_seconds': latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                'avg_ttft_seconds': sum(ttfts) / len(ttfts) if ttfts else 0.0,
+            }
+
+
+def format_rollup(rollup: Dict[str, Any]) -> str:
+    """One-line session summary for the CLI"""
+    return (
+        f"📈 Model calls: {rollup['calls']} ({rollup['errors']} failed, {rollup['retries']} retries), "
+        f"{rollup['cache_hits']} served from cache | "
+        f"avg {rollup['avg_latency_seconds']:.2f}s, p95 {rollup['p95_latency_seconds']:.2f}s, "
+        f"first token {rollup['avg_ttft_seconds']:.2f}s | "
+        f"tokens {rollup['prompt_tokens']}+{rollup['completion_tokens']}, ~${rollup['cost_usd']:.4f}"
+        + (f" ({rollup['prompt_tokens_saved']} prompt tokens saved)" if rollup.get('prompt_tokens_saved') else "")
+    )
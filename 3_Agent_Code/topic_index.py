@@ -0,0 +1,125 @@
+# Topic Index
+
+# Inverted index over syllabus topics for fast, ranked keyword search.
+
+# topic_index.py
+
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Weight of a prefix match ("learn" -> "learning") relative to an exact token match
+PREFIX_WEIGHT = 0.6
+# Bonus when the whole keyword appears verbatim in the topic title
+PHRASE_BONUS = 1.0
+# Recent queries kept per index; UIs repeat the same query on every rerun
+QUERY_CACHE_SIZE = 256
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens of a topic or keyword"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class TopicIndex:
+    """Token -> topic postings with prefix lookup and relevance ranking.
+
+    Build it once per syllabus version; searches only touch the postings of
+    the matched tokens, so their cost does not grow with the syllabus size.
+    """
+
+    def __init__(self, topics: Iterable[str]):
+        self.topics: Sequence[str] = tuple(dict.fromkeys(topics))
+        self._lowered = tuple(topic.lower() for topic in self.topics)
+
+        postings: Dict[str, List[int]] = {}
+        for topic_id, topic in enumerate(self.topics):
+            for token in set(tokenize(topic)):
+                postings.setdefault(token, []).append(topic_id)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+        total = len(self.topics) or 1
+        self._idf = {
+            token: 1.0 + math.log(total / len(ids)) for token, ids in postings.items()
+        }
+        self._query_cache = OrderedDict()
+        self._query_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.topics)
+
+    def _expand(self, term: str) -> List[str]:
+        """Vocabulary tokens equal to or starting with the term"""
+        matches = []
+        position = bisect_left(self._vocabulary, term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            matches.append(self._vocabulary[position])
+            position += 1
+        return matches
+
+    def _score_keyword(self, keyword: str, phrase_only: bool = False) -> Dict[int, float]:
+        """Scores of topics matching every token of one keyword"""
+        keyword_scores: Optional[Dict[int, float]] = None
+        for term in tokenize(keyword):
+            term_scores: Dict[int, float] = {}
+            for token in self._expand(term):
+                weight = self._idf[token] * (1.0 if token == term else PREFIX_WEIGHT)
+                for topic_id in self._postings[token]:
+                    if weight > term_scores.get(topic_id, 0.0):
+                        term_scores[topic_id] = weight
+
+            if keyword_scores is None:
+                keyword_scores = term_scores
+            else:
+                keyword_scores = {
+                    topic_id: keyword_scores[topic_id] + weight
+                    for topic_id, weight in term_scores.items()
+                    if topic_id in keyword_scores
+                }
+            if not keyword_scores:
+                return {}
+
+        phrase = keyword.strip().lower()
+        scores = {}
+        for topic_id, score in (keyword_scores or {}).items():
+            if phrase in self._lowered[topic_id]:
+                scores[topic_id] = score + PHRASE_BONUS
+            elif not phrase_only:
+                scores[topic_id] = score
+        return scores
+
+    def search(self, keywords: Iterable[str], limit: Optional[int] = None,
+               phrase_only: bool = False) -> List[str]:
+        """Topics matching any keyword, best matches first.
+
+        A keyword matches a topic when each of its words is a word, or the
+        start of a word, in the topic. With ``phrase_only`` the keyword must
+        also appear verbatim in the title. Ties keep syllabus order.
+        """
+        query = (tuple(keywords), limit, phrase_only)
+        with self._query_lock:
+            if query in self._query_cache:
+                self._query_cache.move_to_end(query)
+                return list(self._query_cache[query])
+
+        scores: Dict[int, float] = {}
+        for keyword in query[0]:
+            for topic_id, score in self._score_keyword(keyword, phrase_only).items():
+                scores[topic_id] = scores.get(topic_id, 0.0) + score
+
+        ranked = sorted(scores, key=lambda topic_id: (-scores[topic_id], topic_id))
+        if limit is not None:
+            ranked = ranked[:limit]
+        results = tuple(self.topics[topic_id] for topic_id in ranked)
+
+        with self._query_lock:
+            self._query_cache[query] = results
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return list(results)
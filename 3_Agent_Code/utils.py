@@ -4,9 +4,10 @@
 
 # utils.py
 
-import json
 import os
-from typing import List
+from typing import List, Mapping, Tuple
+from session_log import SESSION_DIR, TEXT_HEADER, text_block
+from syllabus_store import get_syllabus
 
 def print_banner():
     print("=" * 60)
@@ -15,66 +16,48 @@ def print_banner():
     print("📚 Covering: AI, ML, DL, GenAI, and Agent AI")
     print("=" * 60)
 
-def format_response(subtopic: str, answer: str) -> str:
+def format_response_header(subtopic: str) -> str:
     return (
         f"\n🔹 **Subtopic**: {subtopic}\n"
         f"{'-'*50}\n"
-        f"{answer}\n"
-        f"{'-'*50}\n"
     )
 
-def load_syllabus() -> dict:
-    """Load the syllabus from JSON file"""
-    try:
-        syllabus_path = os.path.join(os.path.dirname(__file__), 'syllabus.json')
-        with open(syllabus_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("⚠️ Syllabus file not found.")
-        return {}
+def format_response_footer() -> str:
+    return f"\n{'-'*50}\n"
+
+def format_response(subtopic: str, answer: str) -> str:
+    return format_response_header(subtopic) + answer + format_response_footer()
+
+def load_syllabus() -> Mapping[str, Tuple[str, ...]]:
+    """Return the shared, read-only syllabus (category -> topics)"""
+    return get_syllabus().categories
 
 def filter_topics_by_keywords(keywords: List[str]) -> List[str]:
-    """Filter syllabus topics based on keywords"""
-    syllabus = load_syllabus()
-    filtered_topics = []
-    
-    # Get all topics from syllabus
-    all_topics = []
-    for category, topics in syllabus.items():
-        all_topics.extend(topics)
-    
-    # Filter by keywords
-    for topic in all_topics:
-        topic_lower = topic.lower()
-        for keyword in keywords:
-            if keyword.lower() in topic_lower:
-                if topic not in filtered_topics:
-                    filtered_topics.append(topic)
-                break
-    
-    return filtered_topics
+    """Filter syllabus topics based on keywords, most relevant first"""
+    return get_syllabus().index.search(keywords)
+
+def save_session_log(topics: List[str], summaries: List[str], filename: str = None,
+                     output_dir: str = None):
+    """Save the current session to a log file
 
-def save_session_log(topics: List[str], summaries: List[str], filename: str = None):
-    """Save the current session to a log file"""
+    For long runs prefer session_log.SessionLog, which writes each summary
+    as it arrives instead of holding them all until the end.
+    """
     if not filename:
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"revision_session_{timestamp}.txt"
     
-    output_dir = os.path.join(os.path.dirname(__file__), 'sample_output')
+    output_dir = output_dir or SESSION_DIR
     os.makedirs(output_dir, exist_ok=True)
     
     filepath = os.path.join(output_dir, filename)
     
     with open(filepath, 'w', encoding='utf-8') as f:
-        f.write("🤖 AI Revision Agent - Session Log\n")
-        f.write("=" * 50 + "\n\n")
+        f.write(TEXT_HEADER)
         
         for topic, summary in zip(topics, summaries):
-            f.write(f"🔹 Topic: {topic}\n")
-            f.write("-" * 30 + "\n")
-            f.write(f"{summary}\n")
-            f.write("-" * 30 + "\n\n")
+            f.write(text_block(topic, summary))
     
     print(f"📄 Session saved to: {filepath}")
     return filepath
@@ -0,0 +1,134 @@
+# Warm-up Pipeline
+
+# Pre-generates summaries for the whole syllabus so the CLI and web app can serve them instantly.
+
+# warm.py
+#
+# Usage:
+#   python 3_Agent_Code/warm.py                      # build or refresh every stale topic
+#   python 3_Agent_Code/warm.py --changed-only       # only topics whose prompt or syllabus entry changed
+#   python 3_Agent_Code/warm.py --category Deep_Learning --jobs 8 --rpm 120
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from llm_client import create_client
+from scheduler import CallScheduler
+from summarizer_agent import SummarizerAgent
+from summary_cache import SummaryCache
+from precomputed import PrecomputedSummaries, DEFAULT_ARTIFACT_PATH
+from utils import load_syllabus
+
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def select_topics(syllabus: dict, artifact: PrecomputedSummaries, summarizer: SummarizerAgent,
+                  categories: Optional[List[str]] = None, changed_only: bool = False,
+                  force: bool = False, max_age: Optional[float] = None) -> List[Tuple[str, str]]:
+    """Return the (category, topic) pairs that need generating"""
+    pending = []
+    for category, topics in syllabus.items():
+        if categories and category not in categories:
+            continue
+        for topic in topics:
+            key = summarizer.cache_key(topic)
+            age_limit = None if changed_only else max_age
+            if force or not artifact.is_fresh(topic, key, category, age_limit):
+                pending.append((category, topic))
+    return pending
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate summaries for every syllabus topic.")
+    parser.add_argument('--output', default=DEFAULT_ARTIFACT_PATH,
+                        help="artifact to build or resume (default: %(default)s)")
+    parser.add_argument('--category', action='append', dest='categories',
+                        help="only warm this syllabus category (repeatable)")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="only topics whose prompt, model or syllabus entry changed since the last build")
+    parser.add_argument('--force', action='store_true', help="regenerate every selected topic")
+    parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help="regenerate entries older than this (default: %(default)s)")
+    parser.add_argument('--jobs', type=int, default=4, help="concurrent requests (default: %(default)s)")
+    parser.add_argument('--rpm', type=float, default=60,
+                        help="maximum requests per minute per model; lowered automatically when throttled, "
+                             "0 for no limit (default: %(default)s)")
+    parser.add_argument('--dry-run', action='store_true', help="list the topics that would be generated")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    load_dotenv()
+
+    syllabus = load_syllabus()
+    if not syllabus:
+        return 1
+
+    artifact = PrecomputedSummaries.load(args.output)
+    client = create_client()
+    summarizer = SummarizerAgent(
+        client, cache=SummaryCache(), scheduler=CallScheduler(requests_per_minute=args.rpm)
+    )
+
+    pending = select_topics(
+        syllabus, artifact, summarizer,
+        categories=args.categories,
+        changed_only=args.changed_only,
+        force=args.force,
+        max_age=args.max_age_days * 24 * 60 * 60,
+    )
+    total = sum(len(topics) for topics in syllabus.values())
+    print(f"🔥 {len(pending)} of {total} topics need generating (build {artifact.build} at {args.output})")
+    if args.dry_run:
+        for category, topic in pending:
+            print(f"  {category}: {topic}")
+        return 0
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        # Selected topics are stale or forced, so the cached summary must not be served back
+        futures = {executor.submit(summarizer.regenerate, topic): (category, topic) for category, topic in pending}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                category, topic = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ [{done}/{len(pending)}] {topic}: {e}")
+                    continue
+                if summarizer.answered_by(topic) != summarizer.model:
+                    # The artifact is keyed on the primary model, like the cache
+                    failed += 1
+                    print(f"⚠️ [{done}/{len(pending)}] {topic}: answered by {summarizer.answered_by(topic)}, "
+                          f"not {summarizer.model}; not saved")
+                    continue
+                artifact.put(topic, summarizer.cache_key(topic), category, summary)
+                # Checkpoint after every topic so an interrupted run resumes where it stopped
+                artifact.save()
+                print(f"✅ [{done}/{len(pending)}] {topic}")
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            print("\n⏸️ Interrupted. Progress is saved; run again to resume.")
+            return 130
+
+    if not args.categories:
+        removed = artifact.prune(topic for topics in syllabus.values() for topic in topics)
+        if removed:
+            print(f"🧹 Removed {removed} topic(s) no longer in the syllabus")
+    artifact.save(bump_build=not failed)
+
+    print(f"📦 Build {artifact.build}: {len(artifact)} summaries in {args.output}")
+    if failed:
+        print(f"⚠️ {failed} topic(s) failed; run again to retry them.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
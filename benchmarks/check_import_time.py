@@ -0,0 +1,106 @@
+"""
+AI Revision Agent - Startup Time Check
+
+Imports the CLI entry point under ``python -X importtime`` and fails when a
+module that should be deferred until the first model call (openai, numpy,
+asyncio, ...) is loaded at startup, or when the import takes longer than
+the budget.
+
+    python benchmarks/check_import_time.py                  # check, as used in CI
+    python benchmarks/check_import_time.py --top 15         # also list the slowest imports
+    python benchmarks/check_import_time.py --module streamlit_app --allow openai
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENT_DIR = os.path.join(ROOT, '3_Agent_Code')
+
+# Loaded on demand by the code paths that need them
+DEFERRED_MODULES = ('openai', 'httpx', 'pydantic', 'numpy', 'dotenv', 'asyncio', 'http.server')
+DEFAULT_BUDGET_MS = 300.0
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile(module):
+    """(self_us, cumulative_us, depth, name) of every module imported by ``import module``"""
+    code = f"import sys; sys.path.insert(0, {AGENT_DIR!r}); sys.path.insert(0, {ROOT!r}); import {module}"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    profile = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            profile.append((int(match.group(1)), int(match.group(2)),
+                            len(match.group(3)) // 2, match.group(4)))
+    return profile
+
+
+def _import_chain(profile, target):
+    """Names of the modules that led to ``target`` being imported, outermost first"""
+    # -X importtime prints a module after everything it imported, one level deeper
+    for i, (_, _, depth, name) in enumerate(profile):
+        if name != target:
+            continue
+        chain = [name]
+        for _, _, parent_depth, parent in profile[i + 1:]:
+            if parent_depth < depth:
+                chain.append(parent)
+                depth = parent_depth
+        return list(reversed(chain))
+    return [target]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check what the CLI imports at startup and how long it takes.")
+    parser.add_argument('--module', default='cli_interface', help="module to import (default: %(default)s)")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail when the median import is slower (default: %(default)s)")
+    parser.add_argument('--runs', type=int, default=5, help="imports to take the median of")
+    parser.add_argument('--allow', nargs='*', default=[], help="deferred modules that may be imported")
+    parser.add_argument('--top', type=int, default=0, help="list the N slowest imports")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    deferred = [name for name in DEFERRED_MODULES if name not in args.allow]
+    totals = []
+    for _ in range(max(1, args.runs)):
+        profile = import_profile(args.module)
+        totals.append(next(cumulative for _, cumulative, _, name in profile if name == args.module))
+    median_ms = statistics.median(totals) / 1000
+
+    failed = False
+    imported = {name for _, _, _, name in profile}
+    eager = [name for name in deferred if name in imported]
+    if eager:
+        failed = True
+        print(f"❌ {args.module} imports {', '.join(eager)} at startup; import them where they are used")
+        for name in eager:
+            # The first module on the way in is the one to fix
+            chain = _import_chain(profile, name)
+            print(f"   {' -> '.join(chain)}")
+
+    status = "❌" if median_ms > args.budget_ms else "✅"
+    failed = failed or median_ms > args.budget_ms
+    print(f"{status} import {args.module}: {median_ms:.1f} ms median of {len(totals)} "
+          f"(budget {args.budget_ms:.0f} ms, {len(imported)} modules)")
+
+    if args.top:
+        print("\nSlowest imports (cumulative):")
+        for self_us, cumulative, depth, name in sorted(profile, key=lambda row: -row[1])[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {self_us / 1000:7.1f} ms self  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
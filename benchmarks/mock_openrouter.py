@@ -0,0 +1,257 @@
+"""
+Mock OpenRouter server for benchmarks.
+
+A local, OpenAI-compatible stand-in for /v1/chat/completions with configurable
+latency, token rate, error rate and 429 injection. Planner requests get a JSON
+list of subtopics; everything else gets a revision-style summary. Supports both
+plain and streaming (server-sent events) responses.
+
+Run standalone:
+    python benchmarks/mock_openrouter.py --port 8765 --latency 0.3 --tokens-per-second 200
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockConfig:
+    """Behaviour of the mock server; attributes may be changed while it runs"""
+
+    def __init__(self, latency=0.2, jitter=0.05, tokens_per_second=0.0,
+                 completion_tokens=180, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=0.1, slow_rate=0.0, slow_latency=2.0, seed=None, failing_models=(),
+                 model_latency=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        # A fraction of requests stalls for slow_latency seconds, like a congested upstream
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        # Requests for these models always fail with a 500, as when one provider is down
+        self.failing_models = set(failing_models)
+        # Seconds before the first token for particular models, in place of ``latency``
+        self.model_latency = dict(model_latency or {})
+        self.random = random.Random(seed)
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'errors_injected': self.errors,
+                'rate_limited_injected': self.rate_limited,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+            }
+
+
+def _count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _reply_words(messages, completion_tokens):
+    system = next((m.get('content', '') for m in messages if m.get('role') == 'system'), '')
+    user = messages[-1].get('content', '') if messages else ''
+    topic = user.split(':', 1)[-1].strip().splitlines()[0] if ':' in user else user
+
+    if 'planner agent' in system:
+        subtopics = [f"{topic} - part {i}" for i in range(1, 5)]
+        return [json.dumps({'subtopics': subtopics})]
+
+    if '=== SUMMARY' in system:
+        # Batched summaries: one section per numbered line of the user message
+        topics = [line.split('. ', 1)[1] for line in user.splitlines()[1:] if '. ' in line]
+        words = []
+        for number, batch_topic in enumerate(topics, 1):
+            words.append(f"=== SUMMARY {number} ===\n")
+            words.extend(_summary_words(batch_topic, completion_tokens))
+            words.append("\n\n")
+        return words
+    return _summary_words(topic, completion_tokens)
+
+
+def _summary_words(topic, completion_tokens):
+    words = [f"🔹 **Subtopic**: {topic}\n\n📖 **Summary**:\n"]
+    filler = ("concept model data training loss gradient layer attention token "
+              "feature metric bias variance network policy reward").split()
+    while len(words) < completion_tokens:
+        words.append(filler[len(words) % len(filler)] + " ")
+    return words
+
+
+def make_handler(config, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            messages = request.get('messages', [])
+            rng = config.random
+
+            with stats.lock:
+                stats.requests += 1
+
+            if rng.random() < config.rate_limit_rate:
+                with stats.lock:
+                    stats.rate_limited += 1
+                self._send_json(429, {'error': {'message': 'Rate limit exceeded (mock)', 'code': 429}},
+                                {'Retry-After': str(config.retry_after)})
+                return
+
+            model = request.get('model')
+            latency = config.model_latency.get(model, config.latency)
+            if rng.random() < config.slow_rate:
+                latency = config.slow_latency
+            time.sleep(max(0.0, latency + rng.uniform(-config.jitter, config.jitter)))
+
+            if model in config.failing_models or rng.random() < config.error_rate:
+                with stats.lock:
+                    stats.errors += 1
+                self._send_json(500, {'error': {'message': 'Internal error (mock)', 'code': 500}})
+                return
+
+            words = _reply_words(messages, config.completion_tokens)
+            prompt_tokens = sum(_count_tokens(m.get('content') or '') for m in messages)
+            completion_tokens = sum(_count_tokens(w) for w in words)
+            with stats.lock:
+                stats.prompt_tokens += prompt_tokens
+                stats.completion_tokens += completion_tokens
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            }
+            base = {
+                'id': f"mock-{stats.requests}",
+                'created': int(time.time()),
+                'model': request.get('model', 'mock'),
+            }
+
+            if request.get('stream'):
+                self._stream(words, usage, base)
+            else:
+                self._complete(words, usage, base)
+
+        def _pace(self, words):
+            if config.tokens_per_second:
+                time.sleep(sum(_count_tokens(w) for w in words) / config.tokens_per_second)
+
+        def _complete(self, words, usage, base):
+            self._pace(words)
+            self._send_json(200, dict(base, object='chat.completion', usage=usage, choices=[{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(words)},
+                'finish_reason': 'stop',
+            }]))
+
+        def _stream(self, words, usage, base):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            def send(payload):
+                data = f"data: {payload}\n\n".encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            for word in words:
+                self._pace([word])
+                send(json.dumps(dict(base, object='chat.completion.chunk', choices=[{
+                    'index': 0, 'delta': {'content': word}, 'finish_reason': None,
+                }])))
+            send(json.dumps(dict(base, object='chat.completion.chunk', usage=usage, choices=[{
+                'index': 0, 'delta': {}, 'finish_reason': 'stop',
+            }])))
+            send('[DONE]')
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+class MockOpenRouter:
+    """Runs the mock server on a background thread: ``with MockOpenRouter() as server: ...``"""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or MockConfig()
+        self.stats = MockStats()
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.config, self.stats))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenRouter server.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help="0 sends the reply at once")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="fraction of requests that stall")
+    parser.add_argument('--slow-latency', type=float, default=2.0, help="seconds a stalled request takes")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                        slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    server = MockOpenRouter(config, port=args.port)
+    print(f"Mock OpenRouter listening on {server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,418 @@
+"""
+AI Revision Agent - Benchmark Suite
+
+Drives the planner, summarizer, keyword search and session-log writer against
+a local mock OpenRouter server and writes throughput, latency percentiles and
+peak RSS to a JSON file that can be diffed across commits.
+
+    python benchmarks/run_benchmarks.py                     # all scenarios
+    python benchmarks/run_benchmarks.py --quick             # fast smoke run (CI)
+    python benchmarks/run_benchmarks.py --scenarios single_category concurrent_users --users 50
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '3_Agent_Code'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openrouter import MockConfig, MockOpenRouter
+from llm_client import BoundedClient, create_client
+from memory_store import memory_report
+from model_router import DEFAULT_PLANNER_MODELS, DEFAULT_SUMMARIZER_MODELS, ModelRouter
+from planner_agent import PlanCache, PlannerAgent
+from replay import RecordingClient, ReplayClient, ReplayStore
+from scheduler import CallScheduler
+from single_flight import SingleFlight
+from summarizer_agent import SummarizerAgent
+from summary_cache import SummaryCache
+from syllabus_store import get_syllabus
+from session_log import SessionLog, export
+
+KEYWORD_QUERIES = [
+    ['neural'], ['transformer', 'attention'], ['learn'], ['reinforcement learning'],
+    ['gradient'], ['agent', 'planning'], ['bias'], ['lstm'], ['model evaluation'], ['prompt'],
+]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize_latencies(latencies, wall_seconds, errors=0):
+    return {
+        'operations': len(latencies),
+        'errors': errors,
+        'wall_seconds': round(wall_seconds, 4),
+        'throughput_per_second': round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        'latency_ms': {
+            'p50': _ms(percentile(latencies, 0.50)),
+            'p95': _ms(percentile(latencies, 0.95)),
+            'p99': _ms(percentile(latencies, 0.99)),
+            'max': _ms(max(latencies) if latencies else None),
+        },
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def make_agents(base_url, rate_limited=False, client=None, hedging=True):
+    """Fresh agents with empty caches and model statistics so every scenario exercises the model path"""
+    client = client or create_client(api_key='benchmark', base_url=base_url, max_in_flight=64)
+    scheduler = (CallScheduler(requests_per_minute=600, base_delay=0.05) if rate_limited
+                 else CallScheduler(requests_per_minute=0, tokens_per_minute=0))
+    planner = PlannerAgent(client, scheduler=scheduler, plan_cache=PlanCache(),
+                           router=ModelRouter(DEFAULT_PLANNER_MODELS, hedging=hedging))
+    summarizer = SummarizerAgent(client, cache=SummaryCache(':memory:'),
+                                 flight=SingleFlight(), scheduler=scheduler,
+                                 router=ModelRouter(DEFAULT_SUMMARIZER_MODELS, hedging=hedging))
+    return planner, summarizer
+
+
+def run_batch(summarizer, topics, jobs, batched=False):
+    start = time.perf_counter()
+    latencies = []
+    errors = 0
+    for result in summarizer.summarize_many(topics, max_concurrency=jobs, batched=batched):
+        latencies.append(time.perf_counter() - start)
+        errors += 0 if result.ok else 1
+    return summarize_latencies(latencies, time.perf_counter() - start, errors)
+
+
+def scenario_keyword_search(server, args):
+    planner, _ = make_agents(server.base_url)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(args.search_iterations):
+        # Vary the query so the per-index query cache does not hide the search cost
+        keywords = KEYWORD_QUERIES[i % len(KEYWORD_QUERIES)] + [str(i)]
+        began = time.perf_counter()
+        planner.filter_topics_by_keywords(keywords)
+        latencies.append(time.perf_counter() - began)
+    return summarize_latencies(latencies, time.perf_counter() - start)
+
+
+def scenario_single_category(server, args):
+    _, summarizer = make_agents(server.base_url)
+    topics = list(get_syllabus().categories.get(args.category, ()))
+    return run_batch(summarizer, topics, args.jobs)
+
+
+def scenario_full_syllabus(server, args):
+    _, summarizer = make_agents(server.base_url)
+    return run_batch(summarizer, list(get_syllabus().topics), args.jobs)
+
+
+def scenario_full_syllabus_batched(server, args):
+    """full_syllabus with several topics per request"""
+    _, summarizer = make_agents(server.base_url)
+    report = run_batch(summarizer, list(get_syllabus().topics), args.jobs, batched=True)
+    rollup = summarizer.telemetry.rollup()
+    report['prompt_tokens'] = rollup['prompt_tokens']
+    report['prompt_tokens_saved'] = rollup['prompt_tokens_saved']
+    return report
+
+
+def scenario_concurrent_users(server, args):
+    """Each simulated user plans an ad-hoc topic and summarizes its subtopics"""
+    planner, _ = make_agents(server.base_url)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def user(n):
+        # One client per process, one summarizer per user, as in the Streamlit app
+        _, summarizer = make_agents(server.base_url, client=planner.client)
+        summarizer.flight = flight
+        began = time.perf_counter()
+        subtopics = planner.plan_subtopics(f"Benchmark topic {n % args.distinct_topics}")
+        results = list(summarizer.summarize_many(subtopics, max_concurrency=args.jobs))
+        with lock:
+            latencies.append(time.perf_counter() - began)
+            errors.append(sum(0 if r.ok else 1 for r in results))
+
+    # Users share one single-flight group, as Streamlit sessions in one process do
+    flight = SingleFlight()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(args.users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = summarize_latencies(latencies, time.perf_counter() - start, sum(errors))
+    report['users'] = args.users
+    report['merged_requests'] = flight.stats()['merged']
+    return report
+
+
+def scenario_rate_limited(server, args):
+    """Single category with 429s injected, through the adaptive scheduler"""
+    previous = server.config.rate_limit_rate
+    server.config.rate_limit_rate = args.inject_429 or 0.2
+    try:
+        _, summarizer = make_agents(server.base_url, rate_limited=True)
+        topics = list(get_syllabus().categories.get(args.category, ()))
+        report = run_batch(summarizer, topics, args.jobs)
+        report['scheduler'] = summarizer.scheduler.stats()
+        return report
+    finally:
+        server.config.rate_limit_rate = previous
+
+
+def run_requests(summarizer, topics, jobs):
+    """Latency of each summary on its own, ``jobs`` requests at a time"""
+    def timed(topic):
+        began = time.perf_counter()
+        summarizer.generate(topic)
+        return time.perf_counter() - began
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        latencies = list(executor.map(timed, topics))
+    return summarize_latencies(latencies, time.perf_counter() - start)
+
+
+def scenario_tail_latency(server, args):
+    """Every syllabus topic with a few stalled requests, hedged; the unhedged run is nested for comparison"""
+    previous = server.config.slow_rate, server.config.slow_latency
+    server.config.slow_rate = args.slow_rate
+    server.config.slow_latency = 10 * args.latency
+    try:
+        runs = {}
+        for name, hedging in (('unhedged', False), ('hedged', True)):
+            _, summarizer = make_agents(server.base_url, hedging=hedging)
+            # The router only hedges once it knows the p95 latency
+            summarizer.summarize_all([f"Warm-up topic {i}" for i in range(40)], args.jobs)
+            runs[name] = run_requests(summarizer, list(get_syllabus().topics), args.jobs)
+            runs[name]['hedges'] = summarizer.router.stats()['hedges']
+        report = runs['hedged']
+        report['unhedged'] = runs['unhedged']
+        return report
+    finally:
+        server.config.slow_rate, server.config.slow_latency = previous
+
+
+def scenario_session_memory(server, args):
+    """Many long sessions each remembering every syllabus topic, as on a busy Streamlit worker"""
+    topics = list(get_syllabus().topics)
+    summary = ("Summary text for revision. " * 60).strip()
+    client = create_client(api_key='benchmark', base_url=server.base_url)
+    before = memory_report()
+    agents = []
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(args.memory_sessions):
+        summarizer = SummarizerAgent(client, flight=SingleFlight())
+        agents.append(summarizer)
+        for round_number in range(args.memory_rounds):
+            for topic in topics:
+                began = time.perf_counter()
+                # Distinct text per round, as regenerated summaries are
+                summarizer._remember(f"{topic} ({round_number})", summary + str(round_number))
+                latencies.append(time.perf_counter() - began)
+    report = summarize_latencies(latencies, time.perf_counter() - start)
+    after = memory_report()
+    report['sessions'] = args.memory_sessions
+    report['entries_kept'] = after['entries'] - before['entries']
+    report['memory_kb'] = round((after['bytes'] - before['bytes']) / 1024, 1)
+    report['evictions'] = after['evictions'] - before['evictions']
+    if after['rss_bytes'] and before['rss_bytes']:
+        report['rss_growth_mb'] = round((after['rss_bytes'] - before['rss_bytes']) / 1024 ** 2, 1)
+    return report
+
+
+def run_session(client, topic, jobs):
+    """One CLI-style session on fresh agents: plan, stream the first summary, then the rest in parallel"""
+    planner, summarizer = make_agents(None, client=client)
+    subtopics = planner.plan_subtopics(topic)
+    first = "".join(summarizer.generate_stream(subtopics[0])).strip()
+    results = summarizer.summarize_all(subtopics[1:], jobs)
+    failed = [result.error for result in results if not result.ok]
+    if failed:
+        raise RuntimeError(failed[0])
+    return [first] + [result.summary for result in results]
+
+
+def scenario_replay(server, args):
+    """Sessions recorded once from the mock, then replayed offline on fresh agents"""
+    topics = [f"Replay topic {n}" for n in range(args.distinct_topics)]
+    with tempfile.TemporaryDirectory() as recordings:
+        store = ReplayStore(args.replay_file or os.path.join(recordings, 'replay.jsonl'))
+        live = create_client(api_key='benchmark', base_url=server.base_url, max_in_flight=64)
+        expected = {topic: run_session(RecordingClient(live, store), topic, args.jobs) for topic in topics}
+
+        client = BoundedClient(ReplayClient(store, args.replay_timing), max_in_flight=64)
+        requests_before = server.stats.as_dict()['requests']
+        latencies = []
+        errors = 0
+
+        def session(n):
+            topic = topics[n % len(topics)]
+            began = time.perf_counter()
+            try:
+                matched = run_session(client, topic, args.jobs) == expected[topic]
+            except Exception:
+                matched = False
+            return time.perf_counter() - began, matched
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            for seconds, matched in executor.map(session, range(args.replay_sessions)):
+                latencies.append(seconds)
+                errors += 0 if matched else 1
+        wall = time.perf_counter() - start
+        report = summarize_latencies(latencies, wall, errors)
+        report['sessions_per_minute'] = round(len(latencies) / wall * 60) if wall else None
+        report['network_requests_during_replay'] = server.stats.as_dict()['requests'] - requests_before
+        report['recorded_requests'] = len(store)
+        report['recording_kb'] = round(os.path.getsize(store.path) / 1024, 1)
+        report['replay'] = store.stats()
+    return report
+
+
+def scenario_session_log(server, args):
+    topics = list(get_syllabus().topics)
+    summaries = [("Summary text for revision. " * 40).strip() for _ in topics]
+    latencies = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        for i in range(args.log_iterations):
+            began = time.perf_counter()
+            # Journal every summary as it would arrive, then render the text log
+            with SessionLog(os.path.join(output_dir, f"bench_{i}.jsonl")) as journal:
+                for index, (topic, summary) in enumerate(zip(topics, summaries)):
+                    journal.append(topic, summary, index=index)
+            export(journal.path)
+            latencies.append(time.perf_counter() - began)
+        report = summarize_latencies(latencies, time.perf_counter() - start)
+    report['topics_per_log'] = len(topics)
+    return report
+
+
+SCENARIOS = {
+    'keyword_search': scenario_keyword_search,
+    'single_category': scenario_single_category,
+    'full_syllabus': scenario_full_syllabus,
+    'full_syllabus_batched': scenario_full_syllabus_batched,
+    'concurrent_users': scenario_concurrent_users,
+    'rate_limited': scenario_rate_limited,
+    'tail_latency': scenario_tail_latency,
+    'session_memory': scenario_session_memory,
+    'session_log': scenario_session_log,
+    'replay': scenario_replay,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the revision agents against a mock server.")
+    parser.add_argument('--output', default=os.path.join(ROOT, 'bench_output.json'))
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--quick', action='store_true', help="small, fast run for CI smoke checks")
+    parser.add_argument('--latency', type=float, default=0.25, help="mock seconds to first token")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--inject-429', type=float, default=0.2,
+                        help="429 fraction used by the rate_limited scenario")
+    parser.add_argument('--slow-rate', type=float, default=0.05,
+                        help="fraction of stalled requests in the tail_latency scenario")
+    parser.add_argument('--jobs', type=int, default=8)
+    parser.add_argument('--users', type=int, default=25)
+    parser.add_argument('--distinct-topics', type=int, default=5,
+                        help="different ad-hoc topics among the simulated users")
+    parser.add_argument('--category', default='Machine_Learning')
+    parser.add_argument('--search-iterations', type=int, default=2000)
+    parser.add_argument('--log-iterations', type=int, default=20)
+    parser.add_argument('--memory-sessions', type=int, default=50,
+                        help="simulated sessions in the session_memory scenario")
+    parser.add_argument('--memory-rounds', type=int, default=10,
+                        help="times each session remembers every syllabus topic")
+    parser.add_argument('--replay-sessions', type=int, default=2000,
+                        help="sessions replayed offline in the replay scenario")
+    parser.add_argument('--replay-timing', type=float, default=0.0,
+                        help="multiplier for recorded delays when replaying: 1 as recorded, 0 instant")
+    parser.add_argument('--replay-file', default=None,
+                        help="keep the replay scenario's recording here instead of a temporary file")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.latency = min(args.latency, 0.02)
+        args.users = min(args.users, 5)
+        args.search_iterations = min(args.search_iterations, 200)
+        args.log_iterations = min(args.log_iterations, 3)
+        args.memory_sessions = min(args.memory_sessions, 5)
+        args.replay_sessions = min(args.replay_sessions, 200)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = MockConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                        error_rate=args.error_rate, seed=42)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'scenarios': {},
+    }
+
+    with MockOpenRouter(config) as server:
+        for name in args.scenarios:
+            before = server.stats.as_dict()
+            print(f"▶️  {name}...", flush=True)
+            result = SCENARIOS[name](server, args)
+            after = server.stats.as_dict()
+            result['mock_requests'] = after['requests'] - before['requests']
+            report['scenarios'][name] = result
+            latency = result['latency_ms']
+            print(f"   {result['operations']} ops in {result['wall_seconds']}s, "
+                  f"p50 {latency['p50']}ms, p95 {latency['p95']}ms, p99 {latency['p99']}ms")
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"📊 Results written to {args.output} (peak RSS {report['peak_rss_mb']} MB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
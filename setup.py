@@ -4,6 +4,7 @@ Setup script for AI Revision Agent
 Handles installation and initial configuration
 """
 
+import importlib.util
 import os
 import sys
 import subprocess
@@ -55,8 +56,12 @@ def setup_env_file():
 def run_tests():
     """Run the test suite to verify installation"""
     print("\n🧪 Running tests to verify installation...")
+    if importlib.util.find_spec("pytest") is None:
+        print("⚠️  pytest is not installed; skipping tests")
+        print("   Install it with: pip install -r requirements-dev.txt")
+        return True
     try:
-        result = subprocess.run([sys.executable, "3_Agent_Code/test_runner.py"], 
+        result = subprocess.run([sys.executable, "-m", "pytest", "-q", "tests"],
                               capture_output=True, text=True)
         if result.returncode == 0:
             print("✅ All tests passed!")
@@ -7,19 +7,30 @@ import streamlit as st
 import os
 import sys
 from datetime import datetime
-from openai import OpenAI
 from dotenv import load_dotenv
 
 # Add the 3_Agent_Code directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '3_Agent_Code'))
 
+from llm_client import create_client, needs_api_key
+from memory_store import format_memory_report, memory_report
 from planner_agent import PlannerAgent
 from summarizer_agent import SummarizerAgent
-from utils import load_syllabus, save_session_log
+from summary_cache import SummaryCache
+from summary_jobs import JobStore
+from precomputed import PrecomputedSummaries
+from session_index import SessionIndex
+from session_log import export
+from similarity_index import SimilarityIndex, threshold_from_env
+from telemetry import Telemetry
+from utils import load_syllabus
 
 # Load environment variables
 load_dotenv()
 
+# How often a page showing a running job re-reads its progress
+JOB_POLL_SECONDS = 0.5
+
 # Page configuration
 st.set_page_config(
     page_title="AI Revision Agent",
@@ -78,9 +89,15 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 def initialize_session_state():
-    """Initialize session state variables"""
+    """Initialize session state variables
+
+    The syllabus is not copied into the session; every session reads the
+    process-wide snapshot through load_syllabus().
+    """
     if 'client' not in st.session_state:
         st.session_state.client = None
+    if 'telemetry' not in st.session_state:
+        st.session_state.telemetry = Telemetry()
     if 'planner' not in st.session_state:
         st.session_state.planner = None
     if 'summarizer' not in st.session_state:
@@ -89,29 +106,57 @@ def initialize_session_state():
         st.session_state.topics = []
     if 'summaries' not in st.session_state:
         st.session_state.summaries = {}
-    if 'syllabus' not in st.session_state:
-        st.session_state.syllabus = load_syllabus()
     if 'show_summaries' not in st.session_state:
         st.session_state.show_summaries = False
     if 'generated_summaries' not in st.session_state:
         st.session_state.generated_summaries = []
+    if 'job_id' not in st.session_state:
+        st.session_state.job_id = None
+
+@st.cache_resource(show_spinner=False)
+def get_shared_client(api_key):
+    """One client per process: a single keep-alive connection pool and in-flight cap for all sessions"""
+    return create_client(api_key)
+
+@st.cache_resource(show_spinner=False)
+def get_shared_summary_stores():
+    """Summary cache, precomputed artifact and paraphrase index shared by every session's summarizer"""
+    return SummaryCache(), PrecomputedSummaries.load(), SimilarityIndex(threshold=threshold_from_env())
+
+@st.cache_resource(show_spinner=False)
+def get_job_store():
+    """Background summary jobs; they keep running across reruns of the page that started them"""
+    return JobStore()
+
+@st.cache_resource(show_spinner=False)
+def get_session_history():
+    """Index of past session logs, shared by every session"""
+    history = SessionIndex()
+    history.ingest_dir()
+    return history
 
 def setup_openrouter_client():
-    """Setup OpenRouter client"""
+    """Attach the shared client and agents to this session
+
+    The agents are created per session, because the summarizer's memory and
+    both agents' telemetry belong to the user; they are cheap to create since
+    the client, caches and rate limiter they use are shared process-wide.
+    """
     api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
+    if not api_key and needs_api_key():
         st.error("🔑 OpenRouter API key not found! Please set OPENROUTER_API_KEY in your .env file.")
         st.info("💡 Create a .env file in your project root with: OPENROUTER_API_KEY=your_key_here")
         st.stop()
     
     try:
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
+        client = get_shared_client(api_key)
+        cache, precomputed, similar = get_shared_summary_stores()
         st.session_state.client = client
-        st.session_state.planner = PlannerAgent(client)
-        st.session_state.summarizer = SummarizerAgent(client)
+        telemetry = st.session_state.telemetry
+        st.session_state.planner = PlannerAgent(client, telemetry=telemetry)
+        st.session_state.summarizer = SummarizerAgent(client, cache=cache, precomputed=precomputed,
+                                                      telemetry=telemetry, history=get_session_history(),
+                                                      similar=similar)
         st.success("✅ OpenRouter client initialized successfully!")
         return True
     except Exception as e:
@@ -136,24 +181,48 @@ def display_sidebar():
     # Revision mode selection
     revision_mode = st.sidebar.radio(
         "Choose Revision Mode:",
-        ["🔍 Keyword-based Revision", "📚 Topic-based Revision", "📖 Browse Syllabus"],
+        ["🔍 Keyword-based Revision", "📚 Topic-based Revision", "📖 Browse Syllabus", "🗂️ Past Sessions"],
         help="Select how you want to approach your revision"
     )
     
     st.sidebar.markdown("---")
     
     # Display syllabus categories
-    if st.session_state.syllabus:
+    syllabus = load_syllabus()
+    if syllabus:
         st.sidebar.subheader("📋 Available Categories")
-        for category, topics in st.session_state.syllabus.items():
+        for category, topics in syllabus.items():
             with st.sidebar.expander(f"{category.replace('_', ' ')} ({len(topics)} topics)"):
                 for topic in topics[:5]:  # Show first 5 topics
                     st.write(f"• {topic}")
                 if len(topics) > 5:
                     st.write(f"... and {len(topics) - 5} more")
     
+    display_usage_rollup()
+    
     return revision_mode
 
+def display_usage_rollup():
+    """Model calls, latency, tokens and cost for this session"""
+    rollup = st.session_state.telemetry.rollup()
+    if not rollup['calls'] and not rollup['cache_hits']:
+        return
+    
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("📈 Session Usage")
+    col1, col2 = st.sidebar.columns(2)
+    col1.metric("Model calls", rollup['calls'], help=f"{rollup['errors']} failed, {rollup['retries']} retries")
+    col2.metric("From cache", rollup['cache_hits'], help=f"{rollup['cache_hit_rate']:.0%} of summaries and plans")
+    col1.metric("Avg latency", f"{rollup['avg_latency_seconds']:.2f}s", help=f"p95 {rollup['p95_latency_seconds']:.2f}s")
+    col2.metric("First token", f"{rollup['avg_ttft_seconds']:.2f}s")
+    st.sidebar.caption(
+        f"Tokens: {rollup['prompt_tokens']} prompt + {rollup['completion_tokens']} completion "
+        f"(~${rollup['cost_usd']:.4f})"
+        + (f", {rollup['prompt_tokens_saved']} prompt tokens saved" if rollup['prompt_tokens_saved'] else "")
+    )
+    # Every session in this process, so growth across users shows up
+    st.sidebar.caption(format_memory_report(memory_report()))
+
 def keyword_revision_interface():
     """Interface for keyword-based revision"""
     st.subheader("🔍 Keyword-based Revision")
@@ -226,7 +295,14 @@ def topic_revision_interface():
     with col2:
         plan_button = st.button("🧩 Plan Revision", type="primary")
     
-    if plan_button and topic_input:
+    pipelined = st.checkbox(
+        "⚡ Summarize subtopics while planning",
+        help="Start each summary as soon as the planner writes its subtopic, in one step"
+    )
+    
+    if plan_button and topic_input and pipelined:
+        plan_and_generate_summaries(topic_input)
+    elif plan_button and topic_input:
         with st.spinner("Planning your revision..."):
             subtopics = st.session_state.planner.plan_subtopics(topic_input)
             
@@ -265,16 +341,17 @@ def browse_syllabus_interface():
     st.subheader("📖 Browse Syllabus")
     st.write("Explore our comprehensive syllabus and select topics to study.")
     
-    if st.session_state.syllabus:
+    syllabus = load_syllabus()
+    if syllabus:
         # Category selection
         selected_category = st.selectbox(
             "Choose a category:",
-            list(st.session_state.syllabus.keys()),
+            list(syllabus.keys()),
             format_func=lambda x: x.replace('_', ' ')
         )
         
         if selected_category:
-            topics = st.session_state.syllabus[selected_category]
+            topics = list(syllabus[selected_category])
             st.write(f"**{selected_category.replace('_', ' ')}** ({len(topics)} topics)")
             
             # Topic selection
@@ -300,15 +377,50 @@ def browse_syllabus_interface():
                 if st.button("📝 Generate Summaries", type="primary", key="generate_browse"):
                     generate_summaries_directly(selected_topics)
 
+def past_sessions_interface():
+    """Interface for looking up summaries from earlier sessions"""
+    st.subheader("🗂️ Past Sessions")
+    st.write("Find summaries you generated before, without calling the model again.")
+    
+    history = get_session_history()
+    history.ingest_dir()
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input(
+            "Topic or keywords:",
+            placeholder="e.g., Backpropagation, attention heads",
+            help="An exact topic name finds every summary of that topic; otherwise keywords are searched"
+        )
+    with col2:
+        days = st.number_input("Last N days (0 = all):", min_value=0, value=0, step=1)
+    
+    if not query:
+        stats = history.stats()
+        st.info(f"📚 {stats['entries']} summaries indexed from {stats['files']} session logs.")
+        return
+    
+    since = datetime.now().timestamp() - days * 86400 if days else None
+    entries = history.find_topic(query, since=since) or history.search(query, since=since)
+    if not entries:
+        st.warning("❌ No past summaries match. Try other keywords or a longer period.")
+        return
+    
+    st.success(f"🎯 Found {len(entries)} past summaries!")
+    for i, entry in enumerate(entries):
+        with st.expander(f"🗓️ {entry.date} · {entry.topic}", expanded=i == 0):
+            st.caption(os.path.basename(entry.source))
+            st.write(entry.summary)
+
 def generate_summaries_directly(topics):
-    """Generate summaries for the given topics directly"""
+    """Start generating summaries for the given topics in the background"""
     if not topics:
         st.warning("No topics selected for summary generation.")
         return
     
     # Check if API key is available
     api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
+    if not api_key and needs_api_key():
         st.error("🔑 OpenRouter API key not found! Please set OPENROUTER_API_KEY in your .env file.")
         return
     
@@ -317,70 +429,119 @@ def generate_summaries_directly(topics):
         st.error("❌ Summarizer agent not initialized!")
         return
     
-    st.markdown("---")
-    st.subheader("📝 Generated Summaries")
+    # Summaries this session already has are shown again without calling the model
+    job = get_job_store().submit(st.session_state.summarizer, list(topics),
+                                 known=dict(st.session_state.summaries))
+    st.session_state.job_id = job.id
+
+def plan_and_generate_summaries(topic):
+    """Plan a topic in the background and show each subtopic's summary as soon as it is ready"""
+    if not st.session_state.summarizer:
+        st.error("❌ Summarizer agent not initialized!")
+        return
     
-    # Create a container for summaries
-    summary_container = st.container()
+    job = get_job_store().submit_plan(st.session_state.planner, st.session_state.summarizer, topic)
+    st.session_state.job_id = job.id
+
+def render_active_job():
+    """This session's summary job, re-read from the job store on every run
+
+    Generation happens on a background thread, so widget clicks (including
+    Save Session) rerun the page without restarting or losing it.
+    """
+    job = get_job_store().get(st.session_state.job_id)
+    if job is None:
+        return
     
-    # Progress tracking
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    st.markdown("---")
+    st.subheader("📝 Generated Summaries")
     
-    summaries = []
+    if job.done:
+        render_job(job)
+        render_session_actions(job)
+    else:
+        if st.button("⏹️ Stop", type="secondary", key="stop_job",
+                     help="Summaries already finished are kept"):
+            job.cancel()
+        running_job_fragment(job.id)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def running_job_fragment(job_id):
+    """Only this part of the page polls while the job runs"""
+    job = get_job_store().get(job_id)
+    if job is None or job.done:
+        # A full run shows the finished page and stops polling
+        st.rerun()
+    render_job(job)
+
+def render_job(job):
+    """Progress and summaries of a job, in topic order"""
+    finished, total = job.progress()
+    if job.done:
+        if job.cancelled:
+            st.info(f"⏹️ Stopped after {finished} of {total} summaries.")
+        else:
+            st.text("✅ All summaries processed!")
+    elif job.planning:
+        st.text(f"🧩 Planning and summarizing subtopics as they arrive... {finished} finished")
+    else:
+        st.progress(finished / total if total else 0.0)
+        st.text(f"🔄 Processed {finished}/{total}")
     
-    for i, topic in enumerate(topics):
-        status_text.text(f"🔄 Processing {i+1}/{len(topics)}: {topic}")
-        progress_bar.progress((i + 1) / len(topics))
+    results = {result.index: result for result in job.results()}
+    for index, topic in enumerate(job.topics()):
+        if index in results:
+            render_summary_result(results[index])
+            continue
+        partial = job.partial(index)
+        if partial is not None:
+            st.info(f"✍️ Writing summary for: **{topic}**")
+            st.markdown(partial + "▌")
+        elif not job.done:
+            st.caption(f"⏳ Waiting: {topic}")
+
+def render_summary_result(result):
+    """Render one SummaryResult; successful summaries are remembered in st.session_state.summaries"""
+    if not result.ok:
+        error_msg = f"Failed to generate summary for {result.topic}: {result.error}"
+        st.error(f"❌ {error_msg}")
         
-        try:
-            # Generate summary
-            summary = st.session_state.summarizer.summarize(topic)
-            
-            if summary and summary.strip():
-                summaries.append(summary)
-                st.session_state.summaries[topic] = summary
-                
-                # Display summary in container
-                with summary_container:
-                    st.success(f"✅ Generated summary for: **{topic}**")
-                    
-                    # Use expander for better organization
-                    with st.expander(f"📖 {topic}", expanded=True):
-                        st.write(summary)
-                    
-                    st.markdown("---")
-                
-            else:
-                st.warning(f"⚠️ Empty summary received for: {topic}")
-                
-        except Exception as e:
-            error_msg = f"Failed to generate summary for {topic}: {str(e)}"
-            st.error(f"❌ {error_msg}")
-            
-            # Show detailed error for debugging
-            with st.expander("🔍 Error Details"):
-                st.code(f"Topic: {topic}\nError: {str(e)}")
-    
-    status_text.text("✅ All summaries processed!")
-    progress_bar.progress(1.0)
-    
-    # Session saving option
-    if summaries:
+        # Show detailed error for debugging
+        with st.expander("🔍 Error Details"):
+            st.code(f"Topic: {result.topic}\nError: {result.error}")
+    elif result.summary and result.summary.strip():
+        st.session_state.summaries[result.topic] = result.summary
+        
+        st.success(f"✅ Generated summary for: **{result.topic}**")
+        
+        # Use expander for better organization
+        with st.expander(f"📖 {result.topic}", expanded=True):
+            st.write(result.summary)
+        
+        st.markdown("---")
+    else:
+        st.warning(f"⚠️ Empty summary received for: {result.topic}")
+
+def render_session_actions(job):
+    """Save/new-session buttons shown once a job has finished"""
+    generated_count = sum(1 for result in job.results() if result.ok and result.summary.strip())
+    if generated_count:
         st.markdown("---")
         col1, col2 = st.columns([1, 1])
         
         with col1:
             if st.button("💾 Save Session", type="secondary", key="save_session"):
-                save_current_session(topics, summaries)
+                save_current_session(job.journal)
         
         with col2:
             if st.button("🔄 Start New Session", type="secondary", key="new_session"):
+                job.journal.discard()
+                st.session_state.job_id = None
                 st.session_state.topics = []
                 st.session_state.summaries = {}
                 st.rerun()
         
-        st.success(f"🎉 Summary generation complete! Generated {len(summaries)} summaries.")
+        st.success(f"🎉 Summary generation complete! Generated {generated_count} summaries.")
     else:
         st.warning("⚠️ No summaries were generated. Please check your API key and try again.")
 
@@ -393,29 +554,31 @@ def display_summary(topic, summary):
     </div>
     """, unsafe_allow_html=True)
 
-def save_current_session(topics, summaries):
-    """Save the current session to a file"""
+def save_current_session(journal):
+    """Copy the session journal to sample_output, render it to text and markdown, and offer them for download"""
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"streamlit_session_{timestamp}.txt"
-        
-        # Create output directory if it doesn't exist
-        output_dir = os.path.join("3_Agent_Code", "sample_output")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        filepath = save_session_log(topics, summaries, filename)
+        journal_path = journal.save_copy()
+        filepath = export(journal_path, "txt")
+        markdown_path = export(journal_path, "md")
+        get_session_history().ingest_file(journal_path)
         st.success(f"💾 Session saved successfully to: {filepath}")
         
-        # Offer download
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        st.download_button(
-            label="📥 Download Session File",
-            data=content,
-            file_name=filename,
-            mime="text/plain"
-        )
+        # st.download_button holds the whole file in memory either way; session logs are small
+        col1, col2 = st.columns([1, 1])
+        with col1, open(filepath, 'rb') as f:
+            st.download_button(
+                label="📥 Download Session File",
+                data=f.read(),
+                file_name=os.path.basename(filepath),
+                mime="text/plain"
+            )
+        with col2, open(markdown_path, 'rb') as f:
+            st.download_button(
+                label="📥 Download as Markdown",
+                data=f.read(),
+                file_name=os.path.basename(markdown_path),
+                mime="text/markdown"
+            )
         
     except Exception as e:
         st.error(f"❌ Failed to save session: {str(e)}")
@@ -443,6 +606,10 @@ def main():
         topic_revision_interface()
     elif revision_mode == "📖 Browse Syllabus":
         browse_syllabus_interface()
+    elif revision_mode == "🗂️ Past Sessions":
+        past_sessions_interface()
+    
+    render_active_job()
     
     # Footer
     st.markdown("---")
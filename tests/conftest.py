@@ -0,0 +1,29 @@
+# Shared fixtures: the agents' modules on sys.path and a local mock OpenRouter server
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, '3_Agent_Code'), os.path.join(ROOT, 'benchmarks')]
+
+from mock_openrouter import MockConfig, MockOpenRouter  # noqa: E402
+from model_router import shared_planner_router, shared_summarizer_router  # noqa: E402
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    """A mock server that create_client() talks to, outside replay mode"""
+    with MockOpenRouter(MockConfig(latency=0.0, jitter=0.0, seed=1)) as server:
+        monkeypatch.setenv('OPENROUTER_BASE_URL', server.base_url)
+        monkeypatch.setenv('OPENROUTER_API_KEY', 'test')
+        monkeypatch.delenv('REVISION_REPLAY_MODE', raising=False)
+        # Hedged requests would make request counts vary from run to run
+        for router in (shared_planner_router, shared_summarizer_router):
+            monkeypatch.setattr(router, 'hedging', False)
+        yield server
+
+
+def requests_made(server) -> int:
+    return server.stats.as_dict()['requests']
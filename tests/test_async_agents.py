@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from async_agents import AsyncSummarizerAgent
+from llm_client import create_async_client
+from model_router import ModelRouter
+from single_flight import AsyncSingleFlight
+from summary_cache import SummaryCache
+
+
+class ThreadRecordingCache(SummaryCache):
+    """Notes the thread of every SQLite read and write"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def put(self, *args):
+        self.threads.append(threading.get_ident())
+        return super().put(*args)
+
+    def retain_prompt(self, prompt_hash):
+        self.threads.append(threading.get_ident())
+        return super().retain_prompt(prompt_hash)
+
+
+def test_cache_reads_and_writes_stay_off_the_event_loop(mock_server, tmp_path):
+    cache = ThreadRecordingCache(str(tmp_path / 'cache.sqlite3'))
+    summarizer = AsyncSummarizerAgent(create_async_client(), cache=cache, flight=AsyncSingleFlight(),
+                                      router=ModelRouter(['openai/gpt-3.5-turbo']))
+
+    async def main():
+        summary = await summarizer.agenerate('Dropout')
+        streamed = ''.join([chunk async for chunk in summarizer.agenerate_stream('Attention')])
+        return threading.get_ident(), summary, streamed
+
+    loop_thread, summary, streamed = asyncio.run(main())
+
+    assert summary and streamed
+    assert cache.stats()['entries'] == 2
+    assert cache.threads and loop_thread not in cache.threads
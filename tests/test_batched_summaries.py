@@ -0,0 +1,112 @@
+import threading
+from types import SimpleNamespace
+
+from model_router import ModelRouter
+from scheduler import CallScheduler
+from single_flight import SingleFlight
+from summarizer_agent import SummarizerAgent
+
+MODEL = 'openai/gpt-3.5-turbo'
+TOPICS = ['Dropout', 'Batch normalization', 'Weight decay']
+
+
+def summary_of(topic):
+    return f"🔹 **Subtopic**: {topic}\n\n" + "revision " * 120
+
+
+class ScriptedClient:
+    """Answers batched requests with ``batch_reply`` and single ones with a full summary"""
+
+    def __init__(self, batch_reply, finish_reason='stop'):
+        self.batch_reply = batch_reply
+        self.finish_reason = finish_reason
+        self.requests = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, messages, **kwargs):
+        batched = '=== SUMMARY' in messages[0]['content']
+        topic = messages[-1]['content'].split(':', 1)[-1].strip()
+        with self._lock:
+            self.requests.append('batch' if batched else topic)
+            if batched:
+                self.batch_message = messages[-1]['content']
+        content = self.batch_reply if batched else summary_of(topic)
+        choice = SimpleNamespace(message=SimpleNamespace(content=content),
+                                 finish_reason=self.finish_reason if batched else 'stop')
+        return SimpleNamespace(choices=[choice], usage=None)
+
+
+def sections(*numbered):
+    return "".join(f"=== SUMMARY {number} ===\n{text}\n\n" for number, text in numbered)
+
+
+def summarize(client, flight=None):
+    summarizer = SummarizerAgent(client, flight=flight or SingleFlight(), scheduler=CallScheduler(max_retries=0),
+                                 router=ModelRouter([MODEL], hedging=False))
+    results = sorted(summarizer.summarize_many(TOPICS, batched=True), key=lambda result: result.index)
+    return summarizer, results
+
+
+def test_missing_and_short_sections_are_requested_on_their_own():
+    client = ScriptedClient(sections((1, summary_of(TOPICS[0])), (3, "Too short.")))
+    _, results = summarize(client)
+
+    assert [result.summary for result in results] == [summary_of(topic).strip() for topic in TOPICS]
+    assert sorted(client.requests) == sorted(['batch', TOPICS[1], TOPICS[2]])
+
+
+def test_a_reply_without_sections_falls_back_to_single_requests():
+    client = ScriptedClient("Here are your summaries: " + "revision " * 300)
+    _, results = summarize(client)
+
+    assert all(result.ok for result in results)
+    assert sorted(client.requests) == sorted(['batch'] + TOPICS)
+
+
+def test_a_reply_cut_short_drops_its_last_section():
+    client = ScriptedClient(sections(*((number, summary_of(topic)) for number, topic in enumerate(TOPICS, 1))),
+                            finish_reason='length')
+    _, results = summarize(client)
+
+    assert all(result.ok for result in results)
+    assert sorted(client.requests) == sorted(['batch', TOPICS[2]])
+
+
+def test_topics_already_in_flight_are_left_out_of_the_batch():
+    flight = SingleFlight()
+    client = ScriptedClient(sections((1, summary_of(TOPICS[0])), (2, summary_of(TOPICS[2]))))
+    summarizer = SummarizerAgent(client, flight=flight, router=ModelRouter([MODEL], hedging=False))
+    key = summarizer.cache_key(TOPICS[1])
+    call, leader = flight.claim(key)
+    assert leader
+
+    threading.Timer(0.2, flight.resolve, (key, call, ('Summary from another session', MODEL))).start()
+    results = sorted(summarizer.summarize_many(TOPICS, batched=True), key=lambda result: result.index)
+
+    assert [result.summary for result in results] == [
+        summary_of(TOPICS[0]).strip(), 'Summary from another session', summary_of(TOPICS[2]).strip()]
+    assert client.requests == ['batch']
+    assert TOPICS[1] not in client.batch_message
+
+
+def test_a_batch_hands_its_summaries_to_waiting_callers():
+    flight = SingleFlight()
+    client = ScriptedClient(sections(*((number, summary_of(topic)) for number, topic in enumerate(TOPICS, 1))))
+    summarizer = SummarizerAgent(client, flight=flight, router=ModelRouter([MODEL], hedging=False))
+    waiting = {}
+
+    original = client.create
+
+    def create(messages, **kwargs):
+        # Another caller asks for the same topic while the batch is in flight
+        call, leader = flight.claim(summarizer.cache_key(TOPICS[0]))
+        waiting['leader'] = leader
+        waiting['call'] = call
+        return original(messages, **kwargs)
+
+    client.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+    list(summarizer.summarize_many(TOPICS, batched=True))
+
+    assert waiting['leader'] is False
+    assert waiting['call'].wait() == (summary_of(TOPICS[0]).strip(), MODEL)
@@ -0,0 +1,22 @@
+from cli_interface import summarize_topics
+from llm_client import BoundedClient
+from model_router import ModelRouter
+from replay import ReplayClient, ReplayStore
+from session_log import SessionLog, read_records
+from single_flight import SingleFlight
+from summarizer_agent import SummarizerAgent
+
+
+def test_failed_first_topic_is_counted_and_journaled(tmp_path):
+    # Nothing is recorded, so every model call fails
+    client = BoundedClient(ReplayClient(ReplayStore(str(tmp_path / 'empty.jsonl')), timing=0))
+    summarizer = SummarizerAgent(client, flight=SingleFlight(), router=ModelRouter(['openai/gpt-3.5-turbo']))
+    topics = ['Bias and variance', 'Overfitting']
+
+    with SessionLog(str(tmp_path / 'journal.jsonl')) as journal:
+        failed = summarize_topics(summarizer, topics, journal)
+
+    assert failed == 2
+    records = [r for r in read_records(journal.path) if r.get('topic')]
+    assert [r['topic'] for r in records] == topics
+    assert all(r.get('error') for r in records)
@@ -0,0 +1,53 @@
+import os
+
+from memory_store import MemoryStore, default_context
+
+
+def test_least_recently_used_topic_is_evicted_first():
+    store = MemoryStore(max_entries=2)
+    store.put('Dropout', 'Summary of Dropout.')
+    store.put('Attention', 'Summary of Attention.')
+    assert store.get('Dropout') is not None
+    store.put('Backpropagation', 'Summary of Backpropagation.')
+
+    assert store.get('Attention') is None
+    assert store.get('Dropout').summary == 'Summary of Dropout.'
+    assert len(store) == 2
+    assert store.stats()['evictions'] == 1
+
+
+def test_byte_cap_evicts_but_keeps_the_newest_topic():
+    store = MemoryStore(max_bytes=1)
+    store.put('Dropout', 'Summary of Dropout.')
+    store.put('Attention', 'x' * 1000)
+
+    assert store.get('Dropout') is None
+    assert store.get('Attention') is not None
+    assert store.bytes == store.get('Attention').size
+
+
+def test_evicted_topics_spill_to_disk_and_are_read_back(tmp_path):
+    store = MemoryStore(max_entries=1, spill_dir=str(tmp_path))
+    store.put('Dropout', 'Summary of Dropout.', created=1.0)
+    store.put('Attention', 'Summary of Attention.', context='Asked about transformers')
+    assert store.stats()['on_disk'] == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+    record = store.get('Dropout')
+    assert (record.summary, record.context, record.created) == ('Summary of Dropout.', None, 1.0)
+    assert store.as_dict('Dropout')['context'] == default_context('Dropout')
+    # Reading it back evicted the other topic to disk in its place
+    stats = store.stats()
+    assert (stats['entries'], stats['on_disk'], stats['restored'], stats['evictions']) == (1, 1, 1, 2)
+    assert store.get('Attention').context == 'Asked about transformers'
+    assert store.get('Backpropagation') is None
+
+
+def test_closing_the_store_deletes_its_spill_file(tmp_path):
+    store = MemoryStore(max_entries=1, spill_dir=str(tmp_path))
+    store.put('Dropout', 'Summary of Dropout.')
+    store.put('Attention', 'Summary of Attention.')
+    store.close()
+
+    assert os.listdir(tmp_path) == []
+    assert store.get('Dropout') is None
@@ -0,0 +1,60 @@
+import time
+
+from llm_client import create_client
+from model_router import MIN_SAMPLES, ModelRouter
+from telemetry import Telemetry
+
+PRIMARY, BACKUP = 'openai/gpt-3.5-turbo', 'openai/gpt-4o-mini'
+MESSAGES = [{'role': 'user', 'content': 'Summarize: Dropout'}]
+
+
+def requester():
+    client = create_client()
+    return lambda model, timeout: client.chat.completions.create(model=model, messages=MESSAGES, timeout=timeout)
+
+
+def test_falls_back_when_a_model_fails(mock_server):
+    mock_server.config.failing_models = {PRIMARY}
+    router = ModelRouter([PRIMARY, BACKUP], hedging=False)
+    answered = []
+
+    response = router.call(requester(), on_model=answered.append)
+
+    assert response.model == BACKUP and answered == [BACKUP]
+    stats = router.stats()['models']
+    assert stats[PRIMARY]['failures'] == 1 and stats[BACKUP]['fallbacks'] == 1
+
+
+def test_falls_back_when_a_model_times_out(mock_server):
+    mock_server.config.model_latency = {PRIMARY: 2.0}
+    router = ModelRouter([PRIMARY, BACKUP], attempt_timeout=0.3, hedging=False)
+
+    start = time.perf_counter()
+    response = router.call(requester())
+
+    assert response.model == BACKUP
+    assert time.perf_counter() - start < 1.5
+
+
+def test_slow_call_is_hedged_and_the_losers_tokens_are_counted(mock_server):
+    router = ModelRouter([PRIMARY, BACKUP])
+    request = requester()
+    for _ in range(MIN_SAMPLES):
+        router.call(request)
+
+    mock_server.config.model_latency = {PRIMARY: 1.0}
+    telemetry = Telemetry(sinks=[])
+    with telemetry.track('summarizer', PRIMARY, 'Dropout') as call:
+        response = router.call(request, on_model=call.use_model, on_discarded=call.discarded)
+        call.record_usage(response.usage)
+
+    assert response.model == BACKUP
+    assert router.stats()['models'][BACKUP]['hedge_wins'] == 1
+    assert telemetry.latest('summarizer', 'Dropout').model == BACKUP
+
+    deadline = time.monotonic() + 5
+    while telemetry.calls < 2:
+        assert time.monotonic() < deadline, "the losing request was never recorded"
+        time.sleep(0.05)
+    assert telemetry.completion_tokens == 2 * response.usage.completion_tokens
+    assert telemetry.latest('summarizer', 'Dropout').model == BACKUP
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from conftest import requests_made
+from llm_client import create_client
+from pipeline import plan_and_summarize
+from planner_agent import PlanCache, PlannerAgent
+from single_flight import SingleFlight
+from summarizer_agent import SummarizerAgent
+
+TOPIC = 'Gradient checking in practice'
+
+
+def agents():
+    client = create_client()
+    return PlannerAgent(client, plan_cache=PlanCache()), SummarizerAgent(client, flight=SingleFlight())
+
+
+def stages_running():
+    return [t for t in threading.enumerate() if t.name in ('plan-stage', 'summarize-stage')]
+
+
+def wait_for_stages(timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while stages_running():
+        assert time.monotonic() < deadline, "pipeline stages are still running"
+        time.sleep(0.02)
+
+
+def test_full_run_summarizes_every_subtopic(mock_server):
+    planner, summarizer = agents()
+    results = list(plan_and_summarize(planner, summarizer, TOPIC))
+    assert [result.error for result in results] == [None] * 4
+    assert sorted(result.index for result in results) == [0, 1, 2, 3]
+    wait_for_stages()
+
+
+def test_leaving_early_stops_both_stages(mock_server):
+    planner, summarizer = agents()
+    results = plan_and_summarize(planner, summarizer, TOPIC, max_concurrency=1)
+    next(results)
+    results.close()
+
+    wait_for_stages()
+    # The plan and at most the summary dispatched while the first was handed over
+    assert requests_made(mock_server) <= 3
+
+
+def test_stop_event_ends_the_run(mock_server):
+    planner, summarizer = agents()
+    stop = threading.Event()
+    stop.set()
+    assert list(plan_and_summarize(planner, summarizer, TOPIC, stop=stop)) == []
+    wait_for_stages()
@@ -0,0 +1,49 @@
+from prompt_builder import MIN_CONTEXT_TOKENS, PromptBuilder, count_message_tokens
+
+SYSTEM_PROMPT = "Summarize the subtopic for exam revision in 150-200 words."
+HISTORY = " ".join(f"note{number}" for number in range(1, 201))
+
+
+def test_history_over_the_budget_is_dropped_oldest_first():
+    builder = PromptBuilder(SYSTEM_PROMPT, input_budget=80)
+    plan = builder.build('Dropout', HISTORY)
+    user_message = plan.messages[-1]['content']
+
+    assert plan.context_trimmed
+    assert plan.prompt_tokens <= 80
+    assert plan.prompt_tokens == count_message_tokens(plan.messages)
+    assert user_message.endswith('note199 note200')
+    assert 'note1 ' not in user_message
+    kept = user_message.split('Previous context: …', 1)[1].split()
+    assert kept == HISTORY.split()[-len(kept):]
+    assert plan.saved_tokens > 0
+
+
+def test_history_is_left_out_when_too_little_of_it_would_fit():
+    builder = PromptBuilder(SYSTEM_PROMPT)
+    budget = count_message_tokens(builder.build('Dropout').messages) + MIN_CONTEXT_TOKENS
+    plan = PromptBuilder(SYSTEM_PROMPT, input_budget=budget).build('Dropout', HISTORY)
+
+    assert plan.context_trimmed
+    assert 'Previous context' not in plan.messages[-1]['content']
+
+
+def test_history_within_the_budget_is_kept_whole():
+    plan = PromptBuilder(SYSTEM_PROMPT).build('Dropout', 'note1 note2')
+    assert plan.messages[-1]['content'].endswith('Previous context: note1 note2')
+    assert not plan.context_trimmed
+
+
+def test_max_tokens_follows_the_word_target():
+    assert PromptBuilder(SYSTEM_PROMPT).build('Dropout').max_tokens == int(200 * 1.4) + 150
+
+
+def test_max_tokens_is_clamped_to_what_the_window_leaves(capsys):
+    system_prompt = SYSTEM_PROMPT + " " + "Be precise. " * 60
+    builder = PromptBuilder(system_prompt, input_budget=50, context_window=300)
+    plan = builder.build('Dropout')
+
+    assert plan.prompt_tokens > 50
+    assert plan.max_tokens == 300 - plan.prompt_tokens
+    assert plan.max_tokens < builder.max_tokens
+    assert 'over the 50-token input budget' in capsys.readouterr().out
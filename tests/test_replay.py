@@ -0,0 +1,75 @@
+# Replays a checked-in recording of mock OpenRouter replies through the CLI flows, without a network.
+#
+# The recording is keyed by the exact requests, so it has to be refreshed after
+# the summarizer or planner prompt changes:
+#   python tests/test_replay.py
+
+import os
+import sys
+
+import pytest
+
+if __name__ == '__main__':
+    sys.path[:0] = [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), name)
+                    for name in ('3_Agent_Code', 'benchmarks')]
+
+from cli_interface import plan_and_summarize_topic, summarize_topics  # noqa: E402
+from llm_client import create_client  # noqa: E402
+from model_router import ModelRouter  # noqa: E402
+from planner_agent import PlanCache, PlannerAgent  # noqa: E402
+from session_log import SessionLog, read_records  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+from summarizer_agent import SummarizerAgent  # noqa: E402
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings', 'cli_session.jsonl')
+TOPICS = ['Bias and variance', 'Overfitting', 'Gradient descent']
+PLANNED_TOPIC = 'Gradient checking in practice'
+
+
+def agents():
+    client = create_client()
+    planner = PlannerAgent(client, plan_cache=PlanCache(), router=ModelRouter(['openai/gpt-3.5-turbo']))
+    summarizer = SummarizerAgent(client, flight=SingleFlight(), router=ModelRouter(['openai/gpt-3.5-turbo']))
+    return planner, summarizer
+
+
+def run_session(journal_path):
+    planner, summarizer = agents()
+    with SessionLog(str(journal_path)) as journal:
+        failed = summarize_topics(summarizer, TOPICS, journal)
+        failed += plan_and_summarize_topic(planner, summarizer, PLANNED_TOPIC, journal)
+    return failed, [record for record in read_records(journal.path) if record.get('topic')]
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    monkeypatch.setenv('REVISION_REPLAY_MODE', 'replay')
+    monkeypatch.setenv('REVISION_REPLAY_FILE', RECORDING)
+    monkeypatch.setenv('REVISION_REPLAY_TIMING', '0')
+    monkeypatch.delenv('OPENROUTER_API_KEY', raising=False)
+
+
+def test_cli_session_replays_from_the_recording(replay, tmp_path):
+    failed, records = run_session(tmp_path / 'journal.jsonl')
+
+    assert failed == 0, "a request is missing from the recording; re-record with: python tests/test_replay.py"
+    topics = [record['topic'] for record in records]
+    assert set(TOPICS) <= set(topics)
+    assert len(topics) > len(TOPICS)  # and the planned topic's subtopics
+    assert all(record['text'] and not record['error'] for record in records)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    from mock_openrouter import MockConfig, MockOpenRouter
+
+    if os.path.exists(RECORDING):
+        os.remove(RECORDING)
+    with MockOpenRouter(MockConfig(latency=0.0, jitter=0.0, seed=1)) as server, \
+            tempfile.TemporaryDirectory() as directory:
+        os.environ.update(REVISION_REPLAY_MODE='record', REVISION_REPLAY_FILE=RECORDING,
+                          OPENROUTER_BASE_URL=server.base_url, OPENROUTER_API_KEY='record')
+        failed, records = run_session(os.path.join(directory, 'journal.jsonl'))
+    print(f"📼 Recorded {len(records)} summaries to {RECORDING}" + (f" ({failed} failed)" if failed else ""))
+    sys.exit(1 if failed else 0)
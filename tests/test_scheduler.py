@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from llm_client import create_client
+from scheduler import OBSERVED_WINDOW, CallScheduler, limits_from_env
+
+
+def timed_calls(scheduler, models):
+    start = time.perf_counter()
+    for model in models:
+        scheduler.call(lambda timeout: 'ok', model=model)
+    return time.perf_counter() - start
+
+
+def test_no_limit_unless_configured():
+    scheduler = CallScheduler()
+    assert timed_calls(scheduler, ['openai/gpt-3.5-turbo'] * 200) < 0.5
+    assert scheduler.stats()['requests_per_minute'] == {}
+
+
+def test_each_model_has_its_own_budget():
+    # 600 a minute allows a burst of 100, then 10 a second
+    scheduler = CallScheduler(requests_per_minute=600)
+    assert timed_calls(scheduler, ['openai/gpt-3.5-turbo'] * 100 + ['openai/gpt-4o-mini'] * 100) < 0.2
+    assert timed_calls(scheduler, ['openai/gpt-3.5-turbo'] * 5) > 0.3
+
+
+def test_provider_limit_is_shared_by_its_models():
+    scheduler = CallScheduler(limits={'openai/': (60, 0)})
+    assert scheduler.limit_for('openai/gpt-3.5-turbo') is scheduler.limit_for('openai/gpt-4o-mini')
+    assert scheduler.limit_for('anthropic/claude-3-haiku').requests is None
+
+
+def test_limits_from_env(monkeypatch):
+    monkeypatch.setenv('OPENROUTER_MODEL_LIMITS', 'openai/gpt-4o-mini=500:200000, anthropic/=50,bad')
+    assert limits_from_env() == {'openai/gpt-4o-mini': (500.0, 200000.0), 'anthropic/': (50.0, 0.0)}
+
+
+def test_throttling_without_a_limit_starts_one_at_half_the_observed_rate(mock_server):
+    client = create_client()
+    scheduler = CallScheduler(max_retries=0)
+    model = 'openai/gpt-3.5-turbo'
+
+    def request():
+        return scheduler.call(lambda timeout: client.chat.completions.create(
+            model=model, messages=[{'role': 'user', 'content': 'Summarize: Dropout'}], timeout=timeout
+        ), model=model)
+
+    for _ in range(20):
+        request()
+    assert scheduler.limit_for(model).current_rate is None
+
+    mock_server.config.rate_limit_rate = 1.0
+    with pytest.raises(Exception) as raised:
+        request()
+    assert getattr(raised.value, 'status_code', None) == 429
+    observed = 21 * 60 / OBSERVED_WINDOW
+    assert scheduler.limit_for(model).current_rate == pytest.approx(observed / 2, rel=0.1)
+
+    mock_server.config.rate_limit_rate = 0.0
+    request()
+    assert scheduler.limit_for(model).current_rate > observed / 2
+    for _ in range(10):
+        request()
+    assert scheduler.limit_for(model).current_rate is None
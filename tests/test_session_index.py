@@ -0,0 +1,44 @@
+from session_index import SessionIndex
+from session_log import SessionLog
+
+
+def write_journal(path, *topics):
+    with SessionLog(str(path)) as journal:
+        for index, topic in enumerate(topics):
+            journal.append(topic, f'Summary of {topic} for revision.', index=index)
+
+
+def test_ingest_dir_reads_only_new_or_changed_files(tmp_path, monkeypatch):
+    write_journal(tmp_path / 'a.jsonl', 'Dropout')
+    write_journal(tmp_path / 'b.jsonl', 'Attention')
+    index = SessionIndex(':memory:')
+    assert index.ingest_dir(str(tmp_path)) == 2
+
+    read = []
+    original = SessionIndex._read_entries
+    monkeypatch.setattr(SessionIndex, '_read_entries',
+                        staticmethod(lambda path, created: read.append(path) or original(path, created)))
+    assert index.ingest_dir(str(tmp_path)) == 0
+    assert read == []
+
+    write_journal(tmp_path / 'c.jsonl', 'Transformers')
+    assert index.ingest_dir(str(tmp_path)) == 1
+    assert [path.rsplit('/', 1)[-1] for path in read] == ['c.jsonl']
+
+
+def test_reuse_requires_the_same_model_prompt_and_temperature(tmp_path):
+    with SessionLog(str(tmp_path / 'a.jsonl')) as journal:
+        journal.append('Dropout', 'Summary of Dropout.', model='m1', prompt_hash='p1', temperature=0.5)
+    (tmp_path / 'b.txt').write_text("🔹 Topic: Attention\n" + "-" * 30 + "\nOld summary.\n" + "-" * 30 + "\n",
+                                    encoding='utf-8')
+    index = SessionIndex(':memory:')
+    assert index.ingest_dir(str(tmp_path)) == 2
+
+    assert index.reusable('dropout', 'm1', 'p1', 0.5) == 'Summary of Dropout.'
+    assert index.reusable('Dropout', 'm1', 'p2', 0.5) is None
+    assert index.reusable('Dropout', 'm1', 'p1', 0.7) is None
+    assert index.reusable('Dropout', 'm2', 'p1', 0.5) is None
+    # Text logs record no model or prompt, so they are found but never reused
+    assert index.find_topic('Attention')
+    assert index.reusable('Attention', 'm1', 'p1', 0.5) is None
+
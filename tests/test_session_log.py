@@ -0,0 +1,19 @@
+import os
+
+from session_log import SessionLog, export
+
+
+def test_export_is_rewritten_only_after_the_journal_changes(tmp_path):
+    journal = SessionLog(str(tmp_path / 'session.jsonl'))
+    journal.append('Dropout', 'Randomly drops units during training.', index=0)
+
+    path = export(journal.path, 'md')
+    written = os.stat(path).st_mtime_ns
+    assert export(journal.path, 'md') == path
+    assert os.stat(path).st_mtime_ns == written
+
+    journal.append('Batch normalization', 'Normalizes layer inputs per batch.', index=1)
+    journal.close()
+    export(journal.path, 'md')
+    with open(path, encoding='utf-8') as f:
+        assert 'Batch normalization' in f.read()
@@ -0,0 +1,27 @@
+from similarity_index import SimilarityIndex
+
+
+def test_ambiguous_acronym_matches_nothing():
+    index = SimilarityIndex(['Linear Regression', 'Logistic Regression'])
+    assert index.nearest('LR') is None
+    assert index.nearest('Linear regression') == ('Linear Regression', 1.0)
+
+
+def test_acronym_matches_are_scored_against_the_threshold():
+    index = SimilarityIndex(['Artificial Intelligence', 'Ethics of Artificial Intelligence'])
+    topic, score = index.nearest('AI ethics')
+    assert topic == 'Ethics of Artificial Intelligence'
+    assert score > 0.99
+    assert SimilarityIndex(['Artificial Intelligence']).nearest('AI', threshold=1.01) is None
+
+
+def test_words_with_opposite_prefixes_are_different_topics():
+    index = SimilarityIndex(['Overfitting in deep networks', 'Oversampling minority classes'])
+    assert index.nearest('Underfitting in deep networks') is None
+    assert index.nearest('Undersampling minority classes') is None
+    assert index.nearest('Overfitting in deep network')[0] == 'Overfitting in deep networks'
+
+
+def test_spelling_variants_still_match():
+    index = SimilarityIndex(['Batch normalization for deep convolutional networks'])
+    assert index.nearest('Batch normalisation for deep convolutional networks') is not None
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from async_agents import AsyncSummarizerAgent
+from llm_client import create_async_client, create_client
+from model_router import ModelRouter
+from single_flight import AsyncSingleFlight, SingleFlight
+from summarizer_agent import SummarizerAgent
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_follower_takes_over_when_the_leader_stream_is_closed(mock_server):
+    client = create_client()
+    flight = SingleFlight()
+
+    def agent():
+        return SummarizerAgent(client, flight=flight, router=ModelRouter(['openai/gpt-3.5-turbo']))
+
+    leader = agent().generate_stream('Dropout')
+    next(leader)
+
+    results = []
+    follower = threading.Thread(target=lambda: results.extend(agent().summarize_all(['Dropout'])))
+    follower.start()
+    wait_for(lambda: flight.stats()['merged'] == 1)
+
+    leader.close()
+    follower.join(5)
+
+    assert not follower.is_alive()
+    assert len(results) == 1 and results[0].ok
+    assert flight.stats()['executed'] == 2
+
+
+def test_followers_share_the_leader_error_but_not_its_interrupt():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    outcomes = []
+
+    def leader_fn():
+        started.set()
+        release.wait()
+        raise KeyboardInterrupt
+
+    def follow():
+        try:
+            outcomes.append(flight.do('key', lambda: 'follower ran'))
+        except BaseException as e:
+            outcomes.append(e)
+
+    leader = threading.Thread(target=lambda: pytest.raises(KeyboardInterrupt, flight.do, 'key', leader_fn))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=follow)
+    follower.start()
+    wait_for(lambda: flight.stats()['merged'] == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert outcomes == ['follower ran']
+
+    def failing():
+        raise ValueError('bad request')
+
+    with pytest.raises(ValueError):
+        flight.do('other', failing)
+
+
+def test_async_follower_takes_over_when_the_leader_is_cancelled(mock_server):
+    mock_server.config.latency = 0.2
+    client = create_async_client()
+    flight = AsyncSingleFlight()
+
+    def agent():
+        return AsyncSummarizerAgent(client, flight=flight, router=ModelRouter(['openai/gpt-3.5-turbo']))
+
+    async def consume(stream):
+        return ''.join([chunk async for chunk in stream])
+
+    async def main():
+        leader = asyncio.ensure_future(consume(agent().agenerate_stream('Dropout')))
+        while not flight.stats()['in_flight']:
+            await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(consume(agent().agenerate_stream('Dropout')))
+        while not flight.stats()['merged']:
+            await asyncio.sleep(0.01)
+        leader.cancel()
+        summary = await asyncio.wait_for(follower, 5)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return summary
+
+    assert asyncio.run(main())
+    assert flight.stats()['executed'] == 2
@@ -0,0 +1,39 @@
+from cli_interface import journal_result
+from llm_client import create_client
+from model_router import ModelRouter
+from scheduler import CallScheduler
+from session_log import SessionLog, read_records
+from single_flight import SingleFlight
+from summarizer_agent import SummarizerAgent, SummaryResult
+from summary_cache import SummaryCache
+
+PRIMARY, BACKUP = 'openai/gpt-3.5-turbo', 'openai/gpt-4o-mini'
+
+
+def agent(tmp_path):
+    return SummarizerAgent(create_client(), cache=SummaryCache(str(tmp_path / 'cache.sqlite3')),
+                           flight=SingleFlight(), scheduler=CallScheduler(max_retries=0),
+                           router=ModelRouter([PRIMARY, BACKUP], hedging=False))
+
+
+def test_fallback_answers_are_journaled_under_their_model_and_not_cached(mock_server, tmp_path):
+    mock_server.config.failing_models = {PRIMARY}
+    summarizer = agent(tmp_path)
+
+    summary = summarizer.generate('Dropout')
+    streamed = ''.join(summarizer.generate_stream('Batch normalization'))
+
+    assert summary and streamed
+    assert summarizer.answered_by('Dropout') == BACKUP
+    assert summarizer.answered_by('Batch normalization') == BACKUP
+    assert summarizer.cache.stats()['entries'] == 0
+    with SessionLog(str(tmp_path / 'journal.jsonl')) as journal:
+        journal_result(journal, summarizer, SummaryResult(0, 'Dropout', summary))
+    assert [r['model'] for r in read_records(journal.path) if r.get('topic')] == [BACKUP]
+
+
+def test_primary_answers_are_cached(mock_server, tmp_path):
+    summarizer = agent(tmp_path)
+    summarizer.generate('Dropout')
+    assert summarizer.answered_by('Dropout') == PRIMARY
+    assert summarizer.cache.stats()['entries'] == 1
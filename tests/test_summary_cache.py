@@ -0,0 +1,64 @@
+import pytest
+
+import summary_cache
+from summary_cache import SummaryCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(summary_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def put(cache, key, summary, prompt_hash='p1'):
+    cache.put(key, summary, prompt_hash, 'openai/gpt-3.5-turbo', key)
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = SummaryCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=60)
+    put(cache, 'a', 'Summary A')
+    clock[0] += 59
+    assert cache.get('a') == 'Summary A'
+    clock[0] += 2
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path, clock):
+    cache = SummaryCache(str(tmp_path / 'cache.sqlite3'), max_bytes=25)
+    put(cache, 'a', 'x' * 10)
+    clock[0] += 1
+    put(cache, 'b', 'y' * 10)
+    clock[0] += 1
+    assert cache.get('a') == 'x' * 10  # now more recent than b
+    clock[0] += 1
+    put(cache, 'c', 'z' * 10)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'x' * 10 and cache.get('c') == 'z' * 10
+    assert cache.stats()['bytes'] == 20
+
+
+def test_least_recently_used_entries_are_evicted_by_count(tmp_path, clock):
+    cache = SummaryCache(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    for key in 'abc':
+        put(cache, key, f'Summary {key}')
+        clock[0] += 1
+    assert [cache.get(key) for key in 'abc'] == [None, 'Summary b', 'Summary c']
+
+
+def test_retain_prompt_only_removes_other_prompt_versions(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = SummaryCache(path)
+    put(cache, 'old', 'Old summary', prompt_hash='p1')
+    put(cache, 'new', 'New summary', prompt_hash='p2')
+
+    assert cache.retain_prompt('p2') == 1
+    assert cache.retain_prompt('p2') == 0
+    cache.close()
+
+    reopened = SummaryCache(path)
+    assert reopened.get('old') is None
+    assert reopened.get('new') == 'New summary'
+    assert reopened.subtopics('p2') == ['new']
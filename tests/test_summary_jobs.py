@@ -0,0 +1,83 @@
+import os
+import time
+
+import pytest
+
+import session_log
+from conftest import requests_made
+from llm_client import create_client
+from planner_agent import PlanCache, PlannerAgent
+from single_flight import SingleFlight
+from summary_jobs import JobStore
+from summarizer_agent import SummarizerAgent
+
+
+@pytest.fixture
+def agents(mock_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(session_log, 'SESSION_DIR', str(tmp_path))
+    client = create_client()
+    return PlannerAgent(client, plan_cache=PlanCache()), SummarizerAgent(client, flight=SingleFlight())
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_finished_plan_job_is_not_reported_as_cancelled(agents):
+    planner, summarizer = agents
+    job = JobStore().submit_plan(planner, summarizer, 'Gradient checking in practice')
+    wait_until(lambda: job.done)
+    assert not job.cancelled
+    assert [result.ok for result in job.results()] == [True] * 4
+
+
+def test_stop_ends_a_plan_job_without_further_model_calls(agents, mock_server):
+    planner, summarizer = agents
+    mock_server.config.latency = 0.2
+    job = JobStore().submit_plan(planner, summarizer, 'Gradient checking in practice', max_concurrency=1)
+    wait_until(lambda: job.progress()[0] == 1)
+    job.cancel()
+    wait_until(lambda: job.done)
+    time.sleep(1.0)
+
+    # The plan, the first summary and at most the one in flight when Stop was pressed
+    assert requests_made(mock_server) <= 3
+
+
+def test_stop_cancels_summaries_not_yet_started(agents, mock_server):
+    _, summarizer = agents
+    mock_server.config.latency = 0.2
+    topics = [f'Stopped topic {n}' for n in range(8)]
+    job = JobStore().submit(summarizer, topics, max_concurrency=2)
+    job.cancel()
+    wait_until(lambda: job.done)
+    time.sleep(1.0)
+
+    # The streamed topic and the two that had already started
+    assert requests_made(mock_server) <= 3
+
+
+def test_job_journals_reach_sample_output_only_when_saved(agents, tmp_path, monkeypatch):
+    _, summarizer = agents
+    sample_output = tmp_path / 'sample_output'
+    monkeypatch.setattr(session_log, 'SESSION_DIR', str(sample_output))
+    store = JobStore(ttl=0, journal_dir=str(tmp_path / 'jobs'))
+    job = store.submit(summarizer, ['Saved topic'])
+    wait_until(lambda: job.done)
+
+    assert not sample_output.exists()
+    saved = job.journal.save_copy()
+    assert os.path.dirname(saved) == str(sample_output)
+    assert [record['topic'] for record in session_log.read_records(saved)] == ['Saved topic']
+
+    # An expired job takes its unsaved journal with it; the saved copy stays
+    unsaved = store.submit(summarizer, ['Unsaved topic'])
+    wait_until(lambda: unsaved.done)
+    assert unsaved.journal.path != job.journal.path
+    latest = store.submit(summarizer, ['Another topic'])
+    assert not os.path.exists(unsaved.journal.path)
+    assert os.listdir(tmp_path / 'jobs') == [os.path.basename(latest.journal.path)]
+    assert os.listdir(sample_output) == [os.path.basename(saved)]
@@ -0,0 +1,29 @@
+import warm
+from conftest import requests_made
+from summary_cache import SummaryCache
+
+
+def run_warm(tmp_path, monkeypatch, *extra):
+    monkeypatch.setattr(warm, 'SummaryCache', lambda: SummaryCache(str(tmp_path / 'cache.sqlite')))
+    return warm.main(['--output', str(tmp_path / 'summaries.json'), '--category', 'Ethics_and_Security',
+                      '--rpm', '0', *extra])
+
+
+def test_force_calls_the_model_despite_cached_summaries(tmp_path, monkeypatch, mock_server):
+    assert run_warm(tmp_path, monkeypatch) == 0
+    first_run = requests_made(mock_server)
+    assert first_run > 0
+
+    assert run_warm(tmp_path, monkeypatch, '--force') == 0
+    assert requests_made(mock_server) == 2 * first_run
+
+
+def test_stale_entries_are_regenerated(tmp_path, monkeypatch, mock_server):
+    assert run_warm(tmp_path, monkeypatch) == 0
+    first_run = requests_made(mock_server)
+
+    assert run_warm(tmp_path, monkeypatch) == 0
+    assert requests_made(mock_server) == first_run
+
+    assert run_warm(tmp_path, monkeypatch, '--max-age-days', '0') == 0
+    assert requests_made(mock_server) == 2 * first_run